@@ -1,8 +1,17 @@
 import streamlit as st
-from pinecone import Pinecone
-from groq import Groq
-from sentence_transformers import SentenceTransformer
-from collections import defaultdict
+import logging
+import time
+
+from kantor_rag import metrics, warmup
+
+from kantor_rag.catalog import DOCUMENT_CATALOG
+from kantor_rag.config import get_setting, get_int, get_bool
+from kantor_rag.deadline import DeadlineExceeded
+from kantor_rag.generation import Overloaded
+from kantor_rag.pipeline import Pipeline, format_download_text
+
+logging.basicConfig(level=get_setting("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 # Page config
 st.set_page_config(
@@ -247,171 +256,33 @@ st.markdown(f"""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize clients
+# The search pipeline, shared by all sessions. Heavy imports (torch, the
+# Pinecone and Groq SDKs) and the model load run on background threads, so the
+# page renders right away; the first search waits on them instead of the whole script.
 @st.cache_resource
-def init_clients():
-    pc = Pinecone(api_key=st.secrets["PINECONE_API_KEY"])
-    index = pc.Index("kantor-rag")
-    groq_client = Groq(api_key=st.secrets["GROQ_API_KEY"])
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    return index, groq_client, model
+def init_pipeline():
+    return Pipeline.from_settings(background=warmup.background)
 
-index, groq_client, model = init_clients()
+pipeline = init_pipeline()
+# A failed background load would be re-raised by every search until restart; start the load over
+if pipeline.load_failed():
+    init_pipeline.clear()
+    pipeline = init_pipeline()
 
 
-def diversify_results(matches, max_per_source=2):
-    """
-    Limit results to max N chunks per source document.
-    Keeps the highest-scoring chunks from each source.
-    Results are already sorted by score (highest first) from Pinecone.
-    """
-    source_counts = defaultdict(int)
-    diversified = []
-    
-    for match in matches:
-        source = match.metadata.get('filename', 'Unknown')
-        
-        if source_counts[source] < max_per_source:
-            diversified.append(match)
-            source_counts[source] += 1
-    
-    return diversified
+# Prometheus-style metrics on a side port (Streamlit can't add routes)
+@st.cache_resource
+def init_metrics_server():
+    port = get_int("METRICS_PORT", 0)
+    return metrics.serve(port, get_setting("METRICS_HOST", "127.0.0.1")) if port else None
+
+init_metrics_server()
 
+# Stream answer tokens into the page instead of waiting for the full completion
+STREAM_ANSWERS = get_bool("STREAM_ANSWERS", True)
+# Seconds between re-renders of a streaming answer
+STREAM_RENDER_INTERVAL = 0.05
 
-# Document catalog
-DOCUMENT_CATALOG = {
-    "Books": [
-        "1959.Interbehavioral Psychology - J. R. Kantor",
-        "A Survey of the Science of Psyc - J. R. Kantor",
-        "An Objective Psychology of Gram - J. R. Kantor",
-        "An Outline of Social Psychology - J. R. Kantor",
-        "Interbehavioral philosophy - J. R. Kantor",
-        "Linguistica Psicologica - J. R. Kantor",
-        "Principles of psychology Vol 1 - J. R. Kantor",
-        "Principles of psychology Vol 2 - J. R. Kantor",
-        "Psychological linguistics - J. R. Kantor",
-        "Psychology and Logic Vol 1 - J. R. Kantor",
-        "Psychology and Logic Vol 2 - J. R. Kantor",
-        "Sketch of J. R. Kantor's Psycho - J. R. Kantor",
-        "The Aim and Progress of Psychology and Other Sciences",
-        "The Scientific Evolution of Psychology Vol II",
-        "The Scientific evolution of Psy - J. R. Kantor",
-        "The logic of modern science",
-        "Un esbozo de Psicologia Social - J. R. Kantor",
-        "kantor psicologia interconductu - J. R. Kantor",
-        "the science of psychology an interbehavioral survey",
-    ],
-    "Articles": [
-        "1917 Intelligence and mental tests",
-        "1917. Discussion. Statistics of - J. R. Kantor",
-        "1917_The functional nature of the philosophical categories",
-        "1918_Conscious behavior and the abnormal",
-        "1918_The Ethics of Internationalism and the Individual",
-        "1919. Instrumental transformism - J. R. Kantor",
-        "1919_Human Personality and its Pathology",
-        "1919_Psychology as a science of critical evaluation",
-        "1920_A functional interpretation of human instincts",
-        "1920_Intelligence and Mental Tests",
-        "1920_Suggestions toward a scientific interpretation of perception",
-        "1921_An Objective Interpretation of Meanings",
-        "1921_An attempt toward a naturalistic description of emotions I",
-        "1921_An attempt toward a naturalistic description of emotions II",
-        "1921_Association as a fundamental process of objective psychology",
-        "1921_How do we acquire our basic reactions",
-        "1922 - American Journal of Sociology - Kantor - An Essay Toward an Institutional Conception of Social Psychology",
-        "1922 Can the psychophysical experiment reconcile introspectionists and relativists",
-        "1922_An analysis of psychological language data",
-        "1922_An essay toward an institutional conception of social psychology",
-        "1922_How is a science of social psychology possible",
-        "1922_The Nervous System, Psychological Fact or Fiction",
-        "1922_The Psychology of Reflex Action",
-        "1922_The integrative character of habits",
-        "1923_An objective analysis of volitional behavior",
-        "1923_The Institutional Foundation of a Scientific Social Psychology",
-        "1923_The problem of instinct and its relation to social psychology",
-        "1923_The psychology of feeling or affective reactions",
-        "1925_Anthropology, race, psychiatry, and culture",
-        "1925_The Significance of the Gestalt Conception in Psychology",
-        "1928 Can psychology contribute to the study of linguistics",
-        "1931_Contributions of the Laboratory of Psychology and Biology - Book review",
-        "1933_In defense of stimulus-response psychology",
-        "1935_James Mark Baldwin Columbia, S. C., 1861--Paris, France, 1934",
-        "1935_The evolution of mind",
-        "1936 Concerning Physical Analogies in Psychology",
-        "1938_Character and personality. Their nature and interrelations",
-        "1938_The nature of psychology as a natural science",
-        "1938_The operational principle in the physical and psychological sciences",
-        "1939_The current situation in social psychology",
-        "1941_Current trends in psychological theory",
-        "1942_Toward a scientific analysis of motivation",
-        "1945_Problems and paradoxes of physiological psychology",
-        "1956_Interbehavioral psychology and scientific analysis of data and operations",
-        "1957_Events and constructs in the science of psychology",
-        "1959_Evolution and the science of psychology",
-        "1960_History of science as scientific method",
-        "1962_Psychology Scientific status-seeker",
-        "1963_Behaviorism whose image",
-        "1964_History of psychology What benefits",
-        "1968_Behaviorism in the history of psychology",
-        "1969_Scientific psychology and specious philosophy",
-        "1970_An analysis of the experimental analysis of behavior (TEAB)",
-        "1970_Innate intelligence Another genetic avatar",
-        "1970_Newton's influence on the development of psychology",
-        "1971_Revivalism in psychology",
-        "1973_Private data, raw feels, inner experience, and all that",
-        "1973_System structure and scientific psychology",
-        "1973_The hereditarian manifesto (politics in psychology)",
-        "1974_Eppur si muove",
-        "1974_Lest we forget",
-        "1974_The role of chemistry in the domain of psychology",
-        "1974_[errata]Eppur Si muove",
-        "1975 La lingüística psicológica",
-        "1975_Education in psychological perspective",
-        "1975_In dispraise of indiscrimination",
-        "1975_On reviewing psychological classics",
-        "1976_Behaviorism, behavior analysis, and the career of psychology",
-        "1976_Cultural institutions and psychological institutions",
-        "1976_What meaning means in linguistics",
-        "1978 Experimentation the ACME of science",
-        "1978_Cognition as events and as psychic constructions",
-        "1978_Man and machines in psychology Cybernetics and artificial intelligence",
-        "1979_Psychology Science or nonscience",
-        "1980 Manifiesto de la psicologia int - J. R. Kantor",
-        "1980_Manifesto of interbehavioral psychology",
-        "1980_Theological psychology vs. scientific psychology",
-        "1981 Axioms and their role in psychology",
-        "1981 reflections upon speech and language",
-        "1981_Interbehavioral psychology and the logic of science",
-        "1981_Surrogation A process in psychological evolution",
-        "1982 Objectivity and subjectivity in science and psychology",
-        "1982_Psychological retardation and interbehavioral maladjustments",
-        "1983 Explanation psychological natur - J. R. Kantor",
-        "1984_Scientific unity and spiritistic disunity",
-        "1984_The relation of scientists to events in physics and in psychology",
-    ],
-    "Reviews": [
-        "1925_[Review of] Lucien Levy-Bruhl.Primitive Mentality",
-        "1934_[Review of] Hartshorne, C. The philosophy and psychology of sensation",
-        "1936_[Review of] Gestalt Psychology A Survey of Facts and Principles",
-        "1937_[Review of] Holmes, R. W. The idealism of Giovanni Gentile",
-        "1937_[Review of] Langer, S. K. An introduction to symbolic logic",
-        "1938_[Review of] Burloud, A. Principe d'une psychologie des tendances",
-        "1938_[Review of] Dantzig, T. Aspects of science",
-        "1938_[Review of] Köhler, W. The place of value in the world of facts",
-        "1939_[Review of] Gray, L. H. Foundations of Language",
-        "1939_[Review of] Moore, T. V. Cognitive psychology",
-        "1939_[Review of] What Man Has Made of Man A Study of the Consequences of Platonism and Positivism in Psychology",
-        "1940_[Review of] Eddington, S. A. The philosophy of physical science",
-        "1941_[Review of] Wood, L. The analysis of knowledge",
-        "1943_[Review of] Thorndike, E. L. Man and his works",
-        "1943_[Review of] Tolman, E. C. Drives toward war",
-        "1944_[Review of] Hunt, J. M. (Ed.). Personality and the behavior disorders A handbook based on experimental and clinical research",
-        "1954_[Review of] Bentley, A. F. Inquiry into inquiries Essays in social theory",
-        "1966_[Review of] Alexander, F.; Eisenstein, S.; & Grotjahn, M. (Eds.). Psychoanalytic pioneers",
-        "1966_[Review of] Platt, J. R. (Ed.). New views of the nature of man",
-        "1968_[Review of] Watson, R. I. The great psychologists From Aristotle to Freud.",
-    ],
-}
 
 # Custom header with image on RIGHT - RED theme
 st.markdown(f"""
@@ -471,124 +342,85 @@ st.markdown("---")
 
 # Trigger search on button click or Enter key
 if (search_clicked or query) and query:
-    with st.spinner("Searching..."):
-        try:
-            query_embedding = model.encode(query).tolist()
-            
-            # Build filter
-            pinecone_filter = None
-            if doc_type != "All Types":
-                pinecone_filter = {"doc_type": {"$eq": doc_type}}
-                if title_filter and not title_filter.startswith("All ") and title_filter != "Select type first":
-                    pinecone_filter = {
-                        "$and": [
-                            {"doc_type": {"$eq": doc_type}},
-                            {"filename": {"$eq": title_filter}}
-                        ]
-                    }
-            
-            # Query more results initially to allow for diversification
-            results = index.query(
-                namespace="",
-                vector=query_embedding,
-                top_k=25,
-                include_metadata=True,
-                filter=pinecone_filter
-            )
-            
-            # Apply source diversification: max 2 chunks per document
-            diversified_matches = diversify_results(results.matches, max_per_source=2)
-            
-            # Limit to top 10 after diversification
-            diversified_matches = diversified_matches[:10]
+    trace = metrics.Trace("streamlit", doc_type=doc_type, filtered=bool(title_filter and not title_filter.startswith("All ")))
+    try:
+        if not pipeline.model_ready():
+            with st.spinner("Loading the search model..."):
+                pipeline.wait_for_model()
+        with st.spinner("Searching..."):
+            result = pipeline.search(query, doc_type, title_filter, trace=trace)
+            sources = result.sources
+        
+        if result.context.strip():
+            st.markdown("### Answer")
+            answer_placeholder = st.empty()
             
-            context = ""
-            sources = []
-            source_references = ""
+            answer = result.answer
+            try:
+                if answer is None:
+                    if STREAM_ANSWERS:
+                        # Render tokens as they arrive, at most once per STREAM_RENDER_INTERVAL;
+                        # re-rendering on every token is quadratic over a long answer
+                        answer = ""
+                        rendered_at = 0.0
+                        for delta in pipeline.stream_answer(result, trace):
+                            answer += delta
+                            now = time.monotonic()
+                            if now - rendered_at >= STREAM_RENDER_INTERVAL:
+                                answer_placeholder.markdown(f'<div class="answer-box">{answer}</div>', unsafe_allow_html=True)
+                                rendered_at = now
+                    else:
+                        with st.spinner("Generating answer..."):
+                            answer = pipeline.answer(result, trace)
+            except Overloaded as e:
+                # Over the Groq rate limit: keep the sources, skip the answer
+                trace.set(shed=True)
+                wait = f" Try again in {e.retry_after:.0f} s." if e.retry_after else ""
+                answer_placeholder.warning(f"Too many questions are being answered right now; showing the sources only.{wait}")
+                answer = None
+            except DeadlineExceeded:
+                # Out of latency budget before the first token: the ranked sources alone
+                trace.set(degraded=True)
+                answer_placeholder.warning("The answer didn't start in time; showing the sources only. Try again in a moment.")
+                answer = None
             
-            for i, match in enumerate(diversified_matches, 1):
-                text = match.metadata.get("text", "")
-                filename = match.metadata.get("filename", "Unknown")
-                page = match.metadata.get("page", "?")
-                doc_type_result = match.metadata.get("doc_type", "")
-                year = match.metadata.get("year", 0)
-                
-                context += f"\n[Source {i}: {filename}, p.{page}]\n{text}\n"
-                source_references += f"- Source {i}: {filename}, page {page}\n"
-                
-                sources.append({
-                    "num": i,
-                    "file": filename,
-                    "title": filename,
-                    "type": doc_type_result,
-                    "page": page,
-                    "year": year,
-                    "score": match.score,
-                    "text": text
-                })
+            if answer is not None:
+                with trace.stage("render_answer"):
+                    answer_placeholder.markdown(f'<div class="answer-box">{answer}</div>', unsafe_allow_html=True)
+                    
+                    # Download button, built once the full answer is in
+                    st.download_button(
+                        label="📥 Download Results",
+                        data=format_download_text(query, doc_type, title_filter, answer, sources),
+                        file_name=f"kantor_search.txt",
+                        mime="text/plain"
+                    )
             
-            if context.strip():
-                response = groq_client.chat.completions.create(
-                    model="llama-3.3-70b-versatile",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": f"""You are a scholar specializing in J.R. Kantor's interbehavioral psychology. 
-Answer based ONLY on the provided context. 
-When citing, use the format [Source X] to reference specific sources.
-
-Available sources:
-{source_references}
-
-Always cite which source(s) your information comes from using [Source X] notation.
-If the context doesn't contain relevant information, say so."""
-                        },
-                        {
-                            "role": "user",
-                            "content": f"Context:\n{context}\n\nQuestion: {query}"
-                        }
-                    ]
-                )
-                
-                answer = response.choices[0].message.content
-                
-                st.markdown("### Answer")
-                st.markdown(f'<div class="answer-box">{answer}</div>', unsafe_allow_html=True)
-                
-                # Download button
-                download_text = f"""QUERY: {query}
-FILTERS: Type={doc_type}, Document={title_filter if title_filter else 'All'}
-
-ANSWER:
-{answer}
-
-SOURCES:
-"""
-                for s in sources:
-                    download_text += f"\n{'='*60}\nSource {s['num']}: [{s['type']}] ({s['year']}) {s['title']} — Page {s['page']}\nRelevance: {s['score']:.1%}\n{'='*60}\n{s['text']}\n"
-                
-                st.download_button(
-                    label="📥 Download Results",
-                    data=download_text,
-                    file_name=f"kantor_search.txt",
-                    mime="text/plain"
-                )
-                
-            else:
-                st.warning("No relevant documents found. Try adjusting your filters or query.")
-            
-            # Sources
-            if sources:
+        else:
+            st.warning("No relevant documents found. Try adjusting your filters or query.")
+        
+        # Sources
+        if sources:
+            with trace.stage("render_sources"):
                 st.markdown("### Sources")
                 for s in sources:
                     type_badge = f"[{s['type']}] " if s['type'] else ""
                     year_badge = f"({s['year']}) " if s.get('year') else ""
                     with st.expander(f"Source {s['num']}: {type_badge}{year_badge}{s['title']} — p.{s['page']} ({s['score']:.0%})"):
                         st.markdown(f'<div class="source-text">{s["text"]}</div>', unsafe_allow_html=True)
-                
-        except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
+        trace.finish("ok" if sources else "no_results")
+            
+    except DeadlineExceeded as e:
+        logger.warning("search ran out of time (trace %s): %s", trace.id, e)
+        trace.finish("deadline", e)
+        st.warning("The search is taking too long right now. Please try again in a moment.")
+    except Exception as e:
+        logger.exception("search failed (trace %s)", trace.id)
+        trace.finish("error", e)
+        st.error(f"An error occurred: {str(e)}")
 
 # Footer
 st.markdown('<p class="footer-caption">19 Books • 91 Articles • 21 Reviews • 1915–1984</p>', unsafe_allow_html=True)
 st.markdown('<p class="footer-caption"><a href="https://interbehavioral.com/contact/" target="_blank" style="color: #b8232f;">Provide feedback</a></p>', unsafe_allow_html=True)
+
+warmup.mark("first render")
@@ -0,0 +1,4 @@
+"""
+Retrieval and generation building blocks for the J.R. Kantor Research System.
+The Streamlit UI lives in app.py; everything it shares lives here.
+"""
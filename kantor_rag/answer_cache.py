@@ -0,0 +1,134 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from kantor_rag.cache import filter_key
+
+
+def context_key(chunk_ids, metadata_filter, model):
+    """
+    Key for the retrieved context an answer was generated from.
+    Chunk order is part of the key because the prompt numbers sources by
+    position, and a cached answer's [Source N] citations depend on it.
+    """
+    parts = [model, filter_key(metadata_filter)] + [str(chunk_id) for chunk_id in chunk_ids]
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    Persistent cache of LLM answers, stored in SQLite.
+    An answer is reused when the new query retrieved exactly the same chunks
+    (with the same filter and model) and its embedding is within the cosine
+    similarity threshold of the query the answer was generated for.
+    Entries are evicted least-recently-used past max_entries, expire after
+    ttl seconds, and are all dropped when the index version changes.
+    """
+
+    def __init__(self, path, threshold=0.97, max_entries=5000, ttl=None, index_version=None):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                context_key TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS answers_context ON answers (context_key);
+            CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._conn.commit()
+        if index_version is not None:
+            self.set_index_version(index_version)
+
+    def set_index_version(self, version):
+        """
+        Record the version of the index content; drops every entry if it changed.
+        """
+        version = str(version)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'index_version'").fetchone()
+            if row is None or row[0] != version:
+                self._conn.execute("DELETE FROM answers")
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('index_version', ?)", (version,))
+                self._conn.commit()
+
+    def lookup(self, embedding, chunk_ids, metadata_filter, model):
+        key = context_key(chunk_ids, metadata_filter, model)
+        query = _unit(embedding)
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, embedding, answer, created FROM answers WHERE context_key = ?", (key,)
+            ).fetchall()
+            best_id, best_answer, best_score = None, None, -1.0
+            for row_id, blob, answer, created in rows:
+                if self.ttl and created + self.ttl < now:
+                    continue
+                score = float(np.dot(query, np.frombuffer(blob, dtype=np.float32)))
+                if score > best_score:
+                    best_id, best_answer, best_score = row_id, answer, score
+            if best_id is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (now, best_id))
+            self._conn.commit()
+            self.hits += 1
+            return best_answer
+
+    def store(self, embedding, chunk_ids, metadata_filter, model, answer):
+        key = context_key(chunk_ids, metadata_filter, model)
+        blob = _unit(embedding).tobytes()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (context_key, embedding, answer, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, answer, now, now)
+            )
+            if self.ttl:
+                self._conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM answers WHERE id NOT IN (SELECT id FROM answers ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,232 @@
+"""
+Answer a file of prepared questions offline.
+
+    python -m kantor_rag.batch questions.jsonl out_dir [--search-workers 8] [--llm-workers 4]
+
+Input is JSONL or CSV (by extension) with a "query" (or "question") field and
+optional "doc_type" and "filename" (or "title") filters, as in the sidebar.
+
+Every finished question is appended to out_dir/results.jsonl as soon as its
+answer is in, so an interrupted run picks up where it stopped: questions
+already answered are skipped, failed ones are retried. When every question
+is done, out_dir/results.txt holds all of them in input order, in the same
+QUERY/ANSWER/SOURCES format as the app's download.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from kantor_rag.generation import is_rate_limit, retry_after
+from kantor_rag.pipeline import ALL_TYPES, Pipeline, format_download_text
+
+logger = logging.getLogger(__name__)
+
+NO_RESULTS = "No relevant documents found."
+RESULTS_FILE = "results.jsonl"
+REPORT_FILE = "results.txt"
+
+
+def read_questions(path):
+    """
+    Return [{"key", "query", "doc_type", "title"}] from a JSONL or CSV file.
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    questions = []
+    for row in rows:
+        query = (row.get("query") or row.get("question") or "").strip()
+        if not query:
+            continue
+        doc_type = (row.get("doc_type") or "").strip() or ALL_TYPES
+        title = (row.get("filename") or row.get("title") or "").strip() or None
+        questions.append({"key": question_key(query, doc_type, title), "query": query, "doc_type": doc_type,
+                          "title": title})
+    return questions
+
+
+def question_key(query, doc_type, title):
+    """
+    Identity of a question across runs, independent of its line number.
+    """
+    return hashlib.sha1(f"{query}\n{doc_type}\n{title or ''}".encode("utf-8")).hexdigest()[:16]
+
+
+def load_results(path):
+    """
+    {key: record} of the questions a previous run finished without error.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash
+                continue
+            if not record.get("error"):
+                done[record["key"]] = record
+    return done
+
+
+class Backoff:
+    """
+    Retries a call on rate-limit errors (a Groq 429, or the scheduler
+    shedding the completion). A 429 pauses every worker sharing this
+    Backoff, for Retry-After seconds or an exponential, jittered delay, so
+    the pool slows down as a whole instead of hammering the API.
+    """
+
+    def __init__(self, max_retries=6, base_delay=1.0, max_delay=60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def call(self, fn, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                wait = self._resume_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limit(e) or attempt == self.max_retries:
+                    raise
+                delay = retry_after(e)
+                if delay is None:
+                    delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                logger.warning("rate limited, retrying in %.1f s (attempt %d)", delay, attempt + 1)
+                with self._lock:
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+
+def run_batch(pipeline, questions, out_dir, search_workers=8, llm_workers=4, backoff=None, encode_batch=64):
+    """
+    Answer questions not yet in out_dir/results.jsonl. Returns (answered, failed).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    results_path = os.path.join(out_dir, RESULTS_FILE)
+    done = load_results(results_path)
+    pending = list({q["key"]: q for q in questions if q["key"] not in done}.values())
+    logger.info("%d questions, %d already answered, %d to go", len(questions), len(questions) - len(pending), len(pending))
+    backoff = backoff or Backoff()
+    write_lock = threading.Lock()
+    failed = 0
+
+    def write(record):
+        with write_lock:
+            with open(results_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def complete(question, result):
+        record = {"key": question["key"], "query": question["query"], "doc_type": question["doc_type"],
+                  "title": question["title"]}
+        if result.context.strip():
+            answer = backoff.call(pipeline.answer, result)
+        else:
+            answer = NO_RESULTS
+        record["answer"] = answer
+        record["sources"] = [
+            {"num": s["num"], "id": s["id"], "file": s["file"], "page": s["page"], "score": s["score"]}
+            for s in result.sources
+        ]
+        record["download_text"] = format_download_text(
+            question["query"], question["doc_type"], question["title"], answer, result.sources
+        )
+        write(record)
+
+    if pending:
+        # One batched encode for every question, then concurrent vector queries
+        started = time.perf_counter()
+        embeddings = pipeline.embed_many([q["query"] for q in pending], batch_size=encode_batch)
+        logger.info("embedded %d questions in %.1f s", len(pending), time.perf_counter() - started)
+
+        with ThreadPoolExecutor(search_workers, thread_name_prefix="search") as searches, \
+                ThreadPoolExecutor(llm_workers, thread_name_prefix="llm") as completions:
+            search_futures = {
+                searches.submit(pipeline.search, q["query"], q["doc_type"], q["title"], embedding): q
+                for q, embedding in zip(pending, embeddings)
+            }
+            answer_futures = {}
+            for future in as_completed(search_futures):
+                question = search_futures[future]
+                try:
+                    answer_futures[completions.submit(complete, question, future.result())] = question
+                except Exception as e:
+                    logger.error("search failed for %r: %s", question["query"], e)
+                    write(dict(question, error=f"{type(e).__name__}: {e}"))
+                    failed += 1
+            for i, future in enumerate(as_completed(answer_futures), 1):
+                question = answer_futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error("answer failed for %r: %s", question["query"], e)
+                    write(dict(question, error=f"{type(e).__name__}: {e}"))
+                    failed += 1
+                if i % 10 == 0 or i == len(answer_futures):
+                    logger.info("%d/%d answered", i, len(answer_futures))
+
+    done = load_results(results_path)
+    if all(q["key"] in done for q in questions):
+        write_report(os.path.join(out_dir, REPORT_FILE), [done[q["key"]] for q in questions])
+    else:
+        logger.warning("%d questions failed; run again to retry them",
+                       sum(1 for q in questions if q["key"] not in done))
+    return len(pending) - failed, failed
+
+
+def write_report(path, records):
+    separator = "\n" + "#" * 60 + "\n\n"
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(separator.join(record["download_text"] for record in records))
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a JSONL/CSV file of questions.")
+    parser.add_argument("questions", help="JSONL or CSV with query, and optional doc_type and filename")
+    parser.add_argument("out_dir", help="Directory for results.jsonl (progress) and results.txt")
+    parser.add_argument("--search-workers", type=int, default=8, help="Concurrent vector queries")
+    parser.add_argument("--llm-workers", type=int, default=4, help="Concurrent LLM completions")
+    parser.add_argument("--max-retries", type=int, default=6, help="Retries per question on rate limiting")
+    parser.add_argument("--encode-batch", type=int, default=64, help="Encoder batch size")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    answered, failed = run_batch(
+        # Offline runs wait for every answer rather than give up on a latency budget
+        Pipeline.from_settings().with_options(latency_budget=None, stage_timeouts=None),
+        read_questions(args.questions),
+        args.out_dir,
+        search_workers=args.search_workers,
+        llm_workers=args.llm_workers,
+        backoff=Backoff(max_retries=args.max_retries),
+        encode_batch=args.encode_batch,
+    )
+    logger.info("answered %d, failed %d", answered, failed)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
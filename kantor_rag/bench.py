@@ -0,0 +1,259 @@
+"""
+Offline benchmark of the search pipeline, on a synthetic corpus with local
+stand-ins for Pinecone and Groq (kantor_rag.fakes), so backends, caches and
+rerankers can be compared on one machine without API keys.
+
+    python -m kantor_rag.bench [--queries 200] [--concurrency 8] [--index fake|local]
+                               [--quantization int8|binary] [--encoder fake|torch|onnx]
+                               [--rerank] [--hybrid] [--cache]
+                               [--routing] [--llm-rpm 30] [--llm-tpm 60000]
+                               [--index-tail-ms 1000 --index-tail-prob 0.02] [--hedge] [--budget 5]
+
+Reports p50/p95/p99 per stage and throughput for three scenarios: single
+queries, filtered queries and concurrent load. With --llm-rpm/--llm-tpm the
+fake LLM enforces Groq-style rate limits per model, to compare the
+generation scheduler's routing, queueing and shedding (--routing). The
+--*-tail-* options inject a long latency tail into the fake index and LLM,
+to compare hedged vector queries (--hedge) and latency budgets (--budget).
+"""
+import argparse
+import json
+import logging
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from kantor_rag.cache import LRUCache
+from kantor_rag.catalog import DOCUMENT_CATALOG
+from kantor_rag.encoders import load_encoder
+from kantor_rag.fakes import FakeEncoder, FakeLLM, SyntheticCorpus, build_fake_index, index_corpus
+from kantor_rag.deadline import DeadlineExceeded, Hedger
+from kantor_rag.generation import FAST_MODEL, GenerationScheduler, Overloaded, RoutingPolicy
+from kantor_rag.lexical import BM25Index
+from kantor_rag.metrics import Trace
+from kantor_rag.pipeline import ALL_TYPES, Pipeline
+from kantor_rag.vectorstore import LocalStore
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ("single", "filtered", "concurrent")
+PERCENTILES = (50, 95, 99)
+
+
+def build_index(kind, corpus, encoder, latency_ms=0.0, jitter_ms=0.0, directory=None, quantization=None, tail_ms=0.0,
+                tail_probability=0.0):
+    if kind == "fake":
+        return build_fake_index(corpus, encoder, latency_ms=latency_ms, jitter_ms=jitter_ms, tail_ms=tail_ms,
+                                tail_probability=tail_probability)
+    if kind == "local":
+        store = LocalStore(directory or tempfile.mkdtemp(prefix="kantor-bench-"), dimension=getattr(encoder, "dim", 384),
+                           quantization=quantization)
+        return index_corpus(store, corpus, encoder)
+    raise ValueError(f"Unknown index kind: {kind}")
+
+
+def build_pipeline(args, corpus, encoder, index, llm):
+    cache_size = 2048 if args.cache else 0
+    reranker = None
+    if args.rerank:
+        from kantor_rag.pipeline import load_reranker
+        reranker = load_reranker()
+    lexical_index = None
+    if args.hybrid:
+        lexical_index = BM25Index()
+        lexical_index.update(corpus.chunks())
+    scheduler = GenerationScheduler(
+        RoutingPolicy() if args.routing else None,
+        fallback=args.routing,
+        max_concurrency=args.llm_concurrency or None,
+        max_wait=args.llm_max_wait,
+    )
+    return Pipeline(
+        index, llm, encoder,
+        embedding_cache=LRUCache(maxsize=cache_size),
+        results_cache=LRUCache(maxsize=cache_size),
+        reranker=reranker,
+        lexical_index=lexical_index,
+        diversify_strategy=args.strategy,
+        scheduler=scheduler,
+        latency_budget=args.budget,
+        stage_timeouts={"vector_query": args.vector_query_timeout, "llm_ttft": args.llm_ttft_timeout},
+        hedger=Hedger(quantile=args.hedge_quantile) if args.hedge else None,
+    )
+
+
+def random_filter(rng):
+    """
+    A (doc_type, title) selection as the sidebar would make it: a type, and half the time one title.
+    """
+    doc_type = rng.choice(list(DOCUMENT_CATALOG))
+    title = rng.choice(DOCUMENT_CATALOG[doc_type]) if rng.random() < 0.5 else None
+    return doc_type, title
+
+
+def run_scenario(pipeline, queries, concurrency=1, filtered=False, answers=True, seed=0):
+    """
+    Run every query through search (and answer streaming); return (traces, wall seconds).
+    """
+    rng = random.Random(seed)
+    selections = [random_filter(rng) if filtered else (ALL_TYPES, None) for _ in queries]
+
+    def run(i):
+        doc_type, title = selections[i]
+        trace = Trace("bench")
+        try:
+            result = pipeline.search(queries[i], doc_type, title, trace=trace)
+        except DeadlineExceeded as e:
+            trace.finish("deadline", e)
+            return trace
+        if answers and result.context.strip():
+            try:
+                for _ in pipeline.stream_answer(result, trace):
+                    pass
+            except Overloaded as e:
+                trace.finish("shed", e)
+                return trace
+            except DeadlineExceeded as e:
+                # Sources only
+                trace.finish("degraded", e)
+                return trace
+        trace.finish()
+        return trace
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as executor:
+            traces = list(executor.map(run, range(len(queries))))
+    else:
+        traces = [run(i) for i in range(len(queries))]
+    return traces, time.perf_counter() - started
+
+
+def summarize(traces, wall_seconds):
+    """
+    {stage: {"n", "p50", "p95", "p99"}} in milliseconds, plus throughput.
+    """
+    samples = {}
+    for trace in traces:
+        for stage, seconds in trace.stages.items():
+            samples.setdefault(stage, []).append(seconds * 1000)
+        samples.setdefault("total", []).append(trace.total_seconds * 1000)
+    stages = {}
+    for stage, values in samples.items():
+        row = {"n": len(values)}
+        for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+            row[f"p{p}"] = round(float(value), 3)
+        stages[stage] = row
+    models = {}
+    for trace in traces:
+        if "llm_model" in trace.fields:
+            models[trace.fields["llm_model"]] = models.get(trace.fields["llm_model"], 0) + 1
+    outcomes = {}
+    for trace in traces:
+        outcomes[trace.outcome] = outcomes.get(trace.outcome, 0) + 1
+    return {"stages": stages, "queries": len(traces), "wall_s": round(wall_seconds, 3), "models": models,
+            "outcomes": outcomes, "hedged": sum(1 for trace in traces if trace.fields.get("hedged")),
+            "qps": round(len(traces) / wall_seconds, 2) if wall_seconds else 0.0}
+
+
+def format_table(name, summary):
+    lines = [f"{name}: {summary['queries']} queries in {summary['wall_s']:.2f} s ({summary['qps']:.1f} q/s)"
+             + "".join(f", {count} on {model}" for model, count in sorted(summary["models"].items()))
+             + "".join(f", {count} {outcome}" for outcome, count in sorted(summary["outcomes"].items()) if outcome != "ok")
+             + (f", {summary['hedged']} hedged" if summary["hedged"] else ""),
+             f"  {'stage':<14}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}"]
+    order = ("embed", "vector_query", "rerank", "diversify", "context", "search", "llm_ttft", "llm_total", "total")
+    stages = summary["stages"]
+    for stage in sorted(stages, key=lambda s: order.index(s) if s in order else len(order)):
+        row = stages[stage]
+        lines.append(f"  {stage:<14}{row['n']:>6}{row['p50']:>11.2f}{row['p95']:>11.2f}{row['p99']:>11.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the search pipeline offline.")
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8, help="Threads for the concurrent scenario")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier on chunks per document")
+    parser.add_argument("--index", choices=("fake", "local"), default="fake")
+    parser.add_argument("--quantization", choices=("int8", "binary"), help="Quantized codes for the local index")
+    parser.add_argument("--index-latency-ms", type=float, default=40.0, help="Fake index round trip")
+    parser.add_argument("--index-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--index-tail-ms", type=float, default=0.0, help="Extra fake index delay for the slow tail")
+    parser.add_argument("--index-tail-prob", type=float, default=0.0, help="Share of index queries in the slow tail")
+    parser.add_argument("--llm-tail-ms", type=float, default=0.0, help="Extra time to first token for the slow tail")
+    parser.add_argument("--llm-tail-prob", type=float, default=0.0, help="Share of completions in the slow tail")
+    parser.add_argument("--hedge", action="store_true", help="Hedge vector queries after their recent p95 latency")
+    parser.add_argument("--hedge-quantile", type=float, default=0.95)
+    parser.add_argument("--budget", type=float, help="Latency budget per question, in seconds")
+    parser.add_argument("--vector-query-timeout", type=float, help="Seconds, within the budget")
+    parser.add_argument("--llm-ttft-timeout", type=float, help="Seconds to the first token, within the budget")
+    parser.add_argument("--encoder", choices=("fake", "torch", "onnx"), default="fake")
+    parser.add_argument("--llm-ttft-ms", type=float, default=300.0)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=250.0)
+    parser.add_argument("--answer-tokens", type=int, default=150)
+    parser.add_argument("--fast-speedup", type=float, default=3.0, help=f"{FAST_MODEL} speed relative to the main model")
+    parser.add_argument("--llm-rpm", type=int, help="Fake requests per minute per model")
+    parser.add_argument("--llm-tpm", type=int, help="Fake tokens per minute per model")
+    parser.add_argument("--llm-window", type=float, default=60.0, help="Seconds in the fake rate-limit window")
+    parser.add_argument("--routing", action="store_true", help="Route definitional questions to the fast model "
+                                                               "and fall back to it near the rate limit")
+    parser.add_argument("--definitional", type=float, default=0.0, help="Share of queries asked as 'what is ...'")
+    parser.add_argument("--llm-concurrency", type=int, default=0, help="Concurrent completions per model (0: no cap)")
+    parser.add_argument("--llm-max-wait", type=float, default=10.0, help="Seconds to wait for quota before shedding")
+    parser.add_argument("--no-answers", action="store_true", help="Benchmark retrieval only")
+    parser.add_argument("--strategy", choices=("source_cap", "mmr"), default="source_cap")
+    parser.add_argument("--rerank", action="store_true", help="Add the cross-encoder (needs sentence-transformers)")
+    parser.add_argument("--hybrid", action="store_true", help="Fuse BM25 results")
+    parser.add_argument("--cache", action="store_true", help="Enable the embedding and results caches")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+
+    corpus = SyntheticCorpus(scale=args.scale, seed=args.seed)
+    encoder = FakeEncoder() if args.encoder == "fake" else load_encoder(args.encoder)
+    started = time.perf_counter()
+    index = build_index(args.index, corpus, encoder, args.index_latency_ms, args.index_jitter_ms,
+                        quantization=args.quantization, tail_ms=args.index_tail_ms,
+                        tail_probability=args.index_tail_prob)
+    print(f"indexed {sum(count for _, _, count in corpus.documents())} chunks in {time.perf_counter() - started:.1f} s")
+    llm = FakeLLM(
+        args.llm_ttft_ms, args.llm_tokens_per_second, args.answer_tokens, seed=args.seed,
+        models={FAST_MODEL: {"ttft_ms": args.llm_ttft_ms / args.fast_speedup,
+                             "tokens_per_second": args.llm_tokens_per_second * args.fast_speedup}},
+        requests_per_minute=args.llm_rpm, tokens_per_minute=args.llm_tpm, window_seconds=args.llm_window,
+        tail_ms=args.llm_tail_ms, tail_probability=args.llm_tail_prob
+    )
+    pipeline = build_pipeline(args, corpus, encoder, index, llm)
+    rng = random.Random(args.seed)
+    queries = [
+        f"what is {text}" if rng.random() < args.definitional else text
+        for text, _ in corpus.queries(args.queries, seed=args.seed + 1)
+    ]
+
+    results = {}
+    for name in args.scenario:
+        traces, wall = run_scenario(
+            pipeline,
+            queries,
+            concurrency=args.concurrency if name == "concurrent" else 1,
+            filtered=name != "single",
+            answers=not args.no_answers,
+            seed=args.seed
+        )
+        results[name] = summarize(traces, wall)
+        print(format_table(name, results[name]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
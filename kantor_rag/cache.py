@@ -0,0 +1,148 @@
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(query):
+    """
+    Canonical form of a query for cache keys: case-folded, whitespace collapsed.
+    """
+    return " ".join(query.casefold().split())
+
+
+def embedding_key(vector):
+    """
+    Stable hash of an embedding, taken over its float32 bytes.
+    """
+    data = np.asarray(vector, dtype=np.float32).tobytes()
+    return hashlib.sha1(data).hexdigest()
+
+
+def filter_key(metadata_filter):
+    """
+    Stable string form of a Pinecone-style metadata filter (None for no filter).
+    """
+    return json.dumps(metadata_filter, sort_keys=True, ensure_ascii=False)
+
+
+# Charged for values of any other type, which are not walked
+OTHER_SIZE = 256
+_MATCH_FIELDS = ("id", "score", "metadata", "values")
+
+
+def approx_size(value):
+    """
+    Rough byte size of a cached value. Good enough to keep the cache bounded;
+    not meant to be exact. Only arrays, scalars, strings, containers and
+    matches (vectorstore.Match or Pinecone's ScoredVector) are measured;
+    other objects, such as SDK responses holding client references, count
+    as OTHER_SIZE.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if value is None or isinstance(value, (str, bytes, int, float, bool, np.generic)):
+        return sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(approx_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    if all(hasattr(value, field) for field in _MATCH_FIELDS):
+        return OTHER_SIZE + sum(approx_size(getattr(value, field)) for field in _MATCH_FIELDS)
+    return OTHER_SIZE
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL.
+    Bounded by entry count and, optionally, by the approximate byte size of
+    its values. Keeps hit/miss/eviction counters for reporting.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600, max_bytes=None, size_fn=approx_size):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires, size = entry
+            if expires is not None and expires < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = self.size_fn(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires, size)
+            self._bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes and self._bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for key, computing and storing it on a miss.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+
+_MISSING = object()
@@ -0,0 +1,154 @@
+import re
+
+
+# Document catalog: doc_type -> titles. Titles double as the `filename` metadata of each chunk.
+DOCUMENT_CATALOG = {
+    "Books": [
+        "1959.Interbehavioral Psychology - J. R. Kantor",
+        "A Survey of the Science of Psyc - J. R. Kantor",
+        "An Objective Psychology of Gram - J. R. Kantor",
+        "An Outline of Social Psychology - J. R. Kantor",
+        "Interbehavioral philosophy - J. R. Kantor",
+        "Linguistica Psicologica - J. R. Kantor",
+        "Principles of psychology Vol 1 - J. R. Kantor",
+        "Principles of psychology Vol 2 - J. R. Kantor",
+        "Psychological linguistics - J. R. Kantor",
+        "Psychology and Logic Vol 1 - J. R. Kantor",
+        "Psychology and Logic Vol 2 - J. R. Kantor",
+        "Sketch of J. R. Kantor's Psycho - J. R. Kantor",
+        "The Aim and Progress of Psychology and Other Sciences",
+        "The Scientific Evolution of Psychology Vol II",
+        "The Scientific evolution of Psy - J. R. Kantor",
+        "The logic of modern science",
+        "Un esbozo de Psicologia Social - J. R. Kantor",
+        "kantor psicologia interconductu - J. R. Kantor",
+        "the science of psychology an interbehavioral survey",
+    ],
+    "Articles": [
+        "1917 Intelligence and mental tests",
+        "1917. Discussion. Statistics of - J. R. Kantor",
+        "1917_The functional nature of the philosophical categories",
+        "1918_Conscious behavior and the abnormal",
+        "1918_The Ethics of Internationalism and the Individual",
+        "1919. Instrumental transformism - J. R. Kantor",
+        "1919_Human Personality and its Pathology",
+        "1919_Psychology as a science of critical evaluation",
+        "1920_A functional interpretation of human instincts",
+        "1920_Intelligence and Mental Tests",
+        "1920_Suggestions toward a scientific interpretation of perception",
+        "1921_An Objective Interpretation of Meanings",
+        "1921_An attempt toward a naturalistic description of emotions I",
+        "1921_An attempt toward a naturalistic description of emotions II",
+        "1921_Association as a fundamental process of objective psychology",
+        "1921_How do we acquire our basic reactions",
+        "1922 - American Journal of Sociology - Kantor - An Essay Toward an Institutional Conception of Social Psychology",
+        "1922 Can the psychophysical experiment reconcile introspectionists and relativists",
+        "1922_An analysis of psychological language data",
+        "1922_An essay toward an institutional conception of social psychology",
+        "1922_How is a science of social psychology possible",
+        "1922_The Nervous System, Psychological Fact or Fiction",
+        "1922_The Psychology of Reflex Action",
+        "1922_The integrative character of habits",
+        "1923_An objective analysis of volitional behavior",
+        "1923_The Institutional Foundation of a Scientific Social Psychology",
+        "1923_The problem of instinct and its relation to social psychology",
+        "1923_The psychology of feeling or affective reactions",
+        "1925_Anthropology, race, psychiatry, and culture",
+        "1925_The Significance of the Gestalt Conception in Psychology",
+        "1928 Can psychology contribute to the study of linguistics",
+        "1931_Contributions of the Laboratory of Psychology and Biology - Book review",
+        "1933_In defense of stimulus-response psychology",
+        "1935_James Mark Baldwin Columbia, S. C., 1861--Paris, France, 1934",
+        "1935_The evolution of mind",
+        "1936 Concerning Physical Analogies in Psychology",
+        "1938_Character and personality. Their nature and interrelations",
+        "1938_The nature of psychology as a natural science",
+        "1938_The operational principle in the physical and psychological sciences",
+        "1939_The current situation in social psychology",
+        "1941_Current trends in psychological theory",
+        "1942_Toward a scientific analysis of motivation",
+        "1945_Problems and paradoxes of physiological psychology",
+        "1956_Interbehavioral psychology and scientific analysis of data and operations",
+        "1957_Events and constructs in the science of psychology",
+        "1959_Evolution and the science of psychology",
+        "1960_History of science as scientific method",
+        "1962_Psychology Scientific status-seeker",
+        "1963_Behaviorism whose image",
+        "1964_History of psychology What benefits",
+        "1968_Behaviorism in the history of psychology",
+        "1969_Scientific psychology and specious philosophy",
+        "1970_An analysis of the experimental analysis of behavior (TEAB)",
+        "1970_Innate intelligence Another genetic avatar",
+        "1970_Newton's influence on the development of psychology",
+        "1971_Revivalism in psychology",
+        "1973_Private data, raw feels, inner experience, and all that",
+        "1973_System structure and scientific psychology",
+        "1973_The hereditarian manifesto (politics in psychology)",
+        "1974_Eppur si muove",
+        "1974_Lest we forget",
+        "1974_The role of chemistry in the domain of psychology",
+        "1974_[errata]Eppur Si muove",
+        "1975 La lingüística psicológica",
+        "1975_Education in psychological perspective",
+        "1975_In dispraise of indiscrimination",
+        "1975_On reviewing psychological classics",
+        "1976_Behaviorism, behavior analysis, and the career of psychology",
+        "1976_Cultural institutions and psychological institutions",
+        "1976_What meaning means in linguistics",
+        "1978 Experimentation the ACME of science",
+        "1978_Cognition as events and as psychic constructions",
+        "1978_Man and machines in psychology Cybernetics and artificial intelligence",
+        "1979_Psychology Science or nonscience",
+        "1980 Manifiesto de la psicologia int - J. R. Kantor",
+        "1980_Manifesto of interbehavioral psychology",
+        "1980_Theological psychology vs. scientific psychology",
+        "1981 Axioms and their role in psychology",
+        "1981 reflections upon speech and language",
+        "1981_Interbehavioral psychology and the logic of science",
+        "1981_Surrogation A process in psychological evolution",
+        "1982 Objectivity and subjectivity in science and psychology",
+        "1982_Psychological retardation and interbehavioral maladjustments",
+        "1983 Explanation psychological natur - J. R. Kantor",
+        "1984_Scientific unity and spiritistic disunity",
+        "1984_The relation of scientists to events in physics and in psychology",
+    ],
+    "Reviews": [
+        "1925_[Review of] Lucien Levy-Bruhl.Primitive Mentality",
+        "1934_[Review of] Hartshorne, C. The philosophy and psychology of sensation",
+        "1936_[Review of] Gestalt Psychology A Survey of Facts and Principles",
+        "1937_[Review of] Holmes, R. W. The idealism of Giovanni Gentile",
+        "1937_[Review of] Langer, S. K. An introduction to symbolic logic",
+        "1938_[Review of] Burloud, A. Principe d'une psychologie des tendances",
+        "1938_[Review of] Dantzig, T. Aspects of science",
+        "1938_[Review of] Köhler, W. The place of value in the world of facts",
+        "1939_[Review of] Gray, L. H. Foundations of Language",
+        "1939_[Review of] Moore, T. V. Cognitive psychology",
+        "1939_[Review of] What Man Has Made of Man A Study of the Consequences of Platonism and Positivism in Psychology",
+        "1940_[Review of] Eddington, S. A. The philosophy of physical science",
+        "1941_[Review of] Wood, L. The analysis of knowledge",
+        "1943_[Review of] Thorndike, E. L. Man and his works",
+        "1943_[Review of] Tolman, E. C. Drives toward war",
+        "1944_[Review of] Hunt, J. M. (Ed.). Personality and the behavior disorders A handbook based on experimental and clinical research",
+        "1954_[Review of] Bentley, A. F. Inquiry into inquiries Essays in social theory",
+        "1966_[Review of] Alexander, F.; Eisenstein, S.; & Grotjahn, M. (Eds.). Psychoanalytic pioneers",
+        "1966_[Review of] Platt, J. R. (Ed.). New views of the nature of man",
+        "1968_[Review of] Watson, R. I. The great psychologists From Aristotle to Freud.",
+    ],
+}
+
+
+def catalog_entries():
+    """
+    Yield (doc_type, title) for every document in the catalog.
+    """
+    for doc_type, titles in DOCUMENT_CATALOG.items():
+        for title in titles:
+            yield doc_type, title
+
+
+def title_year(title):
+    """
+    Publication year from the leading digits of a title ("1921_An Objective ..."), or 0.
+    """
+    match = re.match(r"\s*(1[89]\d\d|20\d\d)", title)
+    return int(match.group(1)) if match else 0
@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import threading
+import zlib
+
+from kantor_rag.cache import LRUCache
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_CHUNK_STORE = os.path.join("index", "chunks.sqlite3")
+
+# Codec stored with each row; zlib rows stay readable without zstandard installed
+ZLIB = 1
+ZSTD = 2
+
+
+class ChunkStore:
+    """
+    Chunk texts keyed by chunk id, compressed (zstd when the zstandard
+    package is installed, zlib otherwise) in SQLite, with an in-process LRU
+    of decompressed texts.
+
+    With a chunk store, vector metadata carries only the light fields
+    (filename, doc_type, page, year), so queries transfer no text; the
+    pipeline loads text for the few chunks that reach the prompt.
+    """
+
+    def __init__(self, path=DEFAULT_CHUNK_STORE, cache_size=4096, level=9):
+        self.path = path
+        self.level = level
+        self.cache = LRUCache(maxsize=cache_size, ttl=None)
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY,
+                codec INTEGER NOT NULL,
+                data BLOB NOT NULL
+            )
+        """)
+        self._conn.commit()
+        if zstandard is not None:
+            self._compressor = zstandard.ZstdCompressor(level=level)
+            self._decompressor = zstandard.ZstdDecompressor()
+
+    def _compress(self, text):
+        data = text.encode("utf-8")
+        if zstandard is not None:
+            return ZSTD, self._compressor.compress(data)
+        return ZLIB, zlib.compress(data, self.level)
+
+    def _decompress(self, codec, data):
+        if codec == ZSTD:
+            if zstandard is None:
+                raise RuntimeError(f"{self.path} holds zstd-compressed chunks; install zstandard to read them")
+            return self._decompressor.decompress(data).decode("utf-8")
+        return zlib.decompress(data).decode("utf-8")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def put_many(self, items):
+        """
+        Insert or replace (chunk_id, text) pairs.
+        """
+        rows = [(chunk_id,) + self._compress(text) for chunk_id, text in items]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (id, codec, data) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+        for chunk_id, _, _ in rows:
+            self.cache.discard(chunk_id)
+
+    def get_many(self, ids):
+        """
+        Return {chunk_id: text} for the ids that exist.
+        """
+        texts = {}
+        missing = []
+        for chunk_id in ids:
+            text = self.cache.get(chunk_id)
+            if text is None:
+                missing.append(chunk_id)
+            else:
+                texts[chunk_id] = text
+        # SQLite caps bound parameters per statement; 500 stays well under every build's limit
+        for start in range(0, len(missing), 500):
+            batch = missing[start:start + 500]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, codec, data FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+            for chunk_id, codec, data in rows:
+                text = self._decompress(codec, data)
+                self.cache.set(chunk_id, text)
+                texts[chunk_id] = text
+        return texts
+
+    def delete(self, ids):
+        ids = list(ids)
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+            self._conn.commit()
+        for chunk_id in ids:
+            self.cache.discard(chunk_id)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+        self.cache.clear()
+
+    def stats(self):
+        with self._lock:
+            count, stored = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM chunks").fetchone()
+        return dict(self.cache.stats(), chunks=count, stored_bytes=stored)
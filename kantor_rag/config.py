@@ -0,0 +1,34 @@
+import os
+
+
+def get_setting(name, default=None):
+    """
+    Look up a setting in the environment first, then in Streamlit secrets.
+    Works outside Streamlit too (CLI tools), where only the environment is used.
+    """
+    if name in os.environ:
+        return os.environ[name]
+    try:
+        import streamlit as st
+        return st.secrets.get(name, default)
+    except Exception:
+        return default
+
+
+def get_int(name, default):
+    value = get_setting(name)
+    return default if value in (None, "") else int(value)
+
+
+def get_float(name, default):
+    value = get_setting(name)
+    return default if value in (None, "") else float(value)
+
+
+def get_bool(name, default):
+    value = get_setting(name)
+    if value in (None, ""):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,169 @@
+import re
+
+# Sentence boundary: end punctuation followed by whitespace and an upper-case letter, digit or quote
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+(?=[\"'(\[A-Z0-9])")
+_WORD = re.compile(r"\w+", re.UNICODE)
+_TOKEN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "does", "for", "from", "how", "in", "is",
+    "it", "kantor", "kantor's", "of", "on", "or", "that", "the", "this", "to", "what", "when",
+    "where", "which", "who", "why", "with",
+}
+
+
+class TokenCounter:
+    """
+    Counts tokens with a local tokenizer: a Hugging Face transformers tokenizer
+    (SentenceTransformer.tokenizer) or a tokenizers.Tokenizer (OnnxEncoder).
+    It is not the LLM's own tokenizer, so counts are an estimate; without a
+    tokenizer a word/punctuation regex is used instead.
+    """
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer
+
+    def count(self, text):
+        return self.count_many([text])[0]
+
+    def count_many(self, texts):
+        if not texts:
+            return []
+        if self.tokenizer is None:
+            return [len(_TOKEN.findall(text)) for text in texts]
+        if hasattr(self.tokenizer, "encode_batch"):
+            return [len(encoding.ids) for encoding in self.tokenizer.encode_batch(list(texts), add_special_tokens=False)]
+        encoded = self.tokenizer(
+            list(texts),
+            add_special_tokens=False,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False
+        )
+        return [len(ids) for ids in encoded["input_ids"]]
+
+
+def split_sentences(text):
+    return [sentence for sentence in _SENTENCE_END.split(text.strip()) if sentence]
+
+
+def query_terms(query):
+    return {word for word in _WORD.findall(query.lower()) if word not in _STOPWORDS}
+
+
+def trim_to_budget(text, query, budget, counter):
+    """
+    Shorten text to at most budget tokens, keeping a contiguous run of
+    sentences centred on the one that shares the most terms with the query.
+    Cut ends are marked with an ellipsis, counted in the budget.
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        return ""
+    limit = budget
+    # Room for an ellipsis at both ends
+    budget = max(1, budget - 2 * counter.count("…"))
+    lengths = counter.count_many(sentences)
+    terms = query_terms(query)
+    overlap = [len(terms & set(_WORD.findall(sentence.lower()))) for sentence in sentences]
+
+    best = max(range(len(sentences)), key=lambda i: overlap[i])
+    if lengths[best] > budget:
+        # A single sentence over budget: keep its leading words
+        words = sentences[best].split()
+        keep = max(1, len(words) * budget // max(lengths[best], 1))
+        trimmed = " ".join(words[:keep]) + " …"
+        # Word counts only approximate token counts; shrink until it fits
+        used = counter.count(trimmed)
+        while used > limit and keep > 1:
+            keep = max(1, min(keep - 1, keep * limit // used))
+            trimmed = " ".join(words[:keep]) + " …"
+            used = counter.count(trimmed)
+        return trimmed
+
+    start, end, used = best, best + 1, lengths[best]
+    while True:
+        left = start - 1 if start > 0 and used + lengths[start - 1] <= budget else None
+        right = end if end < len(sentences) and used + lengths[end] <= budget else None
+        if left is None and right is None:
+            break
+        # Grow towards the more query-relevant neighbour; on a tie, keep the window centred
+        if right is not None and (
+            left is None
+            or overlap[right] > overlap[left]
+            or (overlap[right] == overlap[left] and end - best <= best - start)
+        ):
+            used += lengths[right]
+            end += 1
+        else:
+            used += lengths[left]
+            start -= 1
+
+    parts = []
+    if start > 0:
+        parts.append("…")
+    parts.extend(sentences[start:end])
+    if end < len(sentences):
+        parts.append("…")
+    return " ".join(parts)
+
+
+def build_context(query, matches, counter, token_budget=3000, max_chunk_tokens=512, min_chunk_tokens=48):
+    """
+    Pack match texts into the LLM context under a token budget.
+
+    Chunks are admitted in the order of matches, which is their rank (by
+    vector score, reciprocal-rank fusion, the cross-encoder or MMR); a chunk
+    longer than max_chunk_tokens, or than what is left of the budget, is
+    trimmed around its most query-relevant sentences, or dropped if that
+    would leave it shorter than min_chunk_tokens. Admitted chunks are
+    numbered 1..N in that order, as [Source N: filename, p.X].
+
+    Returns (context, source_references, sources).
+    """
+    entries = []
+    for match in matches:
+        metadata = match.metadata
+        filename = metadata.get("filename", "Unknown")
+        page = metadata.get("page", "?")
+        entries.append({
+            "id": match.id,
+            "file": filename,
+            "title": filename,
+            "type": metadata.get("doc_type", ""),
+            "page": page,
+            "year": metadata.get("year", 0),
+            "score": match.score,
+            "text": metadata.get("text", ""),
+        })
+
+    text_tokens = counter.count_many([entry["text"] for entry in entries])
+    # Headers are numbered after packing; "[Source 10: ..." is the widest they get
+    header_tokens = counter.count_many([f"[Source 10: {entry['file']}, p.{entry['page']}]" for entry in entries])
+
+    remaining = token_budget
+    packed = {}
+    for i, entry in enumerate(entries):
+        if not entry["text"].strip():
+            continue
+        room = min(max_chunk_tokens, remaining - header_tokens[i])
+        if text_tokens[i] <= room:
+            packed[i] = entry["text"]
+            remaining -= header_tokens[i] + text_tokens[i]
+        elif room >= min_chunk_tokens:
+            trimmed = trim_to_budget(entry["text"], query, room, counter)
+            packed[i] = trimmed
+            remaining -= header_tokens[i] + counter.count(trimmed)
+
+    context_parts = []
+    reference_parts = []
+    sources = []
+    for i, entry in enumerate(entries):
+        if i not in packed:
+            continue
+        num = len(sources) + 1
+        context_parts.append(f"\n[Source {num}: {entry['file']}, p.{entry['page']}]\n{packed[i]}\n")
+        reference_parts.append(f"- Source {num}: {entry['file']}, page {entry['page']}\n")
+        sources.append(dict(entry, num=num))
+
+    return "".join(context_parts), "".join(reference_parts), sources
@@ -0,0 +1,211 @@
+"""
+Latency budgets and hedged calls for the pipeline.
+
+A Deadline is the end-to-end budget of one request. Each stage asks it for
+its timeout: the time left overall, capped by the stage's own limit
+(stage_timeouts, e.g. {"vector_query": 5, "llm_ttft": 8}). A stage that runs
+out raises DeadlineExceeded, and the callers fall back to showing the
+ranked sources without an answer.
+
+A Hedger runs a call and, if it has not returned after the recent p95
+latency of that call, starts an identical one; the first to succeed wins.
+With hedging at p95 about one call in twenty is duplicated, and the slow
+tail of the backend stops being the tail of the request. The delay runs
+from when the first attempt starts, not from when it was queued, and
+hedges are capped to a share of recent calls and skipped while the pool
+has a backlog, so a saturated backend is not sent twice the load.
+"""
+import collections
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+from kantor_rag.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+HEDGES = REGISTRY.counter(
+    "kantor_hedges_total", "Hedged calls: fired, won by the hedge, or skipped over the hedge budget.", ("outcome",)
+)
+DEADLINES_EXCEEDED = REGISTRY.counter(
+    "kantor_deadline_exceeded_total", "Requests whose latency budget ran out, by stage.", ("stage",)
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    A stage ran past its deadline.
+    """
+
+    def __init__(self, stage):
+        super().__init__(f"{stage} ran past its deadline")
+        self.stage = stage
+
+
+def give_up(stage):
+    """
+    Count a stage giving up on its deadline and return the DeadlineExceeded to raise.
+    Only the places that stop waiting call this, so re-raising one is not counted again.
+    """
+    DEADLINES_EXCEEDED.inc(stage=stage)
+    return DeadlineExceeded(stage)
+
+
+class Deadline:
+    """
+    Latency budget of one request, in seconds from creation (None: unbounded),
+    with optional per-stage caps.
+    """
+
+    def __init__(self, budget=None, stage_timeouts=None):
+        self.budget = budget
+        self.stage_timeouts = stage_timeouts or {}
+        self.started = time.monotonic()
+
+    def remaining(self):
+        """
+        Seconds left, or None without a budget.
+        """
+        if self.budget is None:
+            return None
+        return max(0.0, self.budget - (time.monotonic() - self.started))
+
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def timeout(self, stage):
+        """
+        Seconds the stage may take: the time left, capped by the stage's own limit. None when unbounded.
+        """
+        limits = [t for t in (self.remaining(), self.stage_timeouts.get(stage)) if t is not None]
+        return min(limits) if limits else None
+
+
+def call_with_timeout(executor, fn, timeout, stage):
+    """
+    Run fn on executor and wait at most timeout seconds for it. On timeout
+    fn keeps running in the background (a blocking client call can't be
+    interrupted) and DeadlineExceeded is raised.
+    """
+    if timeout is None:
+        return fn()
+    future = executor.submit(fn)
+    done, _ = wait([future], timeout=timeout)
+    if not done:
+        raise give_up(stage)
+    return future.result()
+
+
+class Hedger:
+    """
+    Hedged calls: when the first attempt has not returned after the
+    quantile of recent latencies (initial_delay until min_samples are in),
+    counted from when it started running, a second one starts and the
+    first to succeed is returned. At most max_hedge_ratio of the last
+    window calls are hedged, and none while every worker is busy.
+    """
+
+    def __init__(self, quantile=0.95, window=256, min_samples=20, initial_delay=0.25, min_delay=0.005, max_workers=16,
+                 max_hedge_ratio=0.05):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_workers = max_workers
+        self.max_hedge_ratio = max_hedge_ratio
+        self._latencies = collections.deque(maxlen=window)
+        # Whether each of the last window calls was hedged
+        self._recent = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="hedge")
+        # Attempts submitted and not finished, queued or running
+        self._outstanding = 0
+        self.fired = 0
+        self.won = 0
+        self.skipped = 0
+
+    def delay(self):
+        with self._lock:
+            samples = list(self._latencies)
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, float(np.percentile(samples, self.quantile * 100)))
+
+    def _submit(self, fn, started=None):
+        with self._lock:
+            self._outstanding += 1
+        return self._executor.submit(self._timed, fn, started)
+
+    def _timed(self, fn, started=None):
+        began = time.monotonic()
+        if started is not None:
+            started.set()
+        try:
+            result = fn()
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+        with self._lock:
+            self._latencies.append(time.monotonic() - began)
+        return result
+
+    def _may_hedge(self):
+        """
+        Whether a hedge fits the budget: a free worker, and under max_hedge_ratio of recent calls hedged.
+        Called with the lock held.
+        """
+        if self._outstanding >= self.max_workers:
+            return False
+        return sum(self._recent) + 1 <= self.max_hedge_ratio * len(self._recent)
+
+    def call(self, fn, timeout=None, stage="hedged_call"):
+        """
+        Return (result, hedged, hedge_won). Raises DeadlineExceeded when
+        neither attempt returns within timeout, or the first error when both fail.
+        """
+        ends = None if timeout is None else time.monotonic() + timeout
+
+        def left():
+            return None if ends is None else max(0.0, ends - time.monotonic())
+
+        started = threading.Event()
+        primary = self._submit(fn, started)
+        delay = self.delay()
+        # Time spent queued for a worker is not backend latency; the delay starts with the call
+        if started.wait(left()):
+            wait([primary], timeout=delay if ends is None else min(delay, left()))
+        pending = {primary}
+        hedged = False
+        if not primary.done() and (ends is None or left() > 0):
+            with self._lock:
+                hedged = self._may_hedge()
+                if hedged:
+                    self.fired += 1
+                else:
+                    self.skipped += 1
+            if hedged:
+                pending.add(self._submit(fn))
+                HEDGES.inc(outcome="fired")
+            else:
+                HEDGES.inc(outcome="skipped")
+        with self._lock:
+            self._recent.append(hedged)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=left(), return_when=FIRST_COMPLETED)
+            if not done:
+                raise give_up(stage)
+            for future in done:
+                if future.exception() is None:
+                    won = future is not primary
+                    if won:
+                        with self._lock:
+                            self.won += 1
+                        HEDGES.inc(outcome="won")
+                    return future.result(), hedged, won
+                error = error or future.exception()
+        raise error
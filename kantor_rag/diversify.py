@@ -0,0 +1,83 @@
+from collections import defaultdict
+
+import numpy as np
+
+# Strategies selectable through DIVERSIFY_STRATEGY
+STRATEGIES = ("source_cap", "mmr")
+
+
+def diversify_results(matches, max_per_source=2):
+    """
+    Limit results to max N chunks per source document.
+    Keeps the highest-scoring chunks from each source.
+    Results are already sorted by score (highest first) from Pinecone.
+    """
+    source_counts = defaultdict(int)
+    diversified = []
+
+    for match in matches:
+        source = match.metadata.get('filename', 'Unknown')
+
+        if source_counts[source] < max_per_source:
+            diversified.append(match)
+            source_counts[source] += 1
+
+    return diversified
+
+
+def mmr_diversify(matches, query_vector, k=10, lambda_mult=0.7, max_per_source=2, relevance=None):
+    """
+    Maximal marginal relevance over the match vectors (query with include_values=True).
+    Each step picks the candidate maximizing
+        lambda_mult * rel(c) - (1 - lambda_mult) * max sim(c, already picked)
+    so near-duplicate chunks are skipped even when they come from different
+    documents. rel(c) is relevance[c] when given (the cross-encoder scores
+    of reranked matches), else sim(query, c). The per-source cap still
+    applies. Falls back to diversify_results when the matches carry no vectors.
+    """
+    if not matches or any(len(match.values) == 0 for match in matches):
+        return diversify_results(matches, max_per_source)[:k]
+
+    vectors = np.asarray([match.values for match in matches], dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    if relevance is None:
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+        relevance = vectors @ query
+    else:
+        relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = vectors @ vectors.T
+    sources = np.array([match.metadata.get("filename", "Unknown") for match in matches], dtype=object)
+
+    available = np.ones(len(matches), dtype=bool)
+    redundancy = np.full(len(matches), -np.inf, dtype=np.float32)
+    source_counts = defaultdict(int)
+    selected = []
+
+    while len(selected) < k and available.any():
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+        source_counts[sources[best]] += 1
+        if source_counts[sources[best]] >= max_per_source:
+            available &= sources != sources[best]
+
+    return [matches[i] for i in selected]
+
+
+def diversify(matches, strategy="source_cap", query_vector=None, k=10, max_per_source=2, lambda_mult=0.7,
+              relevance=None):
+    """
+    Pick the k matches to send to the LLM with the configured strategy.
+    """
+    if strategy == "mmr":
+        return mmr_diversify(matches, query_vector, k, lambda_mult, max_per_source, relevance)
+    if strategy == "source_cap":
+        return diversify_results(matches, max_per_source)[:k]
+    raise ValueError(f"Unknown diversification strategy: {strategy}")
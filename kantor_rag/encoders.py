@@ -0,0 +1,217 @@
+"""
+Query/chunk encoders: the PyTorch SentenceTransformer, or an exported ONNX
+Runtime model (optionally int8-quantized) producing the same embeddings.
+
+    python -m kantor_rag.encoders export models/minilm-onnx [--no-quantize]
+    python -m kantor_rag.encoders check models/minilm-onnx [--quantized]
+
+Export needs torch and transformers; serving with ENCODER_BACKEND="onnx"
+needs only onnxruntime and tokenizers.
+"""
+import argparse
+import logging
+import os
+import sys
+
+import numpy as np
+
+from kantor_rag.config import get_setting, get_bool, get_int
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+HF_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+# SentenceTransformer's max_seq_length for all-MiniLM-L6-v2
+MAX_SEQ_LENGTH = 256
+
+DEFAULT_ONNX_DIR = os.path.join("models", "minilm-onnx")
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+
+
+class OnnxEncoder:
+    """
+    all-MiniLM-L6-v2 on ONNX Runtime: transformer forward pass, attention-masked
+    mean pooling and L2 normalization, matching the SentenceTransformer
+    pipeline. encode() accepts the same arguments the app and ingestion use;
+    embeddings are always normalized, as the SentenceTransformer's are.
+    """
+
+    def __init__(self, model_dir=DEFAULT_ONNX_DIR, quantized=False, threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+        # Plain tokenizer for callers counting tokens; the model's copy truncates and pads
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self._model_tokenizer = Tokenizer.from_file(tokenizer_path)
+        self._model_tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self._model_tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        path = os.path.join(model_dir, ONNX_INT8_FILE if quantized else ONNX_FILE)
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, show_progress_bar=False,
+               normalize_embeddings=True):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        # Length-sorted batches keep padding, and so wasted compute, small
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self._encode_batch([texts[i] for i in rows])
+        return embeddings[0] if single else embeddings
+
+    def _encode_batch(self, texts):
+        encodings = self._model_tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, feeds)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+
+def load_encoder(backend=None, threads=None):
+    """
+    Build the encoder selected by ENCODER_BACKEND ("torch" or "onnx").
+    """
+    backend = backend or get_setting("ENCODER_BACKEND", "torch")
+    threads = threads or get_int("ENCODER_THREADS", 0) or None
+    if backend == "onnx":
+        return OnnxEncoder(
+            get_setting("ONNX_MODEL_DIR", DEFAULT_ONNX_DIR),
+            quantized=get_bool("ONNX_QUANTIZED", True),
+            threads=threads
+        )
+    if backend == "torch":
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            torch.set_num_threads(threads)
+        return SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    raise ValueError(f"Unknown ENCODER_BACKEND: {backend}")
+
+
+def encoder_settings(backend=None):
+    """
+    What determines the embeddings load_encoder(backend) produces, for the ingestion manifest.
+    """
+    backend = backend or get_setting("ENCODER_BACKEND", "torch")
+    if backend == "onnx":
+        return {"encoder_backend": backend, "onnx_quantized": get_bool("ONNX_QUANTIZED", True)}
+    return {"encoder_backend": backend}
+
+
+def export_onnx(out_dir, quantize=True):
+    """
+    Export the Hugging Face transformer behind all-MiniLM-L6-v2 to ONNX and,
+    optionally, a dynamically int8-quantized copy of it.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_ID)
+    model = AutoModel.from_pretrained(HF_MODEL_ID).eval()
+    tokenizer.save_pretrained(out_dir)
+
+    sample = tokenizer(["an interbehavioral field"], return_tensors="pt")
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            os.path.join(out_dir, ONNX_FILE),
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": dynamic,
+                "attention_mask": dynamic,
+                "token_type_ids": dynamic,
+                "last_hidden_state": dynamic,
+            },
+            opset_version=14,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(
+            os.path.join(out_dir, ONNX_FILE),
+            os.path.join(out_dir, ONNX_INT8_FILE),
+            weight_type=QuantType.QInt8
+        )
+
+
+def agreement(encoder, reference, sentences):
+    """
+    Cosine similarity between two encoders' embeddings of each sentence.
+    """
+    a = np.asarray(encoder.encode(sentences, batch_size=32), dtype=np.float32)
+    b = np.asarray(reference.encode(sentences, batch_size=32, convert_to_numpy=True), dtype=np.float32)
+    a /= np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b /= np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return (a * b).sum(axis=1)
+
+
+def check_sentences():
+    """
+    Sentences for the agreement check: catalog titles plus typical questions.
+    """
+    from kantor_rag.catalog import catalog_entries
+    questions = [
+        "What is an interbehavioral field?",
+        "How does Kantor define setting factors?",
+        "What is surrogation?",
+        "Kantor's critique of the nervous system as a psychological fact",
+        "Psychological linguistics and the nature of referential behavior",
+        "¿Qué es la psicología interconductual?",
+    ]
+    return questions + [title for _, title in catalog_entries()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export and check the ONNX query encoder.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Export all-MiniLM-L6-v2 to ONNX")
+    export.add_argument("out_dir", nargs="?", default=DEFAULT_ONNX_DIR)
+    export.add_argument("--no-quantize", action="store_true", help="Skip the int8 copy")
+    check = commands.add_parser("check", help="Compare ONNX embeddings with the PyTorch model")
+    check.add_argument("model_dir", nargs="?", default=DEFAULT_ONNX_DIR)
+    check.add_argument("--quantized", action="store_true", help="Check the int8 model")
+    check.add_argument("--min-cosine", type=float, help="Default: 0.999, or 0.98 for the int8 model")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.command == "export":
+        export_onnx(args.out_dir, quantize=not args.no_quantize)
+        args = argparse.Namespace(model_dir=args.out_dir, quantized=not args.no_quantize, min_cosine=None)
+    if args.min_cosine is None:
+        args.min_cosine = 0.98 if args.quantized else 0.999
+
+    sentences = check_sentences()
+    cosines = agreement(OnnxEncoder(args.model_dir, quantized=args.quantized), load_encoder("torch"), sentences)
+    logger.info(
+        "cosine agreement over %d sentences: min %.5f, mean %.5f",
+        len(sentences), float(cosines.min()), float(cosines.mean())
+    )
+    if cosines.min() < args.min_cosine:
+        worst = int(np.argmin(cosines))
+        logger.error("Below %.3f: %r (%.5f)", args.min_cosine, sentences[worst], float(cosines[worst]))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
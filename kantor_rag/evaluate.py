@@ -0,0 +1,269 @@
+"""
+Retrieval quality and latency evaluation over a labeled query set.
+
+    python -m kantor_rag.evaluate labeled.jsonl [--top-k 25 50] [--max-per-source 1 2 3]
+                                  [--final-k 5 10] [--strategy source_cap mmr]
+                                  [--retrieval dense hybrid] [--rerank off on] [--workers 4]
+    python -m kantor_rag.evaluate --synthetic 200 ...   # offline, on kantor_rag.fakes
+
+Each line of the labeled set is {"query": ..., "gold": [[filename, page], ...]},
+optionally with "doc_type" and "filename" filters. A source counts as relevant
+when its (filename, page) is in gold. For every combination of the swept
+parameters the final sources (what the LLM would see) are scored with
+recall@k, MRR and nDCG@k, next to search latency and prompt tokens. The
+table marks the Pareto-optimal configurations: no other one is at least as
+good on nDCG, p95 latency and tokens, and better on one of them.
+
+Configurations run in parallel (--workers); use --workers 1 when latency
+must not include contention between them.
+"""
+import argparse
+import csv
+import itertools
+import json
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from kantor_rag.cache import LRUCache
+from kantor_rag.config import get_setting
+from kantor_rag.context import TokenCounter
+from kantor_rag.lexical import DEFAULT_LEXICAL_DIR, BM25Index
+from kantor_rag.metrics import Trace
+from kantor_rag.pipeline import ALL_TYPES, Pipeline, build_messages, load_reranker
+
+logger = logging.getLogger(__name__)
+
+
+def page_key(page):
+    """
+    Page numbers compare as strings; Pinecone returns numeric metadata as floats (12.0).
+    """
+    try:
+        return str(int(float(page)))
+    except (TypeError, ValueError):
+        return str(page)
+
+
+def read_labeled(path):
+    """
+    Return [{"query", "doc_type", "title", "gold": {(filename, page)}}].
+    """
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            gold = set()
+            for item in row["gold"]:
+                if isinstance(item, dict):
+                    gold.add((item["filename"], page_key(item["page"])))
+                else:
+                    gold.add((item[0], page_key(item[1])))
+            queries.append({
+                "query": row["query"],
+                "doc_type": row.get("doc_type") or ALL_TYPES,
+                "title": row.get("filename") or row.get("title"),
+                "gold": gold,
+            })
+    return queries
+
+
+def recall_at_k(relevant, gold, k):
+    """
+    Share of the gold pairs found in the first k results; relevant holds each result's (filename, page).
+    """
+    if not gold:
+        return 0.0
+    return len(set(relevant[:k]) & gold) / len(gold)
+
+
+def reciprocal_rank(relevant, gold):
+    for rank, pair in enumerate(relevant, 1):
+        if pair in gold:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(relevant, gold, k):
+    """
+    Binary-gain nDCG; a gold pair counts once, at its first rank.
+    """
+    seen = set()
+    dcg = 0.0
+    for rank, pair in enumerate(relevant[:k], 1):
+        if pair in gold and pair not in seen:
+            seen.add(pair)
+            dcg += 1.0 / math.log2(rank + 1)
+    ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(len(gold), k) + 1))
+    return dcg / ideal if ideal else 0.0
+
+
+def evaluate_config(pipeline, queries, embeddings, k, counter):
+    """
+    Run every query through search; return per-query rows.
+    """
+    rows = []
+    for query, embedding in zip(queries, embeddings):
+        trace = Trace("evaluate")
+        result = pipeline.search(query["query"], query["doc_type"], query["title"], query_embedding=embedding,
+                                 trace=trace)
+        relevant = [(s["file"], page_key(s["page"])) for s in result.sources]
+        messages = build_messages(result.context, result.source_references, query["query"])
+        rows.append({
+            "recall": recall_at_k(relevant, query["gold"], k),
+            "mrr": reciprocal_rank(relevant, query["gold"]),
+            "ndcg": ndcg_at_k(relevant, query["gold"], k),
+            "latency_ms": trace.stages.get("search", 0.0) * 1000,
+            "tokens": sum(counter.count_many([m["content"] for m in messages])) if result.sources else 0,
+            "sources": len(result.sources),
+        })
+    return rows
+
+
+def summarize(config, rows):
+    latencies = [row["latency_ms"] for row in rows]
+    return dict(
+        config,
+        recall=round(float(np.mean([row["recall"] for row in rows])), 4),
+        mrr=round(float(np.mean([row["mrr"] for row in rows])), 4),
+        ndcg=round(float(np.mean([row["ndcg"] for row in rows])), 4),
+        p50_ms=round(float(np.percentile(latencies, 50)), 2),
+        p95_ms=round(float(np.percentile(latencies, 95)), 2),
+        tokens=round(float(np.mean([row["tokens"] for row in rows])), 1),
+        sources=round(float(np.mean([row["sources"] for row in rows])), 2),
+    )
+
+
+def pareto_front(results, quality="ndcg", costs=("p95_ms", "tokens")):
+    """
+    Mark each result with "pareto": True when no other result dominates it.
+    """
+    for result in results:
+        result["pareto"] = not any(
+            other is not result
+            and other[quality] >= result[quality]
+            and all(other[cost] <= result[cost] for cost in costs)
+            and (other[quality] > result[quality] or any(other[cost] < result[cost] for cost in costs))
+            for other in results
+        )
+    return results
+
+
+def grid(args):
+    keys = ("top_k", "max_per_source", "final_k", "strategy", "retrieval", "rerank")
+    values = (args.top_k, args.max_per_source, args.final_k, args.strategy, args.retrieval, args.rerank)
+    for combination in itertools.product(*values):
+        config = dict(zip(keys, combination))
+        # Candidates must cover what is kept
+        if config["final_k"] <= config["top_k"]:
+            yield config
+
+
+def run_grid(base, queries, configs, k=10, workers=4, lexical_index=None, reranker=None):
+    """
+    Evaluate each configuration on the labeled queries, in parallel; return summaries.
+    """
+    started = time.perf_counter()
+    embeddings = base.embed_many([q["query"] for q in queries], batch_size=64)
+    logger.info("embedded %d queries in %.1f s", len(queries), time.perf_counter() - started)
+    counter = TokenCounter(getattr(base.model, "tokenizer", None))
+
+    def run(config):
+        pipeline = base.with_options(
+            # Fresh, disabled results cache so every configuration pays its own retrieval
+            results_cache=LRUCache(maxsize=0),
+            answer_cache=None,
+            top_k=config["top_k"],
+            final_k=config["final_k"],
+            rerank_top_n=config["final_k"],
+            max_per_source=config["max_per_source"],
+            diversify_strategy=config["strategy"],
+            lexical_index=lexical_index if config["retrieval"] == "hybrid" else None,
+            reranker=reranker if config["rerank"] == "on" else None,
+        )
+        summary = summarize(config, evaluate_config(pipeline, queries, embeddings, k, counter))
+        logger.info("%s: nDCG %.3f, p95 %.1f ms", config, summary["ndcg"], summary["p95_ms"])
+        return summary
+
+    with ThreadPoolExecutor(max(1, workers)) as executor:
+        results = list(executor.map(run, configs))
+    return pareto_front(results)
+
+
+def format_table(results, k):
+    columns = ("top_k", "max_per_source", "final_k", "strategy", "retrieval", "rerank",
+               f"recall@{k}", "mrr", f"ndcg@{k}", "p50_ms", "p95_ms", "tokens", "pareto")
+    lines = ["  ".join(f"{c:>14}" for c in columns)]
+    for result in sorted(results, key=lambda r: (-r["pareto"], -r["ndcg"], r["p95_ms"])):
+        values = (result["top_k"], result["max_per_source"], result["final_k"], result["strategy"],
+                  result["retrieval"], result["rerank"], f"{result['recall']:.3f}", f"{result['mrr']:.3f}",
+                  f"{result['ndcg']:.3f}", f"{result['p50_ms']:.1f}", f"{result['p95_ms']:.1f}",
+                  f"{result['tokens']:.0f}", "*" if result["pareto"] else "")
+        lines.append("  ".join(f"{str(v):>14}" for v in values))
+    return "\n".join(lines)
+
+
+def synthetic_setup(n, seed=0):
+    """
+    Pipeline over the synthetic corpus, its BM25 index, and n labeled queries
+    whose gold pair is the chunk each query was drawn from.
+    """
+    from kantor_rag.fakes import FakeEncoder, FakeLLM, SyntheticCorpus, build_fake_index
+
+    corpus = SyntheticCorpus(scale=0.3, seed=seed)
+    encoder = FakeEncoder()
+    pipeline = Pipeline(build_fake_index(corpus, encoder), FakeLLM(), encoder)
+    lexical_index = BM25Index()
+    lexical_index.update(corpus.chunks())
+    queries = [
+        {"query": text, "doc_type": ALL_TYPES, "title": None, "gold": {(filename, page_key(page))}}
+        for text, (filename, page) in corpus.queries(n, seed=seed + 1)
+    ]
+    return pipeline, lexical_index, queries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep retrieval parameters against a labeled query set.")
+    parser.add_argument("labeled", nargs="?", help="JSONL with query and gold [[filename, page], ...]")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="Evaluate N synthetic queries on the fakes")
+    parser.add_argument("--k", type=int, default=10, help="Cutoff for recall@k and nDCG@k")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[25])
+    parser.add_argument("--max-per-source", type=int, nargs="+", default=[2])
+    parser.add_argument("--final-k", type=int, nargs="+", default=[10])
+    parser.add_argument("--strategy", nargs="+", choices=("source_cap", "mmr"), default=["source_cap"])
+    parser.add_argument("--retrieval", nargs="+", choices=("dense", "hybrid"), default=["dense"])
+    parser.add_argument("--rerank", nargs="+", choices=("off", "on"), default=["off"])
+    parser.add_argument("--workers", type=int, default=4, help="Configurations evaluated in parallel")
+    parser.add_argument("--csv", help="Also write the table to this CSV file")
+    args = parser.parse_args(argv)
+    if not args.labeled and not args.synthetic:
+        parser.error("give a labeled query file or --synthetic N")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.synthetic:
+        base, lexical_index, queries = synthetic_setup(args.synthetic)
+    else:
+        base = Pipeline.from_settings()
+        queries = read_labeled(args.labeled)
+        lexical_index = None
+        if "hybrid" in args.retrieval:
+            lexical_index = BM25Index(get_setting("LEXICAL_INDEX_DIR", DEFAULT_LEXICAL_DIR))
+    reranker = load_reranker() if "on" in args.rerank else None
+
+    results = run_grid(base, queries, list(grid(args)), k=args.k, workers=args.workers,
+                       lexical_index=lexical_index, reranker=reranker)
+    print(format_table(results, args.k))
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == "__main__":
+    main()
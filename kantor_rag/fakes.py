@@ -0,0 +1,426 @@
+"""
+Local stand-ins for Pinecone, Groq and the embedding model, for benchmarks
+and offline experiments:
+
+    SyntheticCorpus  chunks shaped like DOCUMENT_CATALOG (books, articles, reviews)
+    FakeEncoder      deterministic bag-of-words embeddings, optional latency
+    FakeIndex        in-memory VectorStore with Pinecone's query() signature,
+                     filters and a configurable network latency
+    FakeLLM          Groq-like client with configurable time to first token
+                     and token rate (per model), streamed or not, reporting
+                     usage and, optionally, enforcing Groq-style rate limits
+"""
+import hashlib
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from kantor_rag.catalog import catalog_entries, title_year
+from kantor_rag.encoders import EMBEDDING_DIM
+from kantor_rag.filters import FilterIndex, matches_filter
+from kantor_rag.vectorstore import Match, QueryResult, VectorStore
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_DOMAIN_WORDS = (
+    "interbehavior field stimulus response function setting factor organism object event behavior "
+    "psychology science logic linguistics reference referent speaker listener adjustment history "
+    "reactional biography contact medium implicit explicit perceiving knowing thinking feeling "
+    "remembering imagining learning habit attention discrimination surrogation naturalistic "
+    "mentalism dualism soul mind body nervous system physiology biology anthropology culture "
+    "institution language grammar meaning symbol sign word sentence proposition truth system "
+    "construction postulate hypothesis experiment observation data protopostulate metasystem "
+    "evolution history philosophy method analysis theory law principle specificity integration "
+    "segment interaction environment development infancy maturity personality social group "
+    "custom conventional idiosyncratic shared collective cultural abnormal pathology treatment"
+).split()
+
+_FILLER_WORDS = (
+    "the of and to in is that which as by for with it this be are not on or from an its at "
+    "such these their has have been was were upon also more than must all other only both"
+).split()
+
+# Chunks per document by type: (low, high), for 300-word chunks
+CHUNKS_PER_DOCUMENT = {"Books": (300, 900), "Articles": (15, 60), "Reviews": (3, 10)}
+
+
+def _seed(text):
+    return int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+
+
+class SyntheticCorpus:
+    """
+    Deterministic chunks with the ingestion metadata (filename, doc_type,
+    page, year, text) for every catalog document. scale multiplies the
+    per-document chunk counts; chunk_words is the words per chunk.
+    """
+
+    def __init__(self, scale=1.0, chunk_words=300, seed=0):
+        self.scale = scale
+        self.chunk_words = chunk_words
+        self.seed = seed
+        self.vocabulary = list(_DOMAIN_WORDS) + [f"{a}{b}" for a in _DOMAIN_WORDS[:40] for b in ("al", "ic", "ity", "ion")]
+
+    def documents(self):
+        rng = random.Random(self.seed)
+        for doc_type, title in catalog_entries():
+            low, high = CHUNKS_PER_DOCUMENT.get(doc_type, (10, 50))
+            yield doc_type, title, max(1, int(rng.randint(low, high) * self.scale))
+
+    def chunks(self):
+        """
+        Yield (chunk_id, text, metadata) tuples.
+        """
+        for doc_type, title, count in self.documents():
+            rng = random.Random(_seed(f"{self.seed}:{title}"))
+            topic = rng.sample(self.vocabulary, 40)
+            year = title_year(title)
+            for i in range(count):
+                metadata = {
+                    "filename": title,
+                    "doc_type": doc_type,
+                    "page": i // 2 + 1,
+                    "text": self._text(rng, topic),
+                }
+                if year:
+                    metadata["year"] = year
+                yield f"{_seed(title):016x}-{i:05d}", metadata["text"], metadata
+
+    def _text(self, rng, topic):
+        words = []
+        for _ in range(self.chunk_words):
+            roll = rng.random()
+            if roll < 0.45:
+                words.append(rng.choice(topic))
+            elif roll < 0.6:
+                words.append(rng.choice(self.vocabulary))
+            else:
+                words.append(rng.choice(_FILLER_WORDS))
+        sentences = []
+        for start in range(0, len(words), 15):
+            sentence = " ".join(words[start:start + 15])
+            sentences.append(sentence[:1].upper() + sentence[1:] + ".")
+        return " ".join(sentences)
+
+    def queries(self, n, seed=1, words=(3, 8)):
+        """
+        Query texts sampled from chunk texts, each with the (filename, page)
+        it was drawn from.
+        """
+        chunks = [(text, metadata) for _, text, metadata in self.chunks()]
+        rng = random.Random(seed)
+        queries = []
+        for _ in range(n):
+            text, metadata = rng.choice(chunks)
+            tokens = _WORD.findall(text.lower())
+            length = rng.randint(*words)
+            start = rng.randrange(max(1, len(tokens) - length))
+            queries.append((" ".join(tokens[start:start + length]), (metadata["filename"], metadata["page"])))
+        return queries
+
+
+class FakeEncoder:
+    """
+    Hashing bag-of-words encoder: every word maps to a fixed random vector and
+    a text embeds as the normalized sum of its words, so texts sharing words
+    are similar. latency_ms is paid per encode() call, plus per_item_ms per text.
+    """
+
+    tokenizer = None
+
+    def __init__(self, dim=EMBEDDING_DIM, latency_ms=0.0, per_item_ms=0.0):
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.per_item_ms = per_item_ms
+        self._vectors = {}
+        self._lock = threading.Lock()
+
+    def _word_vector(self, word):
+        vector = self._vectors.get(word)
+        if vector is None:
+            vector = np.random.default_rng(_seed(word)).standard_normal(self.dim).astype(np.float32)
+            with self._lock:
+                self._vectors[word] = vector
+        return vector
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, show_progress_bar=False,
+               normalize_embeddings=True):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if self.latency_ms or self.per_item_ms:
+            time.sleep((self.latency_ms + self.per_item_ms * len(texts)) / 1000)
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            if words:
+                unique, counts = np.unique(words, return_counts=True)
+                embeddings[row] = counts.astype(np.float32) @ np.stack([self._word_vector(w) for w in unique])
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
+
+class FakeIndex(VectorStore):
+    """
+    In-memory exact search behind Pinecone's query() signature and filter
+    syntax. Each call sleeps latency_ms (plus up to jitter_ms) to stand in
+    for the network round trip, and a tail_probability share of calls
+    another tail_ms, for a long tail.
+    """
+
+    def __init__(self, dimension=EMBEDDING_DIM, latency_ms=0.0, jitter_ms=0.0, seed=0, tail_ms=0.0,
+                 tail_probability=0.0):
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tail_ms = tail_ms
+        self.tail_probability = tail_probability
+        self._rng = random.Random(seed)
+        self.ids = []
+        self.metadata = []
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self._row = {}
+        self._filter_index = FilterIndex([])
+        self._lock = threading.Lock()
+        self.queries = 0
+
+    def _sleep(self):
+        with self._lock:
+            self.queries += 1
+            delay = self.latency_ms + self._rng.random() * self.jitter_ms
+            if self._rng.random() < self.tail_probability:
+                delay += self.tail_ms
+        if delay:
+            time.sleep(delay / 1000)
+
+    def query(self, vector, top_k=10, filter=None, include_metadata=True, include_values=False, namespace=""):
+        self._sleep()
+        if not self.ids:
+            return QueryResult([])
+        scores = self.vectors @ np.asarray(vector, dtype=np.float32)
+        if filter:
+            rows = self._filter_index.rows(filter)
+            if rows is None:
+                rows = np.array([i for i, m in enumerate(self.metadata) if matches_filter(m, filter)], dtype=np.int32)
+        else:
+            rows = np.arange(len(self.ids))
+        if len(rows) > top_k:
+            rows = rows[np.argpartition(-scores[rows], top_k - 1)[:top_k]]
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        return QueryResult([
+            Match(
+                self.ids[row],
+                float(scores[row]),
+                self.metadata[row] if include_metadata else {},
+                self.vectors[row].tolist() if include_values else []
+            )
+            for row in rows
+        ])
+
+    def upsert(self, items, batch_size=100):
+        items = list(items)
+        new_vectors = []
+        for chunk_id, values, metadata in items:
+            row = self._row.get(chunk_id)
+            if row is None:
+                self._row[chunk_id] = len(self.ids)
+                self.ids.append(chunk_id)
+                self.metadata.append(metadata)
+                new_vectors.append(values)
+            else:
+                self.vectors[row] = values
+                self.metadata[row] = metadata
+        if new_vectors:
+            self.vectors = np.vstack([self.vectors, np.asarray(new_vectors, dtype=np.float32)])
+        self._filter_index = FilterIndex(self.metadata)
+
+    def delete(self, ids):
+        drop = set(ids)
+        keep = [row for row, chunk_id in enumerate(self.ids) if chunk_id not in drop]
+        self.ids = [self.ids[row] for row in keep]
+        self.metadata = [self.metadata[row] for row in keep]
+        self.vectors = self.vectors[keep]
+        self._row = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self._filter_index = FilterIndex(self.metadata)
+
+    def clear(self):
+        self.delete(list(self.ids))
+
+    def fetch(self, ids):
+        self._sleep()
+        return {
+            chunk_id: Match(chunk_id, 0.0, self.metadata[self._row[chunk_id]], self.vectors[self._row[chunk_id]].tolist())
+            for chunk_id in ids if chunk_id in self._row
+        }
+
+    def version(self):
+        return f"fake-{len(self.ids)}"
+
+
+def index_corpus(store, corpus, encoder, batch_size=1000):
+    """
+    Embed the corpus chunks with encoder and upsert them into store.
+    """
+    batch = []
+    for chunk in corpus.chunks():
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            _upsert_batch(store, encoder, batch)
+            batch = []
+    if batch:
+        _upsert_batch(store, encoder, batch)
+    store.flush()
+    return store
+
+
+def _upsert_batch(store, encoder, batch):
+    vectors = encoder.encode([text for _, text, _ in batch], batch_size=64)
+    store.upsert([(chunk_id, vector, metadata) for (chunk_id, _, metadata), vector in zip(batch, vectors)])
+
+
+def build_fake_index(corpus, encoder, **kwargs):
+    """
+    FakeIndex holding the corpus, embedded with encoder.
+    """
+    return index_corpus(FakeIndex(dimension=getattr(encoder, "dim", EMBEDDING_DIM), **kwargs), corpus, encoder)
+
+
+class FakeRateLimitError(Exception):
+    """
+    Shaped like groq.RateLimitError: status_code 429 and a response carrying the headers.
+    """
+    status_code = 429
+
+    def __init__(self, message, headers):
+        super().__init__(message)
+        self.response = SimpleNamespace(status_code=429, headers=headers)
+
+
+class FakeLLM:
+    """
+    Groq-shaped chat client: client.chat.completions.create(model, messages,
+    stream=...). Answers are answer_tokens filler words citing [Source 1];
+    the first token arrives after ttft_ms, the rest at tokens_per_second.
+    Usage is reported like Groq's (x_groq.usage on the last streamed chunk).
+
+    A tail_probability share of completions waits another tail_ms before
+    the first token. models overrides ttft_ms and tokens_per_second per
+    model name. With
+    requests_per_minute or tokens_per_minute, each model gets its own
+    window_seconds sliding-window quota: responses carry Groq's
+    x-ratelimit-* headers (through chat.completions.with_raw_response), and
+    requests over the quota raise FakeRateLimitError with a Retry-After.
+    """
+
+    def __init__(self, ttft_ms=300.0, tokens_per_second=250.0, answer_tokens=200, jitter=0.1, seed=0, models=None,
+                 requests_per_minute=None, tokens_per_minute=None, window_seconds=60.0, tail_ms=0.0,
+                 tail_probability=0.0):
+        self.ttft_ms = ttft_ms
+        self.tail_ms = tail_ms
+        self.tail_probability = tail_probability
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.jitter = jitter
+        self.models = models or {}
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window_seconds = window_seconds
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._windows = {}
+        self.calls = 0
+        self.calls_by_model = {}
+        self.rate_limited = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=self.create,
+            with_raw_response=SimpleNamespace(create=self._create_raw)
+        ))
+
+    def _factor(self):
+        """
+        Speed factor of one completion, and the extra tail delay in milliseconds.
+        """
+        with self._lock:
+            self.calls += 1
+            tail = self.tail_ms if self._rng.random() < self.tail_probability else 0.0
+            return 1 + self._rng.uniform(-self.jitter, self.jitter), tail
+
+    def _admit(self, model, tokens):
+        """
+        Count a request against the model's window; return the rate-limit headers.
+        """
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(model, [])
+            window[:] = [(t, n) for t, n in window if t > now - self.window_seconds]
+            used_tokens = sum(n for _, n in window)
+            reset = window[0][0] + self.window_seconds - now if window else self.window_seconds
+            over = (
+                (self.requests_per_minute is not None and len(window) + 1 > self.requests_per_minute)
+                or (self.tokens_per_minute is not None and used_tokens + tokens > self.tokens_per_minute)
+            )
+            if over:
+                self.rate_limited += 1
+            else:
+                window.append((now, tokens))
+                used_tokens += tokens
+            headers = {}
+            if self.requests_per_minute is not None:
+                headers["x-ratelimit-limit-requests"] = str(self.requests_per_minute)
+                headers["x-ratelimit-remaining-requests"] = str(max(0, self.requests_per_minute - len(window)))
+                headers["x-ratelimit-reset-requests"] = f"{reset:.2f}s"
+            if self.tokens_per_minute is not None:
+                headers["x-ratelimit-limit-tokens"] = str(self.tokens_per_minute)
+                headers["x-ratelimit-remaining-tokens"] = str(max(0, self.tokens_per_minute - used_tokens))
+                headers["x-ratelimit-reset-tokens"] = f"{reset:.2f}s"
+        if over:
+            headers["retry-after"] = str(max(1, round(reset)))
+            raise FakeRateLimitError(f"Rate limit reached for model {model}", headers)
+        return headers
+
+    def _create_raw(self, model, messages, stream=False, **kwargs):
+        response, headers = self._respond(model, messages, stream)
+        return SimpleNamespace(headers=headers, parse=lambda: response)
+
+    def create(self, model, messages, stream=False, **kwargs):
+        return self._respond(model, messages, stream)[0]
+
+    def _respond(self, model, messages, stream):
+        prompt_tokens = sum(len(_WORD.findall(message["content"])) for message in messages)
+        words = ["According", "to", "[Source", "1],"] + [
+            _FILLER_WORDS[i % len(_FILLER_WORDS)] for i in range(max(0, self.answer_tokens - 4))
+        ]
+        headers = self._admit(model, prompt_tokens + len(words))
+        factor, tail_ms = self._factor()
+        with self._lock:
+            self.calls_by_model[model] = self.calls_by_model.get(model, 0) + 1
+        speed = self.models.get(model, {})
+        ttft_ms = speed.get("ttft_ms", self.ttft_ms)
+        tokens_per_second = speed.get("tokens_per_second", self.tokens_per_second)
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=len(words),
+            total_tokens=prompt_tokens + len(words)
+        )
+        token_seconds = factor / tokens_per_second if tokens_per_second else 0.0
+        if not stream:
+            time.sleep((ttft_ms * factor + tail_ms) / 1000 + token_seconds * len(words))
+            message = SimpleNamespace(role="assistant", content=" ".join(words))
+            return SimpleNamespace(
+                model=model,
+                choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+                usage=usage
+            ), headers
+        return self._stream(model, words, usage, (ttft_ms * factor + tail_ms) / 1000, token_seconds), headers
+
+    def _stream(self, model, words, usage, ttft_seconds, token_seconds):
+        time.sleep(ttft_seconds)
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(token_seconds)
+            delta = SimpleNamespace(content=word if i == 0 else " " + word)
+            yield SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, delta=delta)], x_groq=None)
+        yield SimpleNamespace(model=model, choices=[], x_groq=SimpleNamespace(usage=usage))
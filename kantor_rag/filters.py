@@ -0,0 +1,149 @@
+import numpy as np
+
+
+def matches_filter(metadata, metadata_filter):
+    """
+    Evaluate a Pinecone-style metadata filter against one metadata dict.
+    Supports $eq, $ne, $in, $nin, $and, $or and bare values (treated as $eq).
+    """
+    if not metadata_filter:
+        return True
+    for key, condition in metadata_filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif not _matches_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+def _matches_condition(value, condition):
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, operand in condition.items():
+        if op == "$eq":
+            ok = value == operand
+        elif op == "$ne":
+            ok = value != operand
+        elif op == "$in":
+            ok = value in operand
+        elif op == "$nin":
+            ok = value not in operand
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if not ok:
+            return False
+    return True
+
+
+class FilterIndex:
+    """
+    Inverted index from metadata values to the rows that carry them, for the
+    closed-set fields the UI filters on (doc_type and filename).
+    Each value keeps a sorted int32 row array; boolean bitmaps are derived
+    from those on demand for $and/$or/$ne combinations. Filters on other
+    fields are not handled here: rows() returns None and callers fall back
+    to evaluating matches_filter row by row.
+    """
+
+    def __init__(self, metadata, fields=("doc_type", "filename")):
+        self.size = len(metadata)
+        self.fields = set(fields)
+        postings = {}
+        for row, meta in enumerate(metadata):
+            for field in fields:
+                value = meta.get(field)
+                if value is not None and not isinstance(value, (list, dict)):
+                    postings.setdefault((field, value), []).append(row)
+        self._rows = {key: np.array(rows, dtype=np.int32) for key, rows in postings.items()}
+        self._bitmaps = {}
+
+    def rows(self, metadata_filter):
+        """
+        Sorted row numbers matching the filter, or None if the filter uses unindexed fields.
+        """
+        if not metadata_filter:
+            return None
+        rows = self._eq_rows(metadata_filter)
+        if rows is not None:
+            return rows
+        if list(metadata_filter) == ["$and"]:
+            # The UI's doc_type AND filename filter: intersect posting lists, smallest
+            # first, so the cost scales with the matching rows rather than the index
+            clauses = [self._eq_rows(clause) for clause in metadata_filter["$and"]]
+            if clauses and all(rows is not None for rows in clauses):
+                clauses.sort(key=len)
+                rows = clauses[0]
+                for other in clauses[1:]:
+                    rows = rows[np.isin(rows, other, assume_unique=True)]
+                return rows
+        mask = self.mask(metadata_filter)
+        return None if mask is None else np.flatnonzero(mask).astype(np.int32)
+
+    def _eq_rows(self, clause):
+        if len(clause) != 1:
+            return None
+        field, condition = next(iter(clause.items()))
+        if field not in self.fields:
+            return None
+        if isinstance(condition, dict):
+            if list(condition) != ["$eq"]:
+                return None
+            condition = condition["$eq"]
+        return self._rows.get((field, condition), _EMPTY_ROWS)
+
+    def mask(self, metadata_filter):
+        """
+        Boolean row mask for the filter, or None if it uses unindexed fields.
+        """
+        result = np.ones(self.size, dtype=bool)
+        for key, condition in metadata_filter.items():
+            if key in ("$and", "$or"):
+                masks = [self.mask(clause) for clause in condition]
+                if any(mask is None for mask in masks):
+                    return None
+                if key == "$and":
+                    combined = np.logical_and.reduce(masks) if masks else np.ones(self.size, dtype=bool)
+                else:
+                    combined = np.logical_or.reduce(masks) if masks else np.zeros(self.size, dtype=bool)
+            elif key in self.fields:
+                combined = self._condition_mask(key, condition)
+                if combined is None:
+                    return None
+            else:
+                return None
+            result &= combined
+        return result
+
+    def _condition_mask(self, field, condition):
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        result = np.ones(self.size, dtype=bool)
+        for op, operand in condition.items():
+            if op == "$eq":
+                result &= self._bitmap(field, operand)
+            elif op == "$ne":
+                result &= ~self._bitmap(field, operand)
+            elif op in ("$in", "$nin"):
+                mask = np.zeros(self.size, dtype=bool)
+                for value in operand:
+                    mask |= self._bitmap(field, value)
+                result &= mask if op == "$in" else ~mask
+            else:
+                return None
+        return result
+
+    def _bitmap(self, field, value):
+        key = (field, value)
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            bitmap = np.zeros(self.size, dtype=bool)
+            bitmap[self._rows.get(key, _EMPTY_ROWS)] = True
+            self._bitmaps[key] = bitmap
+        return bitmap
+
+
+_EMPTY_ROWS = np.zeros(0, dtype=np.int32)
@@ -0,0 +1,386 @@
+"""
+Model routing and rate-limit-aware admission for the Groq completions.
+
+A RoutingPolicy sends short definitional lookups to a fast model and
+everything else to the pipeline's model. The GenerationScheduler then admits
+each completion against what Groq reports of the remaining quota
+(x-ratelimit-* headers, read through with_raw_response):
+
+    - the preferred model is used while it has more than headroom of its
+      request and token limits left;
+    - near that limit a quality-tier request falls back to the fast model,
+      which has its own quota;
+    - with no room on either, the request waits (at most max_wait seconds,
+      at most max_queue waiting) for a slot or a quota reset, and is shed
+      with Overloaded after that, before Groq answers it with a 429.
+
+Admission also caps concurrent completions per model (max_concurrency).
+A scheduler built with throttle=False only routes, and admits everything.
+"""
+import logging
+import re
+import threading
+import time
+
+from kantor_rag.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+FAST_MODEL = "llama-3.1-8b-instant"
+FAST = "fast"
+QUALITY = "quality"
+
+LLM_ROUTED = REGISTRY.counter(
+    "kantor_llm_routed_total", "Completions admitted, by model, policy tier and fallback.", ("model", "tier", "fallback")
+)
+LLM_SHED = REGISTRY.counter("kantor_llm_shed_total", "Completions refused before reaching Groq.", ("reason",))
+LLM_QUOTA = REGISTRY.gauge(
+    "kantor_llm_quota_remaining", "Remaining Groq quota from the last response headers.", ("model", "kind")
+)
+
+# Questions asking for a term, a person or a date
+DEFINITIONAL = re.compile(
+    r"^\s*(what\s+(is|are|was|were|does\s+\S+\s+mean)|define|definition\s+of|meaning\s+of|who\s+(is|was|were)"
+    r"|when\s+(did|was|were)|in\s+what\s+year|which\s+(book|article|year))\b"
+)
+# Questions that need the larger model to relate several sources
+ANALYTIC = re.compile(
+    r"\b(compare|comparison|contrast|differ|difference|relate|relation|relationship|versus|vs\.?|why|how\s+does"
+    r"|how\s+did|evaluate|critique|criticism|implications?|evolve|evolution|develop(ed|ment)?|argue|argument)\b"
+)
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+class Overloaded(Exception):
+    """
+    A completion refused by the scheduler, with the seconds after which a retry may succeed.
+    """
+    status_code = 429
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_rate_limit(error):
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def retry_after(error):
+    """
+    Seconds the server asked us to wait, from a Retry-After header, if any.
+    """
+    if getattr(error, "retry_after", None) is not None:
+        return float(error.retry_after)
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_duration(value):
+    """
+    Seconds in a Groq reset header ("7.66s", "2m59.56s", "120ms"); None if unreadable.
+    """
+    if value is None:
+        return None
+    matches = _DURATION.findall(str(value))
+    if not matches:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    units = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(number) * units[unit] for number, unit in matches)
+
+
+class RoutingPolicy:
+    """
+    Picks the model tier from the question and its context: FAST for short
+    definitional lookups over a context of at most fast_max_context_tokens,
+    QUALITY for analytic questions and everything else.
+    """
+
+    def __init__(self, fast_max_query_words=14, fast_max_context_tokens=3000, default_tier=QUALITY):
+        self.fast_max_query_words = fast_max_query_words
+        self.fast_max_context_tokens = fast_max_context_tokens
+        self.default_tier = default_tier
+
+    def tier(self, query, prompt_tokens, sources):
+        text = query.lower()
+        if ANALYTIC.search(text) or len(text.split()) > self.fast_max_query_words:
+            return QUALITY
+        if prompt_tokens > self.fast_max_context_tokens:
+            return QUALITY
+        if DEFINITIONAL.search(text):
+            return FAST
+        return self.default_tier
+
+
+class FixedPolicy:
+    """
+    Always the same tier.
+    """
+
+    def __init__(self, tier=QUALITY):
+        self._tier = tier
+
+    def tier(self, query, prompt_tokens, sources):
+        return self._tier
+
+
+class _Quota:
+    """
+    What we know of one model's rate limits, plus the completions we have
+    admitted that the headers don't reflect yet (unreported, with their
+    reserved_tokens: a request counts against remaining_requests and
+    remaining_tokens from the moment its own headers are read, even while
+    it is still streaming).
+    """
+
+    def __init__(self):
+        self.limit_requests = None
+        self.limit_tokens = None
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.unreported = 0
+        self.reserved_tokens = 0
+
+    def update(self, headers, now):
+        def read(name, convert=int):
+            value = headers.get(name)
+            try:
+                return None if value is None else convert(float(value))
+            except ValueError:
+                return None
+
+        self.limit_requests = read("x-ratelimit-limit-requests") or self.limit_requests
+        self.limit_tokens = read("x-ratelimit-limit-tokens") or self.limit_tokens
+        remaining_requests = read("x-ratelimit-remaining-requests")
+        remaining_tokens = read("x-ratelimit-remaining-tokens")
+        if remaining_requests is not None:
+            self.remaining_requests = remaining_requests
+            self.requests_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-requests")) or 60.0)
+        if remaining_tokens is not None:
+            self.remaining_tokens = remaining_tokens
+            self.tokens_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-tokens")) or 60.0)
+
+    def _free(self, now):
+        # Past a reset time the quota is back to its limit (or unknown)
+        requests = self.remaining_requests if now < self.requests_reset_at else self.limit_requests
+        tokens = self.remaining_tokens if now < self.tokens_reset_at else self.limit_tokens
+        return (
+            None if requests is None else requests - self.unreported,
+            None if tokens is None else tokens - self.reserved_tokens,
+        )
+
+    def admits(self, tokens, now, headroom, max_concurrency):
+        if now < self.blocked_until:
+            return False
+        if max_concurrency and self.in_flight >= max_concurrency:
+            return False
+        free_requests, free_tokens = self._free(now)
+        if free_requests is not None and free_requests - 1 < headroom * (self.limit_requests or 0):
+            return False
+        if free_tokens is not None and free_tokens - tokens < headroom * (self.limit_tokens or 0):
+            return False
+        return True
+
+    def wait_hint(self, now):
+        """
+        Seconds until this quota may admit again, for Retry-After.
+        """
+        times = [t for t in (self.blocked_until, self.requests_reset_at, self.tokens_reset_at) if t > now]
+        return min(times) - now if times else 1.0
+
+
+class Lease:
+    """
+    An admitted completion: the model to call, released when the completion ends.
+    """
+
+    def __init__(self, scheduler, model, tier, tokens, fallback):
+        self.scheduler = scheduler
+        self.model = model
+        self.tier = tier
+        self.tokens = tokens
+        self.fallback = fallback
+        # Whether the rate-limit headers of this completion have been read
+        self.reported = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.scheduler._release(self)
+
+    def fields(self):
+        return {"llm_model": self.model, "llm_tier": self.tier, "llm_fallback": self.fallback}
+
+
+class GenerationScheduler:
+    """
+    Routes completions to a model tier and admits them against the quota
+    Groq reports; see the module docstring. Shared by every pipeline that
+    uses the same API key, since the quota is per key and model.
+    """
+
+    def __init__(self, policy=None, fast_model=FAST_MODEL, fallback=False, headroom=0.1, max_concurrency=None,
+                 max_queue=64, max_wait=10.0, completion_tokens=512, throttle=True):
+        self.policy = policy or FixedPolicy(QUALITY)
+        self.throttle = throttle
+        self.fast_model = fast_model
+        self.fallback = fallback
+        self.headroom = headroom
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.completion_tokens = completion_tokens
+        self._quotas = {}
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    def _quota(self, model):
+        quota = self._quotas.get(model)
+        if quota is None:
+            quota = self._quotas[model] = _Quota()
+        return quota
+
+    def route(self, query, prompt_tokens, sources, model):
+        """
+        (tier, [(model, headroom), ...]) in order of preference.
+        """
+        tier = self.policy.tier(query, prompt_tokens, sources)
+        preferred = self.fast_model if tier == FAST else model
+        if not self.fallback or preferred == self.fast_model:
+            return tier, [(preferred, 0.0)]
+        # Keep headroom on the larger model; past it the fast one takes the request
+        return tier, [(preferred, self.headroom), (self.fast_model, 0.0), (preferred, 0.0)]
+
+    def preferred_model(self, query, prompt_tokens, sources, model):
+        """
+        The model the policy picks for a completion when quota is no concern.
+        """
+        return self.route(query, prompt_tokens, sources, model)[1][0][0]
+
+    def acquire(self, query, prompt_tokens, sources, model):
+        """
+        Lease a model for one completion, waiting up to max_wait for quota;
+        raises Overloaded when none frees up in time or the queue is full.
+        """
+        tier, attempts = self.route(query, prompt_tokens, sources, model)
+        tokens = prompt_tokens + self.completion_tokens
+        if not self.throttle:
+            LLM_ROUTED.inc(model=attempts[0][0], tier=tier, fallback="false")
+            return Lease(self, attempts[0][0], tier, tokens, False)
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            if self._waiting >= self.max_queue:
+                LLM_SHED.inc(reason="queue_full")
+                raise Overloaded("Too many answers waiting for the LLM", retry_after=self._wait_hint(attempts))
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    for name, headroom in attempts:
+                        quota = self._quota(name)
+                        if quota.admits(tokens, now, headroom, self.max_concurrency):
+                            quota.in_flight += 1
+                            quota.unreported += 1
+                            quota.reserved_tokens += tokens
+                            fallback = name != attempts[0][0]
+                            LLM_ROUTED.inc(model=name, tier=tier, fallback=str(fallback).lower())
+                            return Lease(self, name, tier, tokens, fallback)
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        LLM_SHED.inc(reason="rate_limit")
+                        raise Overloaded("The LLM rate limit is exhausted", retry_after=self._wait_hint(attempts))
+                    # Woken by a finishing completion, or when the nearest reset passes
+                    self._cond.wait(min(remaining, self._wait_hint(attempts)))
+            finally:
+                self._waiting -= 1
+
+    def _wait_hint(self, attempts):
+        now = time.monotonic()
+        return min(self._quota(name).wait_hint(now) for name, _ in attempts)
+
+    def _release(self, lease):
+        if not self.throttle:
+            return
+        with self._cond:
+            quota = self._quota(lease.model)
+            quota.in_flight -= 1
+            if not lease.reported:
+                quota.unreported -= 1
+                quota.reserved_tokens -= lease.tokens
+            self._cond.notify_all()
+
+    def create(self, llm, lease, messages, stream=False):
+        """
+        chat.completions.create on the leased model, recording the rate-limit
+        headers when the client exposes them (Groq's with_raw_response).
+        """
+        completions = llm.chat.completions
+        raw_api = getattr(completions, "with_raw_response", None)
+        try:
+            if raw_api is None:
+                return completions.create(model=lease.model, messages=messages, stream=stream)
+            response = raw_api.create(model=lease.model, messages=messages, stream=stream)
+            self.observe(lease.model, response.headers, lease)
+            return response.parse()
+        except Exception as e:
+            if is_rate_limit(e):
+                self.rate_limited(lease.model, e)
+            raise
+
+    def observe(self, model, headers, lease=None):
+        """
+        Record the rate-limit headers of a response; the lease it answers
+        stops counting as unreported and gives back its token reservation, as
+        remaining_requests and remaining_tokens now include it.
+        """
+        now = time.monotonic()
+        with self._cond:
+            quota = self._quota(model)
+            quota.update(headers, now)
+            if lease is not None and self.throttle and not lease.reported:
+                lease.reported = True
+                quota.unreported -= 1
+                quota.reserved_tokens -= lease.tokens
+            self._cond.notify_all()
+        if quota.remaining_requests is not None:
+            LLM_QUOTA.set(quota.remaining_requests, model=model, kind="requests")
+        if quota.remaining_tokens is not None:
+            LLM_QUOTA.set(quota.remaining_tokens, model=model, kind="tokens")
+
+    def rate_limited(self, model, error):
+        """
+        Hold back a model after a 429, for Retry-After or the token reset time.
+        """
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        delay = retry_after(error) or parse_duration(headers.get("x-ratelimit-reset-tokens")) or 1.0
+        logger.warning("%s rate limited for %.1f s", model, delay)
+        with self._cond:
+            quota = self._quota(model)
+            quota.update(headers, time.monotonic())
+            quota.blocked_until = max(quota.blocked_until, time.monotonic() + delay)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            return {
+                model: {
+                    "in_flight": quota.in_flight,
+                    "remaining_requests": quota._free(now)[0],
+                    "remaining_tokens": quota._free(now)[1],
+                    "blocked": now < quota.blocked_until,
+                }
+                for model, quota in self._quotas.items()
+            }
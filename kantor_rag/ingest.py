@@ -0,0 +1,380 @@
+"""
+Offline ingestion: source documents -> page chunks -> embeddings -> vector store.
+
+    python -m kantor_rag.ingest SOURCE_DIR [--backend local --index-dir index] [--workers 4]
+
+SOURCE_DIR holds one file per catalog title, named after the title, either
+"<title>.pdf" or "<title>.txt" (pages separated by form feeds).
+Runs are incremental: a manifest of source and chunk hashes records what is
+already in the store, and only new or changed documents are re-embedded.
+"""
+import argparse
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+
+from kantor_rag.catalog import catalog_entries, title_year
+from kantor_rag.chunkstore import ChunkStore
+from kantor_rag.config import get_setting
+from kantor_rag.encoders import EMBEDDING_MODEL, encoder_settings, load_encoder
+from kantor_rag.lexical import DEFAULT_LEXICAL_DIR, BM25Index
+from kantor_rag.manifest import Manifest
+from kantor_rag.vectorstore import LocalStore, open_store
+
+logger = logging.getLogger(__name__)
+
+
+def find_source(source_dir, title):
+    for extension in (".pdf", ".txt"):
+        path = os.path.join(source_dir, title + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def iter_pages(path):
+    """
+    Yield (page_number, text) for a PDF or form-feed separated text file, 1-based.
+    """
+    if path.endswith(".pdf"):
+        from pypdf import PdfReader
+        for number, page in enumerate(PdfReader(path).pages, 1):
+            yield number, page.extract_text() or ""
+    else:
+        with open(path, encoding="utf-8") as f:
+            for number, text in enumerate(f.read().split("\f"), 1):
+                yield number, text
+
+
+def chunk_page(text, chunk_words=300, overlap=50):
+    """
+    Split one page into overlapping windows of words. Chunks never cross a
+    page boundary, so every chunk has exactly one page number.
+    """
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, chunk_words - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+def document_id(title):
+    return hashlib.sha1(title.encode("utf-8")).hexdigest()[:12]
+
+
+def chunk_id(title, page, text):
+    """
+    Deterministic chunk id: the document plus a hash of the chunk's page and text.
+    """
+    digest = hashlib.sha1(f"{page}\n{text}".encode("utf-8")).hexdigest()[:16]
+    return f"{document_id(title)}-{digest}"
+
+
+def iter_document_chunks(path, doc_type, title, chunk_words=300, overlap=50):
+    """
+    Yield (chunk_id, metadata) for one document, streaming page by page.
+    """
+    year = title_year(title)
+    for page, text in iter_pages(path):
+        for chunk in chunk_page(text, chunk_words, overlap):
+            yield chunk_id(title, page, chunk), {
+                "text": chunk,
+                "filename": title,
+                "page": page,
+                "doc_type": doc_type,
+                "year": year,
+            }
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# Per-process model, loaded once by the pool initializer
+_worker_model = None
+_worker_batch_size = 64
+
+
+def _init_worker(backend, batch_size, threads):
+    global _worker_model, _worker_batch_size
+    # One process per core scales better than one process with many intra-op threads
+    _worker_model = load_encoder(backend, threads=threads)
+    _worker_batch_size = batch_size
+
+
+def _encode(texts):
+    return _worker_model.encode(texts, batch_size=_worker_batch_size, convert_to_numpy=True)
+
+
+class Embedder:
+    """
+    Embeds lists of texts across a pool of CPU worker processes.
+    Batches are dispatched in order, so results line up with the input.
+    With workers=1 everything runs in the calling process.
+    """
+
+    def __init__(self, backend=None, workers=None, batch_size=64):
+        self.workers = workers or os.cpu_count() or 1
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self._pool = None
+        if self.workers > 1:
+            context = multiprocessing.get_context("spawn")
+            self._pool = context.Pool(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(backend, batch_size, threads)
+            )
+        else:
+            _init_worker(backend, batch_size, threads)
+
+    def map(self, batches):
+        """
+        Yield one embedding matrix per batch of texts, in input order.
+        At most two batches per worker are in flight, so memory stays bounded
+        however large the corpus is.
+        """
+        if self._pool is None:
+            for texts in batches:
+                yield _encode(texts)
+            return
+        in_flight = deque()
+        for texts in batches:
+            in_flight.append(self._pool.apply_async(_encode, (texts,)))
+            if len(in_flight) >= 2 * self.workers:
+                yield in_flight.popleft().get()
+        while in_flight:
+            yield in_flight.popleft().get()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+
+
+def embed_chunks(chunks, embedder, embed_batch=512):
+    """
+    Yield (chunk_id, vector, metadata) for a stream of (chunk_id, metadata).
+    Each worker gets embed_batch chunks at a time.
+    """
+    chunk_batches = batched(chunks, embed_batch)
+    pending = deque()
+
+    def texts():
+        for batch in chunk_batches:
+            pending.append(batch)
+            yield [metadata["text"] for _, metadata in batch]
+
+    for vectors in embedder.map(texts()):
+        batch = pending.popleft()
+        for (chunk_id, metadata), vector in zip(batch, vectors):
+            yield chunk_id, vector, metadata
+
+
+class _LazyEmbedder:
+    """
+    Starts the worker pool on first use, so runs with nothing to embed never load the model.
+    """
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self._embedder = None
+
+    def map(self, batches):
+        batches = iter(batches)
+        first = next(batches, None)
+        if first is None:
+            return
+        if self._embedder is None:
+            self._embedder = Embedder(**self.kwargs)
+        yield from self._embedder.map(itertools.chain([first], batches))
+
+    def close(self):
+        if self._embedder is not None:
+            self._embedder.close()
+
+
+def ingest(source_dir, store, manifest, lexical=None, workers=None, batch_size=64, embed_batch=512,
+           upsert_batch=100, chunk_words=300, overlap=50, reset=False, chunk_store=None):
+    """
+    Bring the store in line with the source files, touching only what changed.
+    Documents whose source file is unchanged since the manifest was written are
+    skipped without being read. Changed documents are re-chunked; only chunks
+    whose ids (page + text hash) are new get embedded, and chunks that
+    disappeared are deleted. Documents dropped from the catalog lose all their
+    chunks. With a chunk_store, chunk texts go there instead of into the
+    vector metadata. Returns (chunks embedded, chunks deleted).
+    """
+    started = time.perf_counter()
+    # Vectors from another encoder backend, or the int8 ONNX model, don't mix with these
+    settings = dict(encoder_settings(), model=EMBEDDING_MODEL, chunk_words=chunk_words, overlap=overlap)
+    if chunk_store is not None:
+        # Vectors written with text in their metadata must be rewritten without it
+        settings["chunk_store"] = True
+    # Manifests written before the backend was recorded were built with the default torch encoder
+    previous = dict({"encoder_backend": "torch"}, **manifest.settings)
+    if previous != settings and manifest.documents:
+        logger.info("Chunking, model or encoder settings changed; re-ingesting everything")
+        reset = True
+    if reset:
+        store.clear()
+        if chunk_store is not None:
+            chunk_store.clear()
+        manifest.documents = {}
+    manifest.settings = settings
+    # A lexical index created after the store was populated needs every chunk, not just new ones
+    backfill_lexical = lexical is not None and len(lexical) == 0 and bool(manifest.documents)
+    backfill_chunks = chunk_store is not None and len(chunk_store) == 0 and bool(manifest.documents)
+
+    stale_ids = []
+    changed = []
+    rewrite = set()
+    lexical_added = []
+    catalog_titles = set()
+    for doc_type, title in catalog_entries():
+        catalog_titles.add(title)
+        path = find_source(source_dir, title)
+        if path is None:
+            if title not in manifest.documents:
+                logger.warning("No source file for %s", title)
+            continue
+        entry = manifest.documents.get(title)
+        if entry is not None and entry["doc_type"] != doc_type:
+            # Moved to another type: same chunk ids, but every chunk's metadata changes
+            rewrite.add(title)
+            changed.append((doc_type, title, path))
+        elif manifest.source_changed(title, path):
+            changed.append((doc_type, title, path))
+        elif backfill_lexical or backfill_chunks:
+            chunks = list(iter_document_chunks(path, doc_type, title, chunk_words, overlap))
+            if backfill_lexical:
+                lexical_added.extend((chunk_id, metadata["text"], metadata) for chunk_id, metadata in chunks)
+            if backfill_chunks:
+                chunk_store.put_many((chunk_id, metadata["text"]) for chunk_id, metadata in chunks)
+    for title in set(manifest.documents) - catalog_titles:
+        logger.info("Removing %s (no longer in the catalog)", title)
+        stale_ids.extend(manifest.documents.pop(title)["chunks"])
+
+    def new_chunks():
+        for doc_type, title, path in changed:
+            old_ids = manifest.chunk_ids(title)
+            chunks = list(iter_document_chunks(path, doc_type, title, chunk_words, overlap))
+            new_ids = [chunk_id for chunk_id, _ in chunks]
+            stale_ids.extend(old_ids - set(new_ids))
+            keep = set() if title in rewrite else old_ids
+            # A backfill needs the kept chunks too; their vectors are already in the store
+            backfilled = []
+            for chunk_id, metadata in chunks:
+                if chunk_id not in keep:
+                    lexical_added.append((chunk_id, metadata["text"], metadata))
+                    yield chunk_id, metadata
+                else:
+                    if backfill_lexical:
+                        lexical_added.append((chunk_id, metadata["text"], metadata))
+                    if backfill_chunks:
+                        backfilled.append((chunk_id, metadata["text"]))
+            if backfilled:
+                chunk_store.put_many(backfilled)
+            manifest.record(title, doc_type, path, new_ids)
+
+    embedder = _LazyEmbedder(workers=workers, batch_size=batch_size)
+    embedded = 0
+    try:
+        for items in batched(embed_chunks(new_chunks(), embedder, embed_batch), upsert_batch):
+            if chunk_store is not None:
+                chunk_store.put_many((chunk_id, metadata["text"]) for chunk_id, _, metadata in items)
+                items = [
+                    (chunk_id, vector, {key: value for key, value in metadata.items() if key != "text"})
+                    for chunk_id, vector, metadata in items
+                ]
+            store.upsert(items, batch_size=upsert_batch)
+            embedded += len(items)
+            if embedded % (upsert_batch * 50) < len(items):
+                logger.info("Upserted %d chunks (%.0fs)", embedded, time.perf_counter() - started)
+    finally:
+        embedder.close()
+    if stale_ids:
+        store.delete(stale_ids)
+        if chunk_store is not None:
+            chunk_store.delete(stale_ids)
+    store.flush()
+    # Cached answers are invalidated by this, so it must change with any chunk, not just the count
+    store.set_version(manifest.fingerprint())
+    if lexical is not None:
+        if reset:
+            lexical.update(removed=lexical.ids)
+        if reset or lexical_added or stale_ids:
+            lexical.update(lexical_added, stale_ids)
+            lexical.save()
+    manifest.save()
+    logger.info(
+        "%d changed documents: embedded %d chunks, deleted %d in %.1fs",
+        len(changed), embedded, len(stale_ids), time.perf_counter() - started
+    )
+    return embedded, len(stale_ids)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chunk, embed and upsert the Kantor corpus.")
+    parser.add_argument("source_dir", help="Directory with one <title>.pdf or <title>.txt per catalog entry")
+    parser.add_argument("--backend", choices=["pinecone", "local"], help="Defaults to VECTOR_BACKEND")
+    parser.add_argument("--index-dir", help="Local index directory (defaults to LOCAL_INDEX_DIR)")
+    parser.add_argument("--workers", type=int, help="Embedding processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=64, help="SentenceTransformer encode batch size")
+    parser.add_argument("--embed-batch", type=int, default=512, help="Chunks sent to a worker at a time")
+    parser.add_argument("--upsert-batch", type=int, default=100, help="Vectors per upsert request")
+    parser.add_argument("--chunk-words", type=int, default=300)
+    parser.add_argument("--overlap", type=int, default=50)
+    parser.add_argument("--manifest", help="Manifest path (default: manifest.json in the index dir, "
+                                               "or INGEST_MANIFEST for Pinecone)")
+    parser.add_argument("--lexical-dir", help="BM25 index directory (defaults to LEXICAL_INDEX_DIR)")
+    parser.add_argument("--no-lexical", action="store_true", help="Don't maintain the BM25 index")
+    parser.add_argument("--chunk-store", help="Keep chunk texts in this compressed store instead of the vector "
+                                              "metadata (defaults to CHUNK_STORE_PATH)")
+    parser.add_argument("--reset", action="store_true", help="Delete every vector and re-ingest everything")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    store = open_store(args.backend, args.index_dir)
+    manifest_path = args.manifest
+    if manifest_path is None:
+        if isinstance(store, LocalStore):
+            manifest_path = os.path.join(store.directory, "manifest.json")
+        else:
+            manifest_path = get_setting("INGEST_MANIFEST", "ingest_manifest.json")
+    lexical = None
+    if not args.no_lexical:
+        lexical = BM25Index(args.lexical_dir or get_setting("LEXICAL_INDEX_DIR", DEFAULT_LEXICAL_DIR))
+    chunk_store_path = args.chunk_store or get_setting("CHUNK_STORE_PATH")
+    chunk_store = ChunkStore(chunk_store_path) if chunk_store_path else None
+    ingest(
+        args.source_dir,
+        store,
+        Manifest(manifest_path),
+        lexical=lexical,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        embed_batch=args.embed_batch,
+        upsert_batch=args.upsert_batch,
+        chunk_words=args.chunk_words,
+        overlap=args.overlap,
+        reset=args.reset,
+        chunk_store=chunk_store,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import json
+import os
+import re
+
+import numpy as np
+
+from kantor_rag.filters import FilterIndex, matches_filter
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "been", "but", "by", "can", "do", "does", "for",
+    "from", "has", "have", "how", "if", "in", "into", "is", "it", "its", "not", "of", "on", "or",
+    "so", "such", "than", "that", "the", "their", "there", "these", "they", "this", "to", "was",
+    "we", "what", "when", "where", "which", "who", "why", "will", "with",
+}
+
+DEFAULT_LEXICAL_DIR = os.path.join("index", "lexical")
+
+# Metadata fields kept alongside the postings so filters work without the vector store
+FILTER_FIELDS = ("doc_type", "filename")
+
+
+def tokenize(text):
+    return [word for word in _WORD.findall(text.lower()) if len(word) > 1 and word not in _STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk texts with array-backed postings (CSR layout).
+
+    On-disk layout of the lexical index directory:
+        terms.json      vocabulary, term id = position
+        offsets.npy     int64, postings of term t are [offsets[t], offsets[t + 1])
+        rows.npy        int32 row of each posting
+        tfs.npy         uint16 term frequency of each posting
+        doc_len.npy     int32 token count of each row
+        ids.json        chunk id of each row
+        meta.json       doc_type/filename of each row, for filtering
+
+    The arrays are memory-mapped on load. A lookup touches only the postings
+    of the query terms.
+    """
+
+    def __init__(self, directory=None, k1=1.2, b=0.75):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self._set(
+            [], [], [],
+            np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.uint16), np.zeros(0, dtype=np.int32)
+        )
+        if directory and os.path.exists(os.path.join(directory, "terms.json")):
+            self._load()
+
+    def _set(self, ids, meta, terms, offsets, rows, tfs, doc_len):
+        self.ids = ids
+        self.meta = meta
+        self.terms = terms
+        self.term_id = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.row_of = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        self.avg_len = float(doc_len.mean()) if len(doc_len) else 0.0
+        self.filter_index = FilterIndex(meta, FILTER_FIELDS)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _load(self):
+        def read_json(name):
+            with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                return json.load(f)
+
+        def read_array(name):
+            return np.load(os.path.join(self.directory, name), mmap_mode="r")
+
+        self._set(
+            read_json("ids.json"), read_json("meta.json"), read_json("terms.json"),
+            read_array("offsets.npy"), read_array("rows.npy"), read_array("tfs.npy"), read_array("doc_len.npy")
+        )
+
+    def save(self, directory=None):
+        directory = directory or self.directory
+        os.makedirs(directory, exist_ok=True)
+        for name, data in (("ids.json", self.ids), ("meta.json", self.meta), ("terms.json", self.terms)):
+            tmp = os.path.join(directory, name + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, os.path.join(directory, name))
+        for name, array in (("offsets.npy", self.offsets), ("rows.npy", self.rows),
+                            ("tfs.npy", self.tfs), ("doc_len.npy", self.doc_len)):
+            tmp = os.path.join(directory, name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp, os.path.join(directory, name))
+        self.directory = directory
+
+    def update(self, added=(), removed=()):
+        """
+        Add (chunk_id, text, metadata) documents and drop removed chunk ids.
+        Re-adding an existing id replaces it. Existing postings are carried
+        over as (row, term, tf) triples, so unchanged chunks need no text.
+        """
+        added = list(added)
+        drop = set(removed) | {chunk_id for chunk_id, _, _ in added}
+        keep = np.array([chunk_id not in drop for chunk_id in self.ids], dtype=bool)
+        new_row = np.cumsum(keep) - 1
+
+        # Existing postings, expanded from CSR to triples, minus dropped rows
+        term_of_posting = np.repeat(np.arange(len(self.terms), dtype=np.int32), np.diff(self.offsets))
+        kept_postings = keep[self.rows] if len(self.rows) else np.zeros(0, dtype=bool)
+        rows = [new_row[self.rows[kept_postings]].astype(np.int32)]
+        term_ids = [term_of_posting[kept_postings]]
+        tfs = [np.asarray(self.tfs)[kept_postings]]
+
+        ids = [chunk_id for chunk_id, k in zip(self.ids, keep) if k]
+        meta = [m for m, k in zip(self.meta, keep) if k]
+        terms = list(self.terms)
+        term_id = dict(self.term_id)
+        for chunk_id, text, metadata in added:
+            row = len(ids)
+            ids.append(chunk_id)
+            meta.append({field: metadata.get(field) for field in FILTER_FIELDS})
+            counts = {}
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+            doc_terms = []
+            for token in counts:
+                if token not in term_id:
+                    term_id[token] = len(terms)
+                    terms.append(token)
+                doc_terms.append(term_id[token])
+            rows.append(np.full(len(counts), row, dtype=np.int32))
+            term_ids.append(np.array(doc_terms, dtype=np.int32))
+            tfs.append(np.minimum(np.fromiter(counts.values(), dtype=np.int64, count=len(counts)), 65535).astype(np.uint16))
+
+        rows = np.concatenate(rows)
+        term_ids = np.concatenate(term_ids)
+        tfs = np.concatenate(tfs)
+        order = np.lexsort((rows, term_ids))
+        rows, term_ids, tfs = rows[order], term_ids[order], tfs[order]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=offsets[1:])
+        doc_len = np.bincount(rows, weights=tfs, minlength=len(ids)).astype(np.int32)
+        self._set(ids, meta, terms, offsets, rows, tfs, doc_len)
+
+    def search(self, query, top_k=25, filter=None):
+        """
+        Return [(chunk_id, bm25 score)] for the best top_k rows passing the filter.
+        """
+        if not self.ids:
+            return []
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        n = len(self.ids)
+        for token in set(tokenize(query)):
+            term = self.term_id.get(token)
+            if term is None:
+                continue
+            start, end = self.offsets[term], self.offsets[term + 1]
+            rows = self.rows[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            idf = np.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[rows] / max(self.avg_len, 1e-9))
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if filter:
+            candidates = self.filter_index.rows(filter)
+            if candidates is None:
+                candidates = np.array(
+                    [row for row, m in enumerate(self.meta) if matches_filter(m, filter)], dtype=np.int32
+                )
+            filtered = np.zeros(n, dtype=np.float32)
+            filtered[candidates] = scores[candidates]
+            scores = filtered
+
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > top_k:
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [(self.ids[row], float(scores[row])) for row in hits]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank).
+    Returns ids sorted by fused score.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, 1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused, key=lambda chunk_id: -fused[chunk_id])
+
+
+def hybrid_search(store, lexical, query, query_vector, top_k=25, filter=None, include_values=False, rrf_k=60):
+    """
+    Dense and BM25 retrieval fused with reciprocal-rank fusion.
+    Chunks found only lexically are fetched from the store for their metadata
+    and vector, and get their cosine similarity to the query as score, so
+    scores stay comparable with dense matches.
+    """
+    dense = store.query(
+        namespace="",
+        vector=query_vector,
+        top_k=top_k,
+        include_metadata=True,
+        include_values=include_values,
+        filter=filter
+    ).matches
+    lexical_hits = lexical.search(query, top_k, filter)
+    by_id = {match.id: match for match in dense}
+    fused = reciprocal_rank_fusion([[match.id for match in dense], [chunk_id for chunk_id, _ in lexical_hits]], rrf_k)[:top_k]
+
+    missing = [chunk_id for chunk_id in fused if chunk_id not in by_id]
+    if missing:
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+        for chunk_id, match in store.fetch(missing).items():
+            values = np.asarray(match.values, dtype=np.float32)
+            match.score = float(values @ query / max(np.linalg.norm(values), 1e-12)) if len(values) else 0.0
+            if not include_values:
+                match.values = []
+            by_id[chunk_id] = match
+    return [by_id[chunk_id] for chunk_id in fused if chunk_id in by_id]
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    What the last ingestion run put in the vector store, per document:
+    the source file's size, mtime and sha256, its doc_type, and the ids of its
+    chunks. Chunk ids embed a hash of the chunk's page and text, so they double
+    as per-chunk content hashes.
+    settings records the chunking parameters and embedding model; if those
+    change, every stored vector is stale.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.settings = {}
+        self.documents = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.settings = data.get("settings", {})
+            self.documents = data.get("documents", {})
+
+    def source_changed(self, title, path):
+        """
+        True if the source file differs from the one recorded for title.
+        Size and mtime are checked first so unchanged files are not re-hashed.
+        """
+        entry = self.documents.get(title)
+        if entry is None:
+            return True
+        stat = os.stat(path)
+        if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return False
+        if entry["size"] == stat.st_size and entry["sha256"] == file_hash(path):
+            # Touched but identical: remember the new mtime to skip hashing next time
+            entry["mtime"] = stat.st_mtime
+            return False
+        return True
+
+    def record(self, title, doc_type, path, chunk_ids):
+        stat = os.stat(path)
+        self.documents[title] = {
+            "doc_type": doc_type,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": file_hash(path),
+            "chunks": list(chunk_ids),
+        }
+
+    def fingerprint(self):
+        """
+        Hash of the settings and every document's type and chunk ids; changes
+        whenever any chunk's text, page or metadata does.
+        """
+        documents = {title: [entry["doc_type"], sorted(entry["chunks"])] for title, entry in self.documents.items()}
+        data = json.dumps({"settings": self.settings, "documents": documents}, sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+    def chunk_ids(self, title):
+        entry = self.documents.get(title)
+        return set(entry["chunks"]) if entry else set()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"settings": self.settings, "documents": self.documents}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
@@ -0,0 +1,337 @@
+"""
+Per-stage latency histograms and counters in the Prometheus text format,
+without a client library, plus an optional per-request JSON trace log.
+
+Pipeline stages are timed with a Trace:
+
+    trace = Trace("search")
+    with trace.stage("embed"):
+        ...
+    trace.finish()
+
+The registry is exposed at /metrics by the HTTP API and, with METRICS_PORT
+set, by a small side server next to the Streamlit app. With TRACE_LOG set to
+a path, every finished trace is appended to it as one JSON line.
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from kantor_rag.config import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Seconds; the LLM stages need the long tail
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(tuple(labels.get(name, "") for name in self.labels), 0)
+
+    def set(self, value, **labels):
+        """
+        Set the value directly; on a counter, for totals kept elsewhere (a cache's stats()).
+        """
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram; observe() costs one bisect under a lock.
+    """
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # bucket counts (+Inf last), sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def count(self, **labels):
+        with self._lock:
+            series = self._series.get(tuple(labels.get(name, "") for name in self.labels))
+            return sum(series[0]) if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{self.name}_bucket{_label_text(self.labels + ('le',), key + (le,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def add_collector(self, fn):
+        """
+        Register a callable run before each render, to refresh gauges from live state.
+        """
+        with self._lock:
+            self._collectors.append(fn)
+
+    def render(self):
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics)
+        for collect in collectors:
+            try:
+                collect()
+            except Exception:
+                logger.exception("metrics collector failed")
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "kantor_stage_seconds", "Time spent in each pipeline stage.", ("stage",)
+)
+REQUESTS = REGISTRY.counter(
+    "kantor_requests_total", "Finished requests by kind and outcome.", ("kind", "outcome")
+)
+MATCHES = REGISTRY.histogram(
+    "kantor_matches", "Matches per search after each step.", ("step",), buckets=COUNT_BUCKETS
+)
+LLM_TOKENS = REGISTRY.counter(
+    "kantor_llm_tokens_total", "Tokens reported in the Groq usage, by model and kind.", ("model", "kind")
+)
+LLM_PROMPT_TOKENS = REGISTRY.histogram(
+    "kantor_llm_prompt_tokens", "Prompt tokens per completion.", buckets=TOKEN_BUCKETS
+)
+CACHE_HITS = REGISTRY.counter("kantor_cache_hits_total", "Cache hits since start.", ("cache",))
+CACHE_MISSES = REGISTRY.counter("kantor_cache_misses_total", "Cache misses since start.", ("cache",))
+CACHE_HIT_RATIO = REGISTRY.gauge("kantor_cache_hit_ratio", "Cache hit rate since start.", ("cache",))
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def register_cache(name, cache):
+    """
+    Export a cache's hits, misses and hit rate (anything with LRUCache-style stats()).
+    """
+    with _caches_lock:
+        _caches[name] = cache
+
+
+def _collect_caches():
+    with _caches_lock:
+        caches = dict(_caches)
+    for name, cache in caches.items():
+        stats = cache.stats()
+        CACHE_HITS.set(stats["hits"], cache=name)
+        CACHE_MISSES.set(stats["misses"], cache=name)
+        CACHE_HIT_RATIO.set(stats["hit_rate"], cache=name)
+
+REGISTRY.add_collector(_collect_caches)
+
+
+def record_usage(model, usage):
+    """
+    Count the prompt/completion tokens of a Groq usage object (or dict).
+    Returns {"prompt_tokens": ..., "completion_tokens": ...}, empty without usage.
+    """
+    if usage is None:
+        return {}
+    read = usage.get if isinstance(usage, dict) else lambda name: getattr(usage, name, None)
+    counts = {name: read(name) for name in ("prompt_tokens", "completion_tokens")}
+    counts = {name: int(value) for name, value in counts.items() if value is not None}
+    for name, value in counts.items():
+        LLM_TOKENS.inc(value, model=model, kind=name.split("_")[0])
+    if "prompt_tokens" in counts:
+        LLM_PROMPT_TOKENS.observe(counts["prompt_tokens"])
+    return counts
+
+
+class _TraceLog:
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        path = get_setting("TRACE_LOG")
+        if not path:
+            return
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+_trace_log = _TraceLog()
+
+
+class Trace:
+    """
+    Timings and facts about one request. Stages feed STAGE_SECONDS as they
+    finish; finish() counts the request and writes the trace log line.
+    """
+
+    def __init__(self, kind="search", **fields):
+        self.kind = kind
+        self.id = uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.fields = dict(fields)
+        self.outcome = None
+        self.total_seconds = None
+        self._finished = False
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, seconds):
+        STAGE_SECONDS.observe(seconds, stage=name)
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def finish(self, outcome="ok", error=None):
+        if self._finished:
+            return
+        self._finished = True
+        self.outcome = outcome
+        total = self.total_seconds = time.perf_counter() - self.started
+        STAGE_SECONDS.observe(total, stage="total")
+        REQUESTS.inc(kind=self.kind, outcome=outcome)
+        record = {
+            "trace_id": self.id,
+            "kind": self.kind,
+            "outcome": outcome,
+            "total_ms": round(total * 1000, 2),
+            "stages_ms": {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()},
+        }
+        record.update(self.fields)
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        _trace_log.write(record)
+
+
+class NullTrace(Trace):
+    """
+    Trace for callers that don't pass one: stages still feed the histograms.
+    """
+
+    def __init__(self):
+        super().__init__("untraced")
+
+    def finish(self, outcome="ok", error=None):
+        pass
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def serve(port, host="127.0.0.1"):
+    """
+    Serve /metrics on a daemon thread (for processes without their own HTTP API).
+    Local-only by default; pass host="0.0.0.0" for a scraper on another machine.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    logger.info("metrics on http://%s:%d/metrics", host, port)
+    return server
@@ -0,0 +1,675 @@
+"""
+The search and answer pipeline shared by the Streamlit UI, the HTTP API and
+the command-line tools:
+
+    encode -> filtered vector query -> (rerank) -> diversify -> context -> Groq
+
+Completions go through a GenerationScheduler (kantor_rag.generation), which
+picks the model tier and keeps requests within the Groq rate limits.
+
+With a latency budget every request carries a Deadline (kantor_rag.deadline):
+vector queries are bounded (and hedged with a Hedger), and an answer that
+can't start in the time left raises DeadlineExceeded so callers show the
+sources alone. A streamed answer is only bounded until its first token;
+once text is flowing it runs to the end.
+
+Clients (vector store, Groq, encoder, reranker) may be passed as objects or
+as concurrent.futures.Future, so callers can load them in the background and
+only the first search waits for them.
+"""
+import copy
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from kantor_rag.answer_cache import AnswerCache
+from kantor_rag.cache import LRUCache, normalize_query, embedding_key, filter_key
+from kantor_rag.chunkstore import ChunkStore
+from kantor_rag.config import get_setting, get_int, get_float, get_bool
+from kantor_rag.context import TokenCounter, build_context
+from kantor_rag.deadline import Deadline, DeadlineExceeded, Hedger, call_with_timeout, give_up
+from kantor_rag.diversify import diversify
+from kantor_rag.encoders import load_encoder
+from kantor_rag.generation import FAST_MODEL, FixedPolicy, GenerationScheduler, RoutingPolicy
+from kantor_rag.lexical import DEFAULT_LEXICAL_DIR, BM25Index, hybrid_search
+from kantor_rag.metrics import MATCHES, NullTrace, record_usage, register_cache
+from kantor_rag.rerank import CrossEncoderReranker, DEFAULT_RERANK_MODEL
+from kantor_rag.singleflight import SingleFlight, StreamGroup
+from kantor_rag.vectorstore import Match, open_store
+
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = "llama-3.3-70b-versatile"
+
+# Candidates fetched before diversification, and chunks kept after it
+TOP_K = 25
+FINAL_K = 10
+MAX_PER_SOURCE = 2
+
+ALL_TYPES = "All Types"
+
+
+def build_filter(doc_type=ALL_TYPES, title_filter=None):
+    """
+    Metadata filter for the sidebar's document type and title selections.
+    """
+    if not doc_type or doc_type == ALL_TYPES:
+        return None
+    if title_filter and not title_filter.startswith("All ") and title_filter != "Select type first":
+        return {
+            "$and": [
+                {"doc_type": {"$eq": doc_type}},
+                {"filename": {"$eq": title_filter}}
+            ]
+        }
+    return {"doc_type": {"$eq": doc_type}}
+
+
+def build_messages(context, source_references, query):
+    return [
+        {
+            "role": "system",
+            "content": f"""You are a scholar specializing in J.R. Kantor's interbehavioral psychology. 
+Answer based ONLY on the provided context. 
+When citing, use the format [Source X] to reference specific sources.
+
+Available sources:
+{source_references}
+
+Always cite which source(s) your information comes from using [Source X] notation.
+If the context doesn't contain relevant information, say so."""
+        },
+        {
+            "role": "user",
+            "content": f"Context:\n{context}\n\nQuestion: {query}"
+        }
+    ]
+
+
+def format_download_text(query, doc_type, title_filter, answer, sources):
+    """
+    Plain-text export of a query, its answer and the sources it cites.
+    """
+    download_text = f"""QUERY: {query}
+FILTERS: Type={doc_type}, Document={title_filter if title_filter else 'All'}
+
+ANSWER:
+{answer}
+
+SOURCES:
+"""
+    for s in sources:
+        download_text += f"\n{'='*60}\nSource {s['num']}: [{s['type']}] ({s['year']}) {s['title']} — Page {s['page']}\nRelevance: {s['score']:.1%}\n{'='*60}\n{s['text']}\n"
+    return download_text
+
+
+def _resolve(client):
+    return client.result() if isinstance(client, Future) else client
+
+
+class SearchResult:
+    """
+    Outcome of Pipeline.search: the packed context, its sources, and the
+    cached answer for it, if there is one.
+    """
+
+    def __init__(self, query, query_embedding, filter, context, source_references, sources, answer=None,
+                 timings=None):
+        self.query = query
+        self.query_embedding = query_embedding
+        self.filter = filter
+        self.context = context
+        self.source_references = source_references
+        self.sources = sources
+        self.answer = answer
+        self.timings = timings or {}
+        # Set per caller by Pipeline.search; degraded names what was given up ("deadline", "shed")
+        self.deadline = None
+        self.degraded = None
+
+    @property
+    def chunk_ids(self):
+        return [s["id"] for s in self.sources]
+
+    def to_dict(self):
+        return {
+            "query": self.query,
+            "filter": self.filter,
+            "sources": self.sources,
+            "answer": self.answer,
+            "timings": self.timings,
+            "degraded": self.degraded,
+        }
+
+
+class Pipeline:
+    """
+    Retrieval and generation with the caches shared by every caller.
+    Thread-safe: the caches lock internally and the clients are only read.
+    """
+
+    def __init__(self, index, llm, model, embedding_cache=None, results_cache=None, answer_cache=None,
+                 reranker=None, lexical_index=None, llm_model=LLM_MODEL, diversify_strategy="source_cap",
+                 mmr_lambda=0.7, context_token_budget=3000, max_chunk_tokens=512, rerank_top_n=5,
+                 top_k=TOP_K, final_k=FINAL_K, max_per_source=MAX_PER_SOURCE, chunk_store=None,
+                 index_version_ttl=600, scheduler=None, latency_budget=None, stage_timeouts=None, hedger=None,
+                 min_answer_seconds=1.0):
+        self._index = index
+        self._llm = llm
+        self._model = model
+        self._reranker = reranker
+        self.embedding_cache = LRUCache(maxsize=2048) if embedding_cache is None else embedding_cache
+        self.results_cache = LRUCache(maxsize=1024) if results_cache is None else results_cache
+        self.answer_cache = answer_cache
+        self.lexical_index = lexical_index
+        self.llm_model = llm_model
+        self.diversify_strategy = diversify_strategy
+        self.mmr_lambda = mmr_lambda
+        self.context_token_budget = context_token_budget
+        self.max_chunk_tokens = max_chunk_tokens
+        self.rerank_top_n = rerank_top_n
+        self.top_k = top_k
+        self.final_k = final_k
+        self.max_per_source = max_per_source
+        self.chunk_store = chunk_store
+        self.index_version_ttl = index_version_ttl
+        self._version_cache = LRUCache(maxsize=1, ttl=index_version_ttl)
+        # Without a scheduler every completion goes to llm_model, unthrottled
+        self.scheduler = GenerationScheduler(throttle=False) if scheduler is None else scheduler
+        # Seconds per request (None: no deadlines), with per-stage caps such as "vector_query" and "llm_ttft"
+        self.latency_budget = latency_budget
+        self.stage_timeouts = stage_timeouts or {}
+        self.hedger = hedger
+        self.min_answer_seconds = min_answer_seconds
+        # Runs the calls that are waited for with a timeout; they finish in the background past it
+        self._executor = ThreadPoolExecutor(16, thread_name_prefix="pipeline")
+        # Identical requests in flight at the same time (a shared question
+        # arriving from many sessions at once) run once and share the result
+        self._searches = SingleFlight()
+        self._answers = SingleFlight()
+        self._streams = StreamGroup()
+
+    @classmethod
+    def from_settings(cls, background=None):
+        """
+        Build the pipeline from secrets/env. With background (warmup.background
+        or similar), clients load on other threads and are passed as futures.
+        """
+        def start(phase, fn):
+            return background(phase, fn) if background else fn()
+
+        ttl = get_int("CACHE_TTL_SECONDS", 3600)
+        max_bytes = int(get_float("CACHE_MAX_MB", 64) * 1024 * 1024)
+        answer_cache = AnswerCache(
+            get_setting("ANSWER_CACHE_PATH", ".cache/answers.sqlite3"),
+            threshold=get_float("ANSWER_CACHE_THRESHOLD", 0.97),
+            max_entries=get_int("ANSWER_CACHE_MAX_ENTRIES", 5000),
+            ttl=get_int("ANSWER_CACHE_TTL_SECONDS", 7 * 24 * 3600),
+        )
+        lexical_index = None
+        if get_bool("HYBRID_SEARCH", False):
+            lexical_index = BM25Index(get_setting("LEXICAL_INDEX_DIR", DEFAULT_LEXICAL_DIR))
+        # Set when ingestion kept chunk texts out of the vector metadata (ingest --chunk-store)
+        chunk_store_path = get_setting("CHUNK_STORE_PATH")
+        chunk_store = ChunkStore(chunk_store_path, cache_size=get_int("CHUNK_CACHE_SIZE", 4096)) if chunk_store_path else None
+        pipeline = cls(
+            index=start("vector index", load_index),
+            llm=start("groq client", load_groq),
+            model=start("embedding model", load_model),
+            embedding_cache=LRUCache(maxsize=get_int("EMBEDDING_CACHE_SIZE", 2048), ttl=ttl, max_bytes=max_bytes // 4),
+            results_cache=LRUCache(maxsize=get_int("RESULTS_CACHE_SIZE", 1024), ttl=ttl, max_bytes=max_bytes),
+            answer_cache=answer_cache,
+            reranker=start("reranker", load_reranker) if get_bool("RERANK", False) else None,
+            lexical_index=lexical_index,
+            diversify_strategy=get_setting("DIVERSIFY_STRATEGY", "source_cap"),
+            mmr_lambda=get_float("MMR_LAMBDA", 0.7),
+            context_token_budget=get_int("CONTEXT_TOKEN_BUDGET", 3000),
+            max_chunk_tokens=get_int("MAX_CHUNK_TOKENS", 512),
+            rerank_top_n=get_int("RERANK_TOP_N", 5),
+            chunk_store=chunk_store,
+            scheduler=load_scheduler(),
+            latency_budget=get_float("LATENCY_BUDGET_SECONDS", 20) or None,
+            stage_timeouts={
+                "vector_query": get_float("VECTOR_QUERY_TIMEOUT_SECONDS", 5),
+                "llm_ttft": get_float("LLM_TTFT_TIMEOUT_SECONDS", 8),
+            },
+            hedger=Hedger(
+                quantile=get_float("HEDGE_QUANTILE", 0.95),
+                max_hedge_ratio=get_float("HEDGE_MAX_RATIO", 0.05),
+            ) if get_bool("HEDGE_VECTOR_QUERIES", True) else None,
+        )
+        if chunk_store is not None:
+            register_cache("chunk_text", chunk_store.cache)
+        register_cache("embedding", pipeline.embedding_cache)
+        register_cache("results", pipeline.results_cache)
+        register_cache("answer", pipeline.answer_cache)
+        return pipeline
+
+    def with_options(self, **options):
+        """
+        A pipeline sharing this one's clients and caches, with some constructor options changed.
+        """
+        kwargs = {
+            "index": self._index,
+            "llm": self._llm,
+            "model": self._model,
+            "embedding_cache": self.embedding_cache,
+            "results_cache": self.results_cache,
+            "answer_cache": self.answer_cache,
+            "reranker": self._reranker,
+            "lexical_index": self.lexical_index,
+            "llm_model": self.llm_model,
+            "diversify_strategy": self.diversify_strategy,
+            "mmr_lambda": self.mmr_lambda,
+            "context_token_budget": self.context_token_budget,
+            "max_chunk_tokens": self.max_chunk_tokens,
+            "rerank_top_n": self.rerank_top_n,
+            "top_k": self.top_k,
+            "final_k": self.final_k,
+            "max_per_source": self.max_per_source,
+            "chunk_store": self.chunk_store,
+            "index_version_ttl": self.index_version_ttl,
+            "scheduler": self.scheduler,
+            "latency_budget": self.latency_budget,
+            "stage_timeouts": self.stage_timeouts,
+            "hedger": self.hedger,
+            "min_answer_seconds": self.min_answer_seconds,
+        }
+        kwargs.update(options)
+        return Pipeline(**kwargs)
+
+    @property
+    def index(self):
+        return _resolve(self._index)
+
+    @property
+    def llm(self):
+        return _resolve(self._llm)
+
+    @property
+    def model(self):
+        return _resolve(self._model)
+
+    @property
+    def reranker(self):
+        return _resolve(self._reranker)
+
+    def new_deadline(self):
+        """
+        A Deadline for one request under this pipeline's latency budget.
+        """
+        return Deadline(self.latency_budget, self.stage_timeouts)
+
+    def model_ready(self):
+        return not isinstance(self._model, Future) or self._model.done()
+
+    def wait_for_model(self):
+        """
+        Block until the encoder has loaded; raises its load error if it failed.
+        """
+        _resolve(self._model)
+
+    def load_failed(self):
+        """
+        True when a client loading in the background failed (e.g. a network error
+        at cold start); every later access would re-raise the same error.
+        """
+        return any(
+            isinstance(client, Future) and client.done() and client.exception() is not None
+            for client in (self._index, self._llm, self._model, self._reranker)
+        )
+
+    def index_version(self):
+        """
+        Fingerprint of the index content, used to invalidate cached answers after re-ingestion.
+        """
+        return self._version_cache.get_or_compute("version", lambda: self.index.version())
+
+    def embed(self, query):
+        """
+        Encode a query, reusing the embedding of any earlier query with the same normalized text.
+        """
+        return self.embed_many([query])[0]
+
+    def embed_many(self, queries, batch_size=None):
+        """
+        Encode several queries with one batched model call for the cache misses
+        (in encoder batches of batch_size, by default all of them at once).
+        """
+        keys = [normalize_query(query) for query in queries]
+        embeddings = [self.embedding_cache.get(key) for key in keys]
+        missing = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(keys[i], []).append(i)
+        if missing:
+            texts = [queries[rows[0]] for rows in missing.values()]
+            encoded = self.model.encode(texts, batch_size=batch_size or max(1, len(texts)))
+            for (key, rows), vector in zip(missing.items(), encoded):
+                vector = vector.tolist()
+                self.embedding_cache.set(key, vector)
+                for i in rows:
+                    embeddings[i] = vector
+        return embeddings
+
+    def hydrate(self, matches):
+        """
+        Fill in chunk texts from the chunk store for matches whose metadata has
+        none. Returns new Match objects; the cached ones are left untouched.
+        """
+        if self.chunk_store is None:
+            return matches
+        missing = [match.id for match in matches if "text" not in match.metadata]
+        if not missing:
+            return matches
+        texts = self.chunk_store.get_many(missing)
+        return [
+            Match(match.id, match.score, dict(match.metadata, text=texts[match.id]), match.values)
+            if match.id in texts and "text" not in match.metadata else match
+            for match in matches
+        ]
+
+    def query_index(self, query, query_embedding, top_k=TOP_K, filter=None, include_values=False, timeout=None,
+                    trace=None):
+        """
+        Run index.query (fused with BM25 when hybrid search is on), reusing the
+        matches of an identical earlier lookup. With timeout, raises
+        DeadlineExceeded when the index takes longer.
+        """
+        key = (embedding_key(query_embedding), filter_key(filter), top_k, include_values)
+        if self.lexical_index is not None:
+            return self.results_cache.get_or_compute(
+                key + (normalize_query(query),),
+                lambda: self._call_index(lambda: hybrid_search(
+                    self.index,
+                    self.lexical_index,
+                    query,
+                    query_embedding,
+                    top_k=top_k,
+                    filter=filter,
+                    include_values=include_values
+                ), timeout, trace)
+            )
+        return self.results_cache.get_or_compute(
+            key,
+            lambda: self._call_index(lambda: self.index.query(
+                namespace="",
+                vector=query_embedding,
+                top_k=top_k,
+                include_metadata=True,
+                include_values=include_values,
+                filter=filter
+            ).matches, timeout, trace)
+        )
+
+    def _call_index(self, fn, timeout, trace):
+        """
+        A vector store call, hedged when there is a Hedger, bounded by timeout seconds.
+        """
+        if self.hedger is None:
+            return call_with_timeout(self._executor, fn, timeout, "vector_query")
+        matches, hedged, won = self.hedger.call(fn, timeout, stage="vector_query")
+        if trace is not None:
+            trace.set(hedged=hedged, hedge_won=won)
+        return matches
+
+    def search(self, query, doc_type=ALL_TYPES, title_filter=None, query_embedding=None, trace=None, deadline=None):
+        """
+        Retrieve, diversify and pack the context for a query; look up a cached answer for it.
+        Concurrent searches with the same normalized query and filter share one run.
+        Stage timings go to trace (a metrics.Trace) when given. deadline (by
+        default a new one under latency_budget) travels on the result to the answer.
+        """
+        trace = trace or NullTrace()
+        deadline = deadline or self.new_deadline()
+        filter = build_filter(doc_type, title_filter)
+        key = (normalize_query(query), filter_key(filter))
+        leader = []
+
+        def run():
+            leader.append(True)
+            return self._search(query, filter, query_embedding, trace, deadline)
+
+        with trace.stage("search"):
+            result = self._searches.do(key, run)
+        trace.set(coalesced=not leader, matches=len(result.sources), cached_answer=result.answer is not None)
+        # Each caller gets its own copy to attach an answer to, with its own
+        # sources and timings so annotating them doesn't leak into other callers
+        result = copy.copy(result)
+        result.sources = [dict(source) for source in result.sources]
+        result.timings = dict(result.timings)
+        result.query = query
+        result.deadline = deadline
+        return result
+
+    def _search(self, query, filter, query_embedding, trace, deadline):
+        if query_embedding is None:
+            with trace.stage("embed"):
+                query_embedding = self.embed(query)
+
+        # Query more results initially to allow for diversification
+        with trace.stage("vector_query"):
+            matches = self.query_index(query, query_embedding, self.top_k, filter,
+                                       include_values=self.diversify_strategy == "mmr",
+                                       timeout=deadline.timeout("vector_query"), trace=trace)
+        MATCHES.observe(len(matches), step="retrieved")
+
+        final_k = self.final_k
+        relevance = None
+        if self._reranker is not None:
+            # The cross-encoder reads every candidate's text
+            with trace.stage("hydrate"):
+                matches = self.hydrate(matches)
+            with trace.stage("rerank"):
+                matches, relevance, rerank_stats = self.reranker.rerank(query, matches)
+            final_k = self.rerank_top_n
+            # MMR weighs the cross-encoder relevance; match scores stay the vector similarity shown to users
+            trace.set(rerank_scored=rerank_stats["scored"], rerank_kept=rerank_stats["kept"])
+
+        # Apply source diversification (max 2 chunks per document by default) and keep the top final_k
+        with trace.stage("diversify"):
+            diversified_matches = diversify(
+                matches,
+                self.diversify_strategy,
+                query_vector=query_embedding,
+                k=final_k,
+                max_per_source=self.max_per_source,
+                lambda_mult=self.mmr_lambda,
+                relevance=relevance
+            )
+
+        with trace.stage("hydrate"):
+            diversified_matches = self.hydrate(diversified_matches)
+
+        # Pack chunk texts in rank order under the token budget, trimming overlong ones
+        with trace.stage("context"):
+            context, source_references, sources = build_context(
+                query,
+                diversified_matches,
+                TokenCounter(getattr(self.model, "tokenizer", None)),
+                token_budget=self.context_token_budget,
+                max_chunk_tokens=self.max_chunk_tokens
+            )
+        MATCHES.observe(len(sources), step="context")
+
+        result = SearchResult(query, query_embedding, filter, context, source_references, sources)
+        if context.strip() and self.answer_cache is not None:
+            with trace.stage("answer_cache"):
+                self.answer_cache.set_index_version(self.index_version())
+                result.answer = self.answer_cache.lookup(query_embedding, result.chunk_ids, filter,
+                                                         self._answer_model(result))
+        result.timings = {f"{name}_ms": round(seconds * 1000, 2) for name, seconds in trace.stages.items()}
+        return result
+
+    def stream_answer(self, result, trace=None):
+        """
+        Yield answer text deltas for a search result from a streamed Groq
+        completion (or the cached answer in one piece), caching the full answer.
+        Callers streaming the same question over the same chunks at the same
+        time share one completion; late joiners replay it from the start.
+        The deadline only bounds the wait for the first token (DeadlineExceeded
+        before any text); a stream that has started is not cut off.
+        """
+        if result.answer is not None:
+            yield result.answer
+            return
+        trace = trace or NullTrace()
+        deadline = self._answer_deadline(result)
+        usage = {}
+        started = time.perf_counter()
+        parts = []
+        # Only the first token is bounded: once tokens flow the user is no longer waiting on a spinner
+        stream = self._streams.stream(self._answer_key(result), lambda: self._generate(copy.copy(result), usage),
+                                      first_timeout=deadline.timeout("llm_ttft"))
+        try:
+            for delta in stream:
+                if not parts:
+                    trace.record("llm_ttft", time.perf_counter() - started)
+                parts.append(delta)
+                yield delta
+        except DeadlineExceeded:
+            raise
+        except TimeoutError:
+            if parts:
+                raise
+            result.degraded = "deadline"
+            raise give_up("llm_ttft") from None
+        trace.record("llm_total", time.perf_counter() - started)
+        # Only the caller whose request ran the completion reports its tokens
+        trace.set(coalesced_answer=not usage, **usage)
+        result.answer = "".join(parts)
+
+    def _generate(self, result, usage):
+        messages = build_messages(result.context, result.source_references, result.query)
+        with self._lease(result, messages) as lease:
+            usage.update(lease.fields())
+            stream = self.scheduler.create(self.llm, lease, messages, stream=True)
+            parts = []
+            for chunk in stream:
+                # Groq reports token usage on the last chunk, under x_groq
+                chunk_usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None)
+                if chunk_usage is not None:
+                    usage.update(record_usage(lease.model, chunk_usage))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        self._store_answer(result, "".join(parts), lease)
+
+    def answer(self, result, trace=None):
+        """
+        Blocking completion for a search result, served from the answer cache when possible.
+        """
+        if result.answer is None:
+            trace = trace or NullTrace()
+            deadline = self._answer_deadline(result)
+            usage = {}
+            with trace.stage("llm_total"):
+                try:
+                    result.answer = call_with_timeout(
+                        self._executor,
+                        lambda: self._answers.do(self._answer_key(result), lambda: self._complete(copy.copy(result), usage)),
+                        deadline.timeout("llm"),
+                        "llm"
+                    )
+                except DeadlineExceeded:
+                    result.degraded = "deadline"
+                    raise
+            trace.set(coalesced_answer=not usage, **usage)
+        return result.answer
+
+    def _answer_deadline(self, result):
+        """
+        The result's deadline; raises DeadlineExceeded when too little of it is left to start an answer.
+        """
+        deadline = result.deadline or Deadline()
+        remaining = deadline.remaining()
+        if remaining is not None and remaining < self.min_answer_seconds:
+            result.degraded = "deadline"
+            raise give_up("llm")
+        return deadline
+
+    def _complete(self, result, usage):
+        messages = build_messages(result.context, result.source_references, result.query)
+        with self._lease(result, messages) as lease:
+            usage.update(lease.fields())
+            response = self.scheduler.create(self.llm, lease, messages)
+        usage.update(record_usage(lease.model, getattr(response, "usage", None)))
+        self._store_answer(result, response.choices[0].message.content, lease)
+        return result.answer
+
+    def _lease(self, result, messages):
+        """
+        Admit one completion with the scheduler; may wait for quota or raise generation.Overloaded.
+        """
+        return self.scheduler.acquire(result.query, self._prompt_tokens(messages), len(result.sources), self.llm_model)
+
+    def _prompt_tokens(self, messages):
+        counter = TokenCounter(getattr(self.model, "tokenizer", None))
+        return sum(counter.count_many([message["content"] for message in messages]))
+
+    def _answer_model(self, result):
+        """
+        The model the routing policy picks for the result, which its cached answer is stored under.
+        """
+        messages = build_messages(result.context, result.source_references, result.query)
+        return self.scheduler.preferred_model(result.query, self._prompt_tokens(messages), len(result.sources),
+                                              self.llm_model)
+
+    def _answer_key(self, result):
+        return normalize_query(result.query), filter_key(result.filter), tuple(result.chunk_ids)
+
+    def _store_answer(self, result, answer, lease):
+        # Cached under the model that wrote it; an answer from the fallback
+        # model under load is not kept, so it can't stand in for the preferred one later
+        result.answer = answer
+        if self.answer_cache is not None and not lease.fallback:
+            self.answer_cache.store(result.query_embedding, result.chunk_ids, result.filter, lease.model, answer)
+
+
+def load_index():
+    # Pinecone by default; VECTOR_BACKEND="local" searches an in-process index instead
+    return open_store()
+
+
+def load_groq():
+    from groq import Groq
+    return Groq(api_key=get_setting("GROQ_API_KEY"))
+
+
+def load_scheduler():
+    # LLM_ROUTING="auto" sends short definitional questions to LLM_FAST_MODEL
+    if get_setting("LLM_ROUTING", "auto") == "auto":
+        policy = RoutingPolicy(
+            fast_max_query_words=get_int("ROUTING_FAST_MAX_QUERY_WORDS", 14),
+            fast_max_context_tokens=get_int("ROUTING_FAST_MAX_CONTEXT_TOKENS", 3000),
+        )
+    else:
+        policy = FixedPolicy()
+    return GenerationScheduler(
+        policy,
+        fast_model=get_setting("LLM_FAST_MODEL", FAST_MODEL),
+        fallback=get_bool("LLM_FALLBACK", True),
+        headroom=get_float("LLM_QUOTA_HEADROOM", 0.1),
+        max_concurrency=get_int("LLM_MAX_CONCURRENCY", 0) or None,
+        max_queue=get_int("LLM_MAX_QUEUE", 64),
+        max_wait=get_float("LLM_MAX_WAIT_SECONDS", 10),
+    )
+
+
+def load_model():
+    # PyTorch SentenceTransformer, or the ONNX Runtime export with ENCODER_BACKEND="onnx"
+    model = load_encoder()
+    # One dummy encode so the first real query doesn't pay for lazy initialization
+    model.encode("warm up")
+    return model
+
+
+def load_reranker():
+    min_score = get_setting("RERANK_MIN_SCORE")
+    reranker = CrossEncoderReranker(
+        get_setting("RERANK_MODEL", DEFAULT_RERANK_MODEL),
+        budget_ms=get_float("RERANK_BUDGET_MS", 250),
+        min_score=float(min_score) if min_score not in (None, "") else None
+    )
+    reranker.warm_up()
+    return reranker
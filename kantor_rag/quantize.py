@@ -0,0 +1,250 @@
+"""
+Compact codes for the local index: a cheap first pass over quantized
+vectors picks a shortlist, which is rescored exactly against the float32
+vectors (memory-mapped, so only the shortlisted rows are read).
+
+    int8     one signed byte per dimension, scaled per dimension       4x smaller
+    binary   one bit per dimension (above/below the corpus mean),     32x smaller
+             compared by Hamming distance
+
+Report the recall loss against exact search:
+
+    python -m kantor_rag.quantize --index-dir index --queries questions.jsonl
+                                  [--method int8 binary] [--oversample 2 4 10] [--top-k 25]
+    python -m kantor_rag.quantize --synthetic 200 ...   # offline, on kantor_rag.fakes
+"""
+import argparse
+import json
+import logging
+import tempfile
+import time
+
+import numpy as np
+
+from kantor_rag.config import get_setting
+from kantor_rag.encoders import load_encoder
+
+logger = logging.getLogger(__name__)
+
+METHODS = ("int8", "binary")
+# Shortlist size is top_k times this, before the exact rescoring
+DEFAULT_OVERSAMPLE = {"int8": 4, "binary": 40}
+# Rows converted to float per step of the int8 scan; small blocks keep the copy in cache
+SCAN_BLOCK_ROWS = 1024
+
+# Bits set in each byte value, for numpy builds without bitwise_count (< 2.0)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class Int8Quantizer:
+    """
+    Symmetric per-dimension scalar quantization: code = round(x / scale),
+    with scale = max |x| / 127 over the corpus.
+    """
+    method = "int8"
+
+    def __init__(self, scale=None):
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float32)
+
+    def fit(self, vectors):
+        peak = np.abs(np.asarray(vectors, dtype=np.float32)).max(axis=0) if len(vectors) else np.ones(0)
+        self.scale = (np.where(peak == 0, 1.0, peak) / 127).astype(np.float32)
+        return self
+
+    def encode(self, vectors):
+        return np.clip(np.rint(np.asarray(vectors, dtype=np.float32) / self.scale), -127, 127).astype(np.int8)
+
+    def scores(self, codes, query):
+        """
+        Approximate inner products of the float query with every code row.
+        """
+        weights = (np.asarray(query, dtype=np.float32) * self.scale).astype(np.float32)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCAN_BLOCK_ROWS):
+            block = codes[start:start + SCAN_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ weights
+        return scores
+
+    def state(self):
+        return {"method": self.method, "scale": self.scale.tolist()}
+
+
+class BinaryQuantizer:
+    """
+    One bit per dimension, set when the value is above the corpus mean of
+    that dimension; rows are packed to bytes and compared by Hamming distance.
+    """
+    method = "binary"
+
+    def __init__(self, threshold=None):
+        self.threshold = None if threshold is None else np.asarray(threshold, dtype=np.float32)
+
+    def fit(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.threshold = vectors.mean(axis=0) if len(vectors) else np.zeros(vectors.shape[1], dtype=np.float32)
+        return self
+
+    def encode(self, vectors):
+        return np.packbits(np.asarray(vectors, dtype=np.float32) > self.threshold, axis=-1)
+
+    def scores(self, codes, query):
+        """
+        Bits in agreement with the query's code; higher is closer.
+        """
+        query_code = self.encode(np.asarray(query, dtype=np.float32)[None, :])[0]
+        differing = np.bitwise_xor(codes, query_code)
+        if hasattr(np, "bitwise_count"):
+            distances = np.bitwise_count(differing).sum(axis=1, dtype=np.int32)
+        else:
+            distances = _POPCOUNT[differing].sum(axis=1, dtype=np.int32)
+        return (codes.shape[1] * 8 - distances).astype(np.float32)
+
+    def state(self):
+        return {"method": self.method, "threshold": self.threshold.tolist()}
+
+
+def make_quantizer(method):
+    """
+    Quantizer for "int8" or "binary"; None (or "none") for full-precision search.
+    """
+    if method in (None, "", "none"):
+        return None
+    if method == "int8":
+        return Int8Quantizer()
+    if method == "binary":
+        return BinaryQuantizer()
+    raise ValueError(f"Unknown quantization: {method}")
+
+
+def load_quantizer(state):
+    if state["method"] == "int8":
+        return Int8Quantizer(state["scale"])
+    if state["method"] == "binary":
+        return BinaryQuantizer(state["threshold"])
+    raise ValueError(f"Unknown quantization: {state['method']}")
+
+
+def shortlist(quantizer, codes, query, size):
+    """
+    Indexes into codes of the (unordered) size best approximate scores.
+    """
+    approx = quantizer.scores(codes, query)
+    if size >= len(approx):
+        return np.arange(len(approx))
+    return np.argpartition(-approx, size - 1)[:size]
+
+
+def read_queries(path):
+    """
+    [(query, filter)] from a JSONL/CSV question file, as taken by kantor_rag.batch.
+    """
+    from kantor_rag.batch import read_questions
+    from kantor_rag.pipeline import build_filter
+    return [(q["query"], build_filter(q["doc_type"], q["title"])) for q in read_questions(path)]
+
+
+def recall_report(directory, embeddings, filters, methods=METHODS, oversamples=(None,), top_k=25):
+    """
+    For each method and oversampling factor, the share of the exact top_k
+    that the quantized search returns, its query latency and the size of
+    the codes. Returned scores are exact either way, since the shortlist is
+    rescored in full precision.
+    """
+    # vectorstore imports this module
+    from kantor_rag.vectorstore import LocalStore
+
+    exact = LocalStore(directory, hnsw_threshold=float("inf"))
+    reference, exact_ms = [], []
+    for embedding, metadata_filter in zip(embeddings, filters):
+        started = time.perf_counter()
+        result = exact.query(embedding, top_k=top_k, filter=metadata_filter)
+        exact_ms.append((time.perf_counter() - started) * 1000)
+        reference.append({match.id: match.score for match in result.matches})
+    vector_bytes = exact.vector_bytes()
+
+    rows = [{"method": "exact", "oversample": "", "recall": 1.0,
+             "p50_ms": float(np.percentile(exact_ms, 50)), "p95_ms": float(np.percentile(exact_ms, 95)),
+             "bytes": vector_bytes, "ratio": 1.0}]
+    for method in methods:
+        for oversample in oversamples:
+            store = LocalStore(directory, hnsw_threshold=float("inf"), quantization=method, oversample=oversample)
+            # Codes are built (or read) on first use; keep that out of the timings
+            store.query(embeddings[0], top_k=1)
+            recalls, latencies = [], []
+            for embedding, metadata_filter, expected in zip(embeddings, filters, reference):
+                started = time.perf_counter()
+                result = store.query(embedding, top_k=top_k, filter=metadata_filter)
+                latencies.append((time.perf_counter() - started) * 1000)
+                found = sum(1 for match in result.matches if match.id in expected)
+                recalls.append(found / len(expected) if expected else 1.0)
+            code_bytes = store.code_bytes()
+            rows.append({
+                "method": method,
+                "oversample": store.oversample,
+                "recall": float(np.mean(recalls)),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+                "bytes": code_bytes,
+                "ratio": vector_bytes / code_bytes if code_bytes else 0.0,
+            })
+            logger.info("%s x%d: recall@%d %.4f", method, store.oversample, top_k, rows[-1]["recall"])
+    return rows
+
+
+def format_report(rows, top_k):
+    lines = [f"{'method':>8}{'oversample':>12}{f'recall@{top_k}':>12}{'p50 ms':>9}{'p95 ms':>9}"
+             f"{'MB':>9}{'smaller':>9}"]
+    for row in rows:
+        lines.append(f"{row['method']:>8}{str(row['oversample']):>12}{row['recall']:>12.4f}"
+                     f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['bytes'] / 1e6:>9.2f}{row['ratio']:>8.1f}x")
+    return "\n".join(lines)
+
+
+def synthetic_setup(n, scale=1.0, seed=0):
+    """
+    A local index over the synthetic corpus, with n of its queries embedded.
+    """
+    from kantor_rag.fakes import FakeEncoder, SyntheticCorpus, index_corpus
+    from kantor_rag.vectorstore import LocalStore
+
+    corpus = SyntheticCorpus(scale=scale, seed=seed)
+    encoder = FakeEncoder()
+    directory = tempfile.mkdtemp(prefix="kantor-quantize-")
+    index_corpus(LocalStore(directory, hnsw_threshold=float("inf")), corpus, encoder)
+    queries = [text for text, _ in corpus.queries(n, seed=seed + 1)]
+    return directory, encoder.encode(queries, batch_size=64), [None] * len(queries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the recall of quantized local search against exact search.")
+    parser.add_argument("--index-dir", help="Local index directory (defaults to LOCAL_INDEX_DIR)")
+    parser.add_argument("--queries", help="JSONL or CSV with query, and optional doc_type and filename")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="Use N synthetic queries on a synthetic index")
+    parser.add_argument("--scale", type=float, default=1.0, help="Synthetic corpus size multiplier")
+    parser.add_argument("--method", nargs="+", choices=METHODS, default=list(METHODS))
+    parser.add_argument("--oversample", type=int, nargs="+", help="Shortlist multipliers to compare "
+                                                                   "(default: 4 for int8, 40 for binary)")
+    parser.add_argument("--top-k", type=int, default=25)
+    parser.add_argument("--json", help="Also write the rows to this file")
+    args = parser.parse_args(argv)
+    if not args.queries and not args.synthetic:
+        parser.error("give --queries FILE or --synthetic N")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.synthetic:
+        directory, embeddings, filters = synthetic_setup(args.synthetic, args.scale)
+    else:
+        directory = args.index_dir or get_setting("LOCAL_INDEX_DIR", "index")
+        queries = read_queries(args.queries)
+        embeddings = load_encoder().encode([query for query, _ in queries], batch_size=64)
+        filters = [metadata_filter for _, metadata_filter in queries]
+
+    rows = recall_report(directory, embeddings, filters, args.method, args.oversample or [None], args.top_k)
+    print(format_report(rows, args.top_k))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
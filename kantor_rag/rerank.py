@@ -0,0 +1,80 @@
+import time
+
+import numpy as np
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """
+    Re-scores retrieved chunks with a small local cross-encoder on CPU.
+
+    All candidates are scored in one batched predict() call. To stay within
+    budget_ms, the number of candidates scored is capped using a running
+    estimate of the per-pair cost, so a slow host scores fewer candidates
+    rather than blowing the latency budget (but never fewer than
+    min_candidates); candidates beyond the cap keep their bi-encoder order
+    after the reranked ones. With min_score set (on the raw cross-encoder
+    logits), anything scoring below it, or left unscored, is cut.
+
+    Matches keep their bi-encoder similarity as score, which the UI shows;
+    the cross-encoder's logits come back separately as relevance, squashed
+    into (0, 1) by a sigmoid. Unscored candidates get relevance below every
+    scored one, still falling in their original order.
+    """
+
+    def __init__(self, model_name=DEFAULT_RERANK_MODEL, budget_ms=250, min_score=None, min_candidates=10,
+                 max_length=512, model=None):
+        if model is None:
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self.model = model
+        self.min_candidates = min_candidates
+        self.budget_ms = budget_ms
+        self.min_score = min_score
+        # Running estimate of milliseconds per (query, chunk) pair
+        self._pair_ms = None
+
+    def warm_up(self):
+        self._score("warm up", ["warm up"] * 4)
+
+    def rerank(self, query, matches):
+        """
+        Return (reranked matches, relevance, stats) where relevance holds each
+        match's cross-encoder relevance in (0, 1) and stats has rerank_ms, scored and kept.
+        """
+        started = time.perf_counter()
+        if not matches:
+            return [], [], {"rerank_ms": 0.0, "scored": 0, "kept": 0}
+
+        limit = len(matches)
+        if self._pair_ms and self.budget_ms:
+            limit = max(self.min_candidates, int(self.budget_ms / self._pair_ms))
+        candidates, rest = matches[:limit], matches[limit:]
+
+        scores = self._score(query, [match.metadata.get("text", "") for match in candidates])
+        order = np.argsort(-scores, kind="stable")
+        if self.min_score is not None:
+            order = [i for i in order if scores[i] >= self.min_score]
+            rest = []
+        # The logistic sigmoid, in a form that can't overflow on large logits
+        relevance = [float(0.5 * (1 + np.tanh(scores[i] / 2))) for i in order]
+        # The unscored tail ranks below the lowest scored candidate, in its original order
+        lowest = min(relevance, default=1.0)
+        relevance += [lowest * (len(rest) - j) / (len(rest) + 1) for j in range(len(rest))]
+        reranked = [candidates[i] for i in order] + rest
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        return reranked, relevance, {"rerank_ms": elapsed_ms, "scored": len(candidates), "kept": len(reranked)}
+
+    def _score(self, query, texts):
+        started = time.perf_counter()
+        scores = self.model.predict(
+            [(query, text) for text in texts],
+            batch_size=max(1, len(texts)),
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+        pair_ms = (time.perf_counter() - started) * 1000 / max(1, len(texts))
+        self._pair_ms = pair_ms if self._pair_ms is None else 0.8 * self._pair_ms + 0.2 * pair_ms
+        return np.asarray(scores, dtype=np.float32)
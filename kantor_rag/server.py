@@ -0,0 +1,159 @@
+"""
+Headless HTTP API over the same pipeline as the Streamlit app.
+
+    python -m kantor_rag.server [--host 0.0.0.0] [--port 8000]
+
+    POST /search  {"query": ..., "doc_type": "All Types", "title": null}
+        -> {"query", "filter", "sources", "answer" (cached answer or null), "timings"}
+    POST /answer  same body; streams the answer as text/plain,
+        or returns the /search JSON with the answer filled in when "stream" is false;
+        503 with the sources and a Retry-After when the LLM is over its rate limit,
+        and the sources alone ("degraded": "deadline") when the latency budget runs out
+    GET /metrics  Prometheus text format (kantor_rag.metrics)
+
+Query embeddings of concurrent requests are computed in micro-batches
+(EMBED_BATCH_SIZE queries, waiting at most EMBED_MAX_WAIT_MS for a batch to fill).
+Needs fastapi and uvicorn.
+"""
+import argparse
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from kantor_rag import metrics, warmup
+from kantor_rag.batching import MicroBatcher
+from kantor_rag.config import get_setting, get_int, get_float
+from kantor_rag.deadline import DeadlineExceeded
+from kantor_rag.generation import Overloaded
+from kantor_rag.pipeline import ALL_TYPES, Pipeline
+
+logger = logging.getLogger(__name__)
+
+
+class SearchRequest(BaseModel):
+    query: str
+    doc_type: str = ALL_TYPES
+    title: str | None = None
+    stream: bool = True
+
+
+def create_app(pipeline=None, max_batch_size=None, max_wait_ms=None):
+    pipeline = pipeline or Pipeline.from_settings(background=warmup.background)
+    batcher = MicroBatcher(
+        pipeline.embed_many,
+        max_batch_size=max_batch_size or get_int("EMBED_BATCH_SIZE", 32),
+        max_wait_ms=max_wait_ms if max_wait_ms is not None else get_float("EMBED_MAX_WAIT_MS", 5)
+    )
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await batcher.close()
+
+    app = FastAPI(title="J.R. Kantor Research System", lifespan=lifespan)
+    app.state.pipeline = pipeline
+
+    async def search(request, trace):
+        # The budget starts with the request, so batching waits count against it
+        deadline = pipeline.new_deadline()
+        with trace.stage("embed"):
+            query_embedding = await batcher.submit(request.query)
+        return await run_in_threadpool(
+            pipeline.search, request.query, request.doc_type, request.title, query_embedding, trace, deadline
+        )
+
+    def traced_stream(first, stream, trace):
+        try:
+            if first is not None:
+                yield first
+            yield from stream
+        except Exception as e:
+            trace.finish("error", e)
+            raise
+        trace.finish()
+
+    def shed_response(result, error):
+        """
+        503 with the search result (sources, no answer) when the LLM is over its rate limit.
+        """
+        headers = {"Retry-After": str(max(1, round(error.retry_after)))} if error.retry_after else None
+        result.degraded = "shed"
+        return JSONResponse(dict(result.to_dict(), error=str(error)), status_code=503, headers=headers)
+
+    @app.get("/health")
+    async def health():
+        return {"model_ready": pipeline.model_ready(), "startup": warmup.phase_timings()}
+
+    @app.get("/metrics")
+    async def metrics_endpoint():
+        return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+    @app.post("/search")
+    async def search_endpoint(request: SearchRequest):
+        trace = metrics.Trace("api_search", doc_type=request.doc_type)
+        try:
+            result = await search(request, trace)
+        except DeadlineExceeded as e:
+            trace.finish("deadline", e)
+            return JSONResponse({"error": str(e)}, status_code=504)
+        except Exception as e:
+            trace.finish("error", e)
+            raise
+        trace.finish("ok" if result.sources else "no_results")
+        return result.to_dict()
+
+    @app.post("/answer")
+    async def answer_endpoint(request: SearchRequest):
+        trace = metrics.Trace("api_answer", doc_type=request.doc_type, stream=request.stream)
+        try:
+            result = await search(request, trace)
+        except DeadlineExceeded as e:
+            trace.finish("deadline", e)
+            return JSONResponse({"error": str(e)}, status_code=504)
+        except Exception as e:
+            trace.finish("error", e)
+            raise
+        try:
+            if not result.context.strip():
+                trace.finish("no_results")
+                return result.to_dict()
+            if not request.stream:
+                await run_in_threadpool(pipeline.answer, result, trace)
+                trace.finish()
+                return result.to_dict()
+            # The first delta is where the scheduler admits (or sheds) the completion
+            stream = pipeline.stream_answer(result, trace)
+            first = await run_in_threadpool(next, stream, None)
+        except Overloaded as e:
+            trace.finish("shed", e)
+            return shed_response(result, e)
+        except DeadlineExceeded as e:
+            # Out of budget for the answer: the ranked sources alone
+            trace.finish("degraded", e)
+            return result.to_dict()
+        except Exception as e:
+            trace.finish("error", e)
+            raise
+        # Starlette iterates the blocking Groq stream on its thread pool
+        return StreamingResponse(traced_stream(first, stream, trace), media_type="text/plain; charset=utf-8")
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the search pipeline over HTTP.")
+    parser.add_argument("--host", default=get_setting("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=get_int("API_PORT", 8000))
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    logging.basicConfig(level=get_setting("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+
+from kantor_rag.generation import Overloaded
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls: while fn runs for a key, other callers with
+    the same key wait for it and get the same result (or exception) instead of
+    running fn themselves. Nothing is kept once the call finishes; caching is
+    left to the caches.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class _Broadcast:
+    """
+    Drains a generator on its own thread into a list that any number of
+    subscribers read from the start, each at its own pace.
+    """
+
+    def __init__(self, generator, on_done):
+        self._generator = generator
+        self._on_done = on_done
+        self._items = []
+        self._finished = False
+        self._error = None
+        self._cond = threading.Condition()
+        threading.Thread(target=self._run, daemon=True, name="singleflight-stream").start()
+
+    def _run(self):
+        try:
+            for item in self._generator:
+                with self._cond:
+                    self._items.append(item)
+                    self._cond.notify_all()
+        except Overloaded as e:
+            # Load shedding is expected under load; a traceback per shed request is noise
+            logger.warning("shared stream shed: %s", e)
+            self._error = e
+        except BaseException as e:
+            logger.exception("shared stream failed")
+            self._error = e
+        finally:
+            self._on_done()
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
+
+    def subscribe(self, first_timeout=None):
+        """
+        Yield every item from the start. With first_timeout, raise TimeoutError
+        if no item arrives within that many seconds; the stream itself goes on.
+        """
+        position = 0
+        first_by = None if first_timeout is None else time.monotonic() + first_timeout
+        while True:
+            with self._cond:
+                while position == len(self._items) and not self._finished:
+                    if position == 0 and first_by is not None:
+                        left = first_by - time.monotonic()
+                        if left <= 0:
+                            raise TimeoutError(f"no output within {first_timeout:.1f} s")
+                        self._cond.wait(left)
+                    else:
+                        self._cond.wait()
+                items = self._items[position:]
+                finished = self._finished
+            position += len(items)
+            yield from items
+            if finished and position == len(self._items):
+                if self._error is not None:
+                    raise self._error
+                return
+
+
+class StreamGroup:
+    """
+    Single-flight for streams: the first caller for a key starts the stream;
+    callers arriving while it is in flight replay what was produced so far and
+    then follow it live. The stream runs to completion even if a subscriber
+    stops reading, so the others still get the whole of it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams = {}
+        self.shared = 0
+
+    def stream(self, key, start, first_timeout=None):
+        with self._lock:
+            broadcast = self._streams.get(key)
+            if broadcast is None:
+                broadcast = self._streams[key] = _Broadcast(start(), lambda: self._finish(key))
+            else:
+                self.shared += 1
+        return broadcast.subscribe(first_timeout)
+
+    def _finish(self, key):
+        with self._lock:
+            self._streams.pop(key, None)
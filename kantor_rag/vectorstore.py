@@ -0,0 +1,532 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+from kantor_rag.config import get_setting, get_int
+from kantor_rag.filters import FilterIndex, matches_filter
+from kantor_rag.quantize import DEFAULT_OVERSAMPLE, load_quantizer, make_quantizer, shortlist
+
+logger = logging.getLogger(__name__)
+
+# Local indexes with at least this many vectors are searched through HNSW
+DEFAULT_HNSW_THRESHOLD = 20000
+# Filtered searches matching at most this many rows are scanned exactly, even with HNSW
+EXACT_FILTER_ROWS = 4096
+# Pinecone namespace and record holding the content fingerprint written by ingestion
+VERSION_NAMESPACE = "kantor-meta"
+VERSION_ID = "index-version"
+
+
+class Match:
+    """
+    One query result, shaped like Pinecone's ScoredVector (id, score, metadata, values).
+    """
+    __slots__ = ("id", "score", "metadata", "values")
+
+    def __init__(self, id, score, metadata=None, values=None):
+        self.id = id
+        self.score = score
+        self.metadata = metadata if metadata is not None else {}
+        self.values = values if values is not None else []
+
+    def __repr__(self):
+        return f"Match(id={self.id!r}, score={self.score:.4f})"
+
+
+class QueryResult:
+    def __init__(self, matches):
+        self.matches = matches
+
+
+class VectorStore:
+    """
+    Interface shared by the vector index backends.
+    query() takes the same arguments as Pinecone's Index.query and returns
+    an object with a .matches list sorted by descending score.
+    """
+
+    def query(self, vector, top_k=10, filter=None, include_metadata=True, include_values=False, namespace=""):
+        raise NotImplementedError
+
+    def upsert(self, items, batch_size=100):
+        """
+        Insert or replace (id, values, metadata) tuples.
+        """
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Remove every vector.
+        """
+        raise NotImplementedError
+
+    def fetch(self, ids):
+        """
+        Return {id: Match} for the ids that exist (score is 0.0).
+        """
+        raise NotImplementedError
+
+    def version(self):
+        """
+        Fingerprint of the index content; changes whenever vectors are added, removed or replaced.
+        """
+        raise NotImplementedError
+
+    def set_version(self, version):
+        """
+        Record the content fingerprint computed by ingestion (Manifest.fingerprint).
+        A no-op for backends that fingerprint their own content.
+        """
+
+    def flush(self):
+        """
+        Persist pending writes. A no-op for backends that write through.
+        """
+
+
+class PineconeStore(VectorStore):
+    def __init__(self, index, namespace=""):
+        self.index = index
+        self.namespace = namespace
+
+    @classmethod
+    def connect(cls, api_key, index_name="kantor-rag"):
+        from pinecone import Pinecone
+        return cls(Pinecone(api_key=api_key).Index(index_name))
+
+    def query(self, vector, top_k=10, filter=None, include_metadata=True, include_values=False, namespace=None):
+        return self.index.query(
+            namespace=self.namespace if namespace is None else namespace,
+            vector=vector,
+            top_k=top_k,
+            include_metadata=include_metadata,
+            include_values=include_values,
+            filter=filter
+        )
+
+    def upsert(self, items, batch_size=100):
+        batch = []
+        for chunk_id, values, metadata in items:
+            batch.append({"id": chunk_id, "values": _as_list(values), "metadata": metadata})
+            if len(batch) >= batch_size:
+                self.index.upsert(vectors=batch, namespace=self.namespace)
+                batch = []
+        if batch:
+            self.index.upsert(vectors=batch, namespace=self.namespace)
+
+    def delete(self, ids, batch_size=1000):
+        ids = list(ids)
+        for start in range(0, len(ids), batch_size):
+            self.index.delete(ids=ids[start:start + batch_size], namespace=self.namespace)
+
+    def clear(self):
+        self.index.delete(delete_all=True, namespace=self.namespace)
+
+    def fetch(self, ids):
+        response = self.index.fetch(ids=list(ids), namespace=self.namespace)
+        return {
+            vector_id: Match(vector_id, 0.0, vector.metadata or {}, vector.values)
+            for vector_id, vector in response.vectors.items()
+        }
+
+    def version(self):
+        response = self.index.fetch(ids=[VERSION_ID], namespace=VERSION_NAMESPACE)
+        record = response.vectors.get(VERSION_ID)
+        if record is not None and (record.metadata or {}).get("version"):
+            return record.metadata["version"]
+        # Indexes ingested before the fingerprint record existed
+        return str(self.index.describe_index_stats().total_vector_count)
+
+    def set_version(self, version):
+        # Kept in its own namespace so searches never see it; Pinecone rejects all-zero vectors
+        dimension = self.index.describe_index_stats().dimension
+        self.index.upsert(
+            vectors=[{"id": VERSION_ID, "values": [1.0] + [0.0] * (dimension - 1), "metadata": {"version": version}}],
+            namespace=VERSION_NAMESPACE
+        )
+
+
+class LocalStore(VectorStore):
+    """
+    In-process index over unit-normalized float32 vectors, so inner product is cosine.
+
+    On-disk layout of the index directory:
+        vectors.npy     N x D float32, memory-mapped on load
+        ids.json        chunk id of each row
+        metadata.json   metadata dict of each row
+        hnsw.bin        HNSW graph (only for indexes above hnsw_threshold)
+        codes.npy       quantized vectors (only with quantization)
+        info.json       dimension, count, content version, ingest fingerprint and quantizer state
+
+    Small indexes are searched exactly with one matrix-vector product; larger
+    ones through an hnswlib graph when hnswlib is installed. doc_type and
+    filename filters resolve to row sets through a FilterIndex built at load
+    time, so a filtered search only scores the matching rows.
+
+    With quantization ("int8" or "binary", see kantor_rag.quantize) every
+    search scans the in-memory codes instead, and rescores a shortlist of
+    top_k * oversample rows against the memory-mapped float vectors. No
+    HNSW graph is built then, as it would hold the float vectors in memory.
+    """
+
+    def __init__(self, directory, dimension=None, hnsw_threshold=DEFAULT_HNSW_THRESHOLD, quantization=None,
+                 oversample=None):
+        self.directory = directory
+        self.hnsw_threshold = hnsw_threshold
+        self.dimension = dimension
+        self._quantizer = make_quantizer(quantization)
+        self.oversample = oversample or DEFAULT_OVERSAMPLE.get(quantization, 1)
+        self._codes = None
+        self._ids = []
+        self._metadata = []
+        self._vectors = np.zeros((0, dimension or 0), dtype=np.float32)
+        self._row_of = {}
+        self._pending = []
+        self._hnsw = None
+        self._filter_index = None
+        self._version = "empty"
+        self._fingerprint = None
+        self._dirty = False
+        if os.path.exists(os.path.join(directory, "info.json")):
+            self._load()
+
+    def _load(self):
+        with open(os.path.join(self.directory, "info.json")) as f:
+            info = json.load(f)
+        with open(os.path.join(self.directory, "ids.json")) as f:
+            self._ids = json.load(f)
+        with open(os.path.join(self.directory, "metadata.json")) as f:
+            self._metadata = json.load(f)
+        self._vectors = np.load(os.path.join(self.directory, "vectors.npy"), mmap_mode="r")
+        self.dimension = info["dimension"]
+        self._version = info["version"]
+        self._fingerprint = info.get("fingerprint")
+        self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._filter_index = FilterIndex(self._metadata)
+        self._codes = None
+        codes_path = os.path.join(self.directory, "codes.npy")
+        state = info.get("quantization")
+        if self._quantizer is not None:
+            # Codes written for another method (or none) are rebuilt on first query
+            if state and state["method"] == self._quantizer.method and os.path.exists(codes_path):
+                self._quantizer = load_quantizer(state)
+                self._codes = np.load(codes_path)
+            return
+        hnsw_path = os.path.join(self.directory, "hnsw.bin")
+        if len(self._ids) >= self.hnsw_threshold and os.path.exists(hnsw_path):
+            self._hnsw = _load_hnsw(hnsw_path, self.dimension, len(self._ids))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def query(self, vector, top_k=10, filter=None, include_metadata=True, include_values=False, namespace=""):
+        if not self._ids:
+            return QueryResult([])
+        self._materialize()
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        candidates = self._filter_rows(filter)
+        if self._quantizer is not None:
+            rows, scores = self._search_quantized(query, top_k, candidates)
+        # Selective filters (e.g. one document) are cheaper to scan exactly than to walk the graph
+        elif self._hnsw is not None and (candidates is None or len(candidates) > EXACT_FILTER_ROWS):
+            rows, scores = self._search_hnsw(query, top_k, candidates)
+        else:
+            rows, scores = self._search_exact(query, top_k, candidates)
+        return QueryResult([
+            Match(
+                self._ids[row],
+                float(score),
+                self._metadata[row] if include_metadata else {},
+                self._vectors[row].tolist() if include_values else []
+            )
+            for row, score in zip(rows, scores)
+        ])
+
+    def _filter_rows(self, metadata_filter):
+        """
+        Rows that pass the filter (None for no filter), from the precomputed
+        bitmaps when possible and a row-by-row scan otherwise.
+        """
+        if not metadata_filter:
+            return None
+        if self._filter_index is None:
+            self._filter_index = FilterIndex(self._metadata)
+        rows = self._filter_index.rows(metadata_filter)
+        if rows is None:
+            rows = np.array(
+                [row for row, metadata in enumerate(self._metadata) if matches_filter(metadata, metadata_filter)],
+                dtype=np.int32
+            )
+        return rows
+
+    def _search_exact(self, query, top_k, candidates):
+        if candidates is None:
+            scores = self._vectors @ query
+        elif len(candidates) * 4 > len(self._ids):
+            # Gathering a large share of rows costs more than scoring them all
+            scores = (self._vectors @ query)[candidates]
+        else:
+            scores = self._vectors[candidates] @ query
+        top = _top_k(scores, top_k)
+        rows = top if candidates is None else candidates[top]
+        return rows, scores[top]
+
+    def _search_quantized(self, query, top_k, candidates):
+        codes = self._quantized_codes()
+        if candidates is not None:
+            codes = codes[candidates]
+        rows = shortlist(self._quantizer, codes, query, top_k * self.oversample)
+        if candidates is not None:
+            rows = candidates[rows]
+        # Rows in file order, so the memory-mapped reads go forward
+        rows = np.sort(rows)
+        scores = self._vectors[rows] @ query
+        top = _top_k(scores, top_k)
+        return rows[top], scores[top]
+
+    def _quantized_codes(self):
+        """
+        Codes for every row, (re)fitted on the current vectors after changes.
+        """
+        if self._codes is None or len(self._codes) != len(self._ids):
+            self._materialize()
+            vectors = np.asarray(self._vectors)
+            self._quantizer.fit(vectors)
+            self._codes = self._quantizer.encode(vectors)
+        return self._codes
+
+    def vector_bytes(self):
+        return len(self._ids) * (self.dimension or 0) * 4
+
+    def code_bytes(self):
+        return 0 if self._quantizer is None else self._quantized_codes().nbytes
+
+    def _search_hnsw(self, query, top_k, candidates):
+        count = len(self._ids) if candidates is None else len(candidates)
+        k = min(top_k, count)
+        if k == 0:
+            return [], []
+        self._hnsw.set_ef(max(64, 4 * k))
+        if candidates is None:
+            labels, distances = self._hnsw.knn_query(query, k=k)
+        else:
+            mask = np.zeros(len(self._ids), dtype=bool)
+            mask[candidates] = True
+            labels, distances = self._hnsw.knn_query(query, k=k, filter=lambda label: bool(mask[label]))
+        # hnswlib's "ip" space reports 1 - inner product
+        return labels[0], 1.0 - distances[0]
+
+    def upsert(self, items, batch_size=100):
+        ids, vectors, metadata = [], [], []
+        for chunk_id, values, meta in items:
+            ids.append(chunk_id)
+            vectors.append(np.asarray(values, dtype=np.float32))
+            metadata.append(meta)
+        if not ids:
+            return
+        vectors = _normalize(np.vstack(vectors))
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+            self._vectors = np.zeros((0, self.dimension), dtype=np.float32)
+        for i, chunk_id in enumerate(ids):
+            row = self._row_of.get(chunk_id)
+            if row is None:
+                self._row_of[chunk_id] = len(self._ids)
+                self._ids.append(chunk_id)
+                self._metadata.append(metadata[i])
+                self._pending.append(vectors[i])
+            else:
+                self._materialize()
+                if not self._vectors.flags.writeable:
+                    self._vectors = np.array(self._vectors)
+                self._vectors[row] = vectors[i]
+                self._metadata[row] = metadata[i]
+        self._hnsw = None
+        self._filter_index = None
+        self._codes = None
+        self._dirty = True
+
+    def _materialize(self):
+        """
+        Append rows buffered by upsert() to the vector matrix in one copy,
+        so bulk ingestion doesn't re-copy the matrix on every batch.
+        """
+        if self._pending:
+            self._vectors = np.vstack([self._vectors, np.vstack(self._pending)])
+            self._pending = []
+
+    def delete(self, ids):
+        drop = {self._row_of[chunk_id] for chunk_id in ids if chunk_id in self._row_of}
+        if not drop:
+            return
+        self._materialize()
+        keep = [row for row in range(len(self._ids)) if row not in drop]
+        self._ids = [self._ids[row] for row in keep]
+        self._metadata = [self._metadata[row] for row in keep]
+        self._vectors = np.asarray(self._vectors)[keep]
+        self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+        self._hnsw = None
+        self._filter_index = None
+        self._codes = None
+        self._dirty = True
+
+    def clear(self):
+        self._ids = []
+        self._metadata = []
+        self._vectors = np.zeros((0, self.dimension or 0), dtype=np.float32)
+        self._row_of = {}
+        self._pending = []
+        self._hnsw = None
+        self._filter_index = None
+        self._codes = None
+        self._fingerprint = None
+        self._dirty = True
+
+    def fetch(self, ids):
+        self._materialize()
+        found = {}
+        for chunk_id in ids:
+            row = self._row_of.get(chunk_id)
+            if row is not None:
+                found[chunk_id] = Match(chunk_id, 0.0, self._metadata[row], self._vectors[row].tolist())
+        return found
+
+    def version(self):
+        return self._version
+
+    def set_version(self, version):
+        """
+        Fold ingestion's content fingerprint into the version, so a re-ingest
+        under new settings changes it even where chunk ids and metadata don't.
+        """
+        self._materialize()
+        self._fingerprint = version
+        self._version = self._content_version()
+        info_path = os.path.join(self.directory, "info.json")
+        if os.path.exists(info_path):
+            with open(info_path) as f:
+                info = json.load(f)
+            info.update(version=self._version, fingerprint=version)
+            _write_json(info_path, info)
+
+    def _content_version(self):
+        # Chunk ids, their metadata (text included unless it lives in a chunk store) and the ingest fingerprint
+        digest = hashlib.sha1()
+        for row in sorted(range(len(self._ids)), key=self._ids.__getitem__):
+            digest.update(self._ids[row].encode("utf-8"))
+            digest.update(json.dumps(self._metadata[row], sort_keys=True, default=str).encode("utf-8"))
+        if self._fingerprint:
+            digest.update(self._fingerprint.encode("utf-8"))
+        return f"{len(self._ids)}-{digest.hexdigest()[:12]}"
+
+    def flush(self):
+        """
+        Write the index to its directory and rebuild the HNSW graph if it is
+        large enough, or the quantized codes when quantization is on.
+        """
+        if not self._dirty:
+            return
+        self._materialize()
+        os.makedirs(self.directory, exist_ok=True)
+        vectors = np.ascontiguousarray(self._vectors, dtype=np.float32)
+        self._version = self._content_version()
+        _write_atomic(os.path.join(self.directory, "vectors.npy"), lambda f: np.save(f, vectors))
+        _write_json(os.path.join(self.directory, "ids.json"), self._ids)
+        _write_json(os.path.join(self.directory, "metadata.json"), self._metadata)
+        hnsw_path = os.path.join(self.directory, "hnsw.bin")
+        codes_path = os.path.join(self.directory, "codes.npy")
+        info = {
+            "dimension": self.dimension,
+            "count": len(self._ids),
+            "version": self._version,
+            "fingerprint": self._fingerprint,
+        }
+        if self._quantizer is not None:
+            codes = self._quantized_codes()
+            _write_atomic(codes_path, lambda f: np.save(f, codes))
+            info["quantization"] = self._quantizer.state()
+        elif os.path.exists(codes_path):
+            os.remove(codes_path)
+        if len(self._ids) >= self.hnsw_threshold and self._quantizer is None:
+            self._hnsw = _build_hnsw(vectors, hnsw_path)
+        elif os.path.exists(hnsw_path):
+            os.remove(hnsw_path)
+        _write_json(os.path.join(self.directory, "info.json"), info)
+        self._dirty = False
+        self._load()
+
+
+def open_store(backend=None, directory=None):
+    """
+    Build the vector store selected by VECTOR_BACKEND ("pinecone" or "local").
+    """
+    backend = backend or get_setting("VECTOR_BACKEND", "pinecone")
+    if backend == "local":
+        return LocalStore(
+            directory or get_setting("LOCAL_INDEX_DIR", "index"),
+            hnsw_threshold=get_int("HNSW_THRESHOLD", DEFAULT_HNSW_THRESHOLD),
+            quantization=get_setting("VECTOR_QUANTIZATION"),
+            oversample=get_int("QUANTIZATION_OVERSAMPLE", 0) or None
+        )
+    if backend == "pinecone":
+        return PineconeStore.connect(get_setting("PINECONE_API_KEY"), get_setting("PINECONE_INDEX", "kantor-rag"))
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
+
+
+def _top_k(scores, k):
+    if k >= len(scores):
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _as_list(values):
+    return values.tolist() if isinstance(values, np.ndarray) else list(values)
+
+
+def _write_atomic(path, write):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _write_json(path, data):
+    _write_atomic(path, lambda f: f.write(json.dumps(data, ensure_ascii=False).encode("utf-8")))
+
+
+def _build_hnsw(vectors, path):
+    try:
+        import hnswlib
+    except ImportError:
+        logger.warning("hnswlib is not installed; falling back to exact search over %d vectors", len(vectors))
+        return None
+    graph = hnswlib.Index(space="ip", dim=vectors.shape[1])
+    graph.init_index(max_elements=len(vectors), ef_construction=200, M=16)
+    graph.add_items(vectors, np.arange(len(vectors)))
+    tmp = path + ".tmp"
+    graph.save_index(tmp)
+    os.replace(tmp, path)
+    return graph
+
+
+def _load_hnsw(path, dimension, count):
+    try:
+        import hnswlib
+    except ImportError:
+        logger.warning("hnswlib is not installed; using exact search")
+        return None
+    graph = hnswlib.Index(space="ip", dim=dimension)
+    graph.load_index(path, max_elements=count)
+    return graph
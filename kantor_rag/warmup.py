@@ -0,0 +1,52 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Set when this module is first imported, i.e. early in process start-up
+PROCESS_START = time.perf_counter()
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="warmup")
+_phases = {}
+_lock = threading.Lock()
+
+
+def timed(phase, fn, *args, **kwargs):
+    """
+    Run fn, recording and logging how long the start-up phase took.
+    """
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    record(phase, (time.perf_counter() - started) * 1000)
+    return result
+
+
+def background(phase, fn, *args, **kwargs):
+    """
+    Run a start-up phase on the warm-up thread pool and return its Future.
+    """
+    return _executor.submit(timed, phase, fn, *args, **kwargs)
+
+
+def record(phase, elapsed_ms):
+    with _lock:
+        _phases[phase] = elapsed_ms
+    logger.info("startup phase %s: %.0f ms (%.0f ms since process start)",
+                phase, elapsed_ms, (time.perf_counter() - PROCESS_START) * 1000)
+
+
+def mark(phase):
+    """
+    Record, once per process, the time from process start to a milestone such as first render.
+    """
+    with _lock:
+        if phase in _phases:
+            return
+    record(phase, (time.perf_counter() - PROCESS_START) * 1000)
+
+
+def phase_timings():
+    with _lock:
+        return dict(_phases)
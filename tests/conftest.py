@@ -0,0 +1,28 @@
+import pytest
+
+from kantor_rag.fakes import FakeEncoder, FakeLLM, SyntheticCorpus, build_fake_index
+from kantor_rag.vectorstore import Match
+
+
+@pytest.fixture(scope="session")
+def corpus():
+    return SyntheticCorpus(scale=0.05)
+
+
+@pytest.fixture(scope="session")
+def encoder():
+    return FakeEncoder()
+
+
+@pytest.fixture(scope="session")
+def fake_index(corpus, encoder):
+    return build_fake_index(corpus, encoder)
+
+
+@pytest.fixture
+def fake_llm():
+    return FakeLLM(ttft_ms=1, tokens_per_second=0, answer_tokens=8, jitter=0)
+
+
+def make_match(chunk_id, score, filename="Doc", text="Some text.", values=None, **metadata):
+    return Match(chunk_id, score, dict(metadata, filename=filename, text=text), values)
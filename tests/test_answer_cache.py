@@ -0,0 +1,39 @@
+import numpy as np
+
+from kantor_rag.answer_cache import AnswerCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return AnswerCache(str(tmp_path / "answers.sqlite3"), **kwargs)
+
+
+def test_reuses_answers_for_near_identical_queries(tmp_path):
+    cache = make_cache(tmp_path, threshold=0.95)
+    cache.store([1.0, 0.0], ["a", "b"], None, "model", "answer")
+    assert cache.lookup([1.0, 0.05], ["a", "b"], None, "model") == "answer"
+    assert cache.lookup([0.0, 1.0], ["a", "b"], None, "model") is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_key_includes_chunks_order_filter_and_model(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store([1.0, 0.0], ["a", "b"], None, "model", "answer")
+    assert cache.lookup([1.0, 0.0], ["b", "a"], None, "model") is None
+    assert cache.lookup([1.0, 0.0], ["a", "b"], {"doc_type": "Books"}, "model") is None
+    assert cache.lookup([1.0, 0.0], ["a", "b"], None, "other-model") is None
+
+
+def test_index_version_change_drops_everything(tmp_path):
+    cache = make_cache(tmp_path, index_version="v1")
+    cache.store(np.ones(4), ["a"], None, "model", "answer")
+    cache.set_index_version("v1")
+    assert cache.stats()["entries"] == 1
+    cache.set_index_version("v2")
+    assert cache.stats()["entries"] == 0
+
+
+def test_bounded_by_entries(tmp_path):
+    cache = make_cache(tmp_path, max_entries=3)
+    for i in range(5):
+        cache.store([1.0, float(i)], [str(i)], None, "model", str(i))
+    assert cache.stats()["entries"] == 3
@@ -0,0 +1,35 @@
+import asyncio
+
+from kantor_rag.batching import MicroBatcher
+
+
+def test_concurrent_calls_share_a_batch():
+    batches = []
+
+    def double(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    async def main():
+        batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=20)
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        finally:
+            await batcher.close()
+
+    assert asyncio.run(main()) == [0, 2, 4, 6, 8]
+    assert batches == [[0, 1, 2, 3, 4]]
+
+
+def test_errors_reach_every_caller():
+    def fail(items):
+        raise ValueError("boom")
+
+    async def main():
+        batcher = MicroBatcher(fail, max_wait_ms=1)
+        try:
+            return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        finally:
+            await batcher.close()
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(main()))
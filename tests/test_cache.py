@@ -0,0 +1,64 @@
+import numpy as np
+
+from kantor_rag.cache import OTHER_SIZE, LRUCache, approx_size, embedding_key, filter_key, normalize_query
+from kantor_rag.vectorstore import Match
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_miss(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("kantor_rag.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(ttl=10)
+    cache.set("a", 1)
+    now[0] += 11
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_bounded_by_bytes():
+    cache = LRUCache(maxsize=100, max_bytes=10_000)
+    for i in range(10):
+        cache.set(i, np.zeros(1500, dtype=np.uint8))
+    assert cache.stats()["bytes"] <= 10_000
+    assert len(cache) < 10
+    # Larger than the whole cache: not stored
+    cache.set("huge", np.zeros(20_000, dtype=np.uint8))
+    assert cache.get("huge") is None
+
+
+def test_get_or_compute_runs_once():
+    cache = LRUCache()
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_compute("k", lambda: calls.append(1) or 42) == 42
+    assert len(calls) == 1
+
+
+def test_approx_size_measures_matches_and_stops_at_unknown_objects():
+    match = Match("a", 0.5, {"text": "x" * 1000}, [0.1] * 10)
+    assert approx_size([match]) > 1000
+
+    class Client:
+        pass
+
+    client = Client()
+    client.self = client
+    client.payload = "x" * 1_000_000
+    assert approx_size(client) == OTHER_SIZE
+
+
+def test_keys_are_canonical():
+    assert normalize_query("  What IS   a Field? ") == normalize_query("what is a field?")
+    assert filter_key({"b": 1, "a": 2}) == filter_key({"a": 2, "b": 1})
+    assert embedding_key([0.1, 0.2]) == embedding_key(np.array([0.1, 0.2], dtype=np.float32))
@@ -0,0 +1,19 @@
+from kantor_rag.chunkstore import ChunkStore
+
+
+def test_round_trip_and_delete(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks.sqlite3"))
+    store.put_many([("a", "First chunk text. " * 50), ("b", "Zweiter Abschnitt – ü")])
+    assert len(store) == 2
+    assert store.get_many(["a", "b", "missing"]) == {"a": "First chunk text. " * 50, "b": "Zweiter Abschnitt – ü"}
+    store.delete(["a"])
+    assert store.get_many(["a"]) == {}
+    assert len(store) == 1
+
+
+def test_reads_are_cached(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks.sqlite3"))
+    store.put_many([("a", "text")])
+    store.get_many(["a"])
+    store.get_many(["a"])
+    assert store.cache.stats()["hits"] >= 1
@@ -0,0 +1,58 @@
+from kantor_rag.context import TokenCounter, build_context, split_sentences, trim_to_budget
+
+from conftest import make_match
+
+COUNTER = TokenCounter()
+
+LONG_TEXT = (
+    "Alpha beta gamma delta. " * 20
+    + "The setting factor conditions the whole interbehavioral field. "
+    + "Epsilon zeta eta theta. " * 20
+)
+
+
+def test_split_sentences():
+    assert split_sentences("One thing. Another one! 3 more? yes") == ["One thing.", "Another one!", "3 more? yes"]
+
+
+def test_sources_are_numbered_in_rank_order():
+    matches = [
+        make_match("a", 0.5, filename="First", page=3, text="Text of the first."),
+        make_match("b", 0.9, filename="Second", page=7, text="Text of the second."),
+    ]
+    context, references, sources = build_context("query", matches, COUNTER)
+    assert [source["id"] for source in sources] == ["a", "b"]
+    assert [source["num"] for source in sources] == [1, 2]
+    assert context.index("[Source 1: First, p.3]") < context.index("[Source 2: Second, p.7]")
+    assert "- Source 2: Second, page 7" in references
+
+
+def test_budget_goes_to_the_top_ranked_chunks():
+    matches = [make_match(str(i), 1.0 - i / 10, filename=f"F{i}", text=LONG_TEXT) for i in range(3)]
+    context, _, sources = build_context("setting factor", matches, COUNTER, token_budget=300, max_chunk_tokens=200)
+    assert sources[0]["id"] == "0"
+    assert "setting factor" in sources[0]["text"] or "setting factor" in context
+    assert COUNTER.count(context) <= 300 + 10
+
+
+def test_empty_chunks_are_skipped():
+    matches = [make_match("a", 0.9, text="  "), make_match("b", 0.8, text="Real text.")]
+    _, _, sources = build_context("q", matches, COUNTER)
+    assert [source["id"] for source in sources] == ["b"]
+    assert sources[0]["num"] == 1
+
+
+def test_trim_keeps_the_relevant_sentence_within_budget():
+    for budget in (12, 30, 60):
+        trimmed = trim_to_budget(LONG_TEXT, "setting factor", budget, COUNTER)
+        assert COUNTER.count(trimmed) <= budget
+        if budget >= 30:
+            assert "setting factor conditions" in trimmed
+        assert "…" in trimmed
+
+
+def test_trim_shortens_a_single_long_sentence():
+    sentence = "word, " * 300
+    trimmed = trim_to_budget(sentence, "word", 40, COUNTER)
+    assert COUNTER.count(trimmed) <= 40
+    assert trimmed.endswith("…")
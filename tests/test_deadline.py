@@ -0,0 +1,94 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from kantor_rag.deadline import DEADLINES_EXCEEDED, Deadline, DeadlineExceeded, Hedger, call_with_timeout
+
+
+def test_deadline_caps_stages_by_the_time_left():
+    deadline = Deadline(budget=10, stage_timeouts={"vector_query": 2})
+    assert deadline.timeout("vector_query") == 2
+    assert 9 < deadline.timeout("llm") <= 10
+    assert not deadline.expired()
+    assert Deadline().timeout("llm") is None
+    assert Deadline(budget=0).expired()
+
+
+def test_call_with_timeout():
+    with ThreadPoolExecutor(1) as executor:
+        assert call_with_timeout(executor, lambda: 1, 1.0, "stage") == 1
+        with pytest.raises(DeadlineExceeded) as error:
+            call_with_timeout(executor, lambda: time.sleep(0.2), 0.01, "slow")
+    assert error.value.stage == "slow"
+
+
+def test_only_giving_up_counts_as_a_missed_deadline():
+    before = DEADLINES_EXCEEDED.value(stage="counted")
+    error = DeadlineExceeded("counted")
+    with pytest.raises(DeadlineExceeded):
+        try:
+            raise error
+        except DeadlineExceeded:
+            raise
+    assert DEADLINES_EXCEEDED.value(stage="counted") == before
+    with ThreadPoolExecutor(1) as executor:
+        with pytest.raises(DeadlineExceeded):
+            call_with_timeout(executor, lambda: time.sleep(0.2), 0.01, "counted")
+    assert DEADLINES_EXCEEDED.value(stage="counted") == before + 1
+
+
+def warmed(hedger, latency=0.002, calls=40):
+    for _ in range(calls):
+        hedger.call(lambda: time.sleep(latency))
+    return hedger
+
+
+def test_hedge_wins_over_a_slow_first_attempt():
+    hedger = warmed(Hedger(min_samples=10, max_hedge_ratio=0.5))
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        time.sleep(0.5 if len(attempts) == 1 else 0.002)
+        return len(attempts)
+
+    started = time.monotonic()
+    result, hedged, won = hedger.call(call)
+    assert hedged and won
+    assert result == 2
+    assert time.monotonic() - started < 0.4
+
+
+def test_hedges_are_capped():
+    hedger = warmed(Hedger(min_samples=10, max_hedge_ratio=0.05))
+    for _ in range(20):
+        hedger.call(lambda: time.sleep(0.05))
+    # At most 5% of the last window of calls
+    assert hedger.fired <= 0.05 * 60
+    assert hedger.skipped > 0
+
+
+def test_queueing_does_not_trigger_hedges():
+    hedger = warmed(Hedger(min_samples=10, max_workers=4, max_hedge_ratio=0.5), latency=0.03)
+    fired = hedger.fired
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(lambda _: hedger.call(lambda: time.sleep(0.03)), range(32)))
+    assert hedger.fired - fired <= 2
+
+
+def test_hedger_times_out():
+    release = threading.Event()
+    hedger = Hedger(initial_delay=0.01)
+    with pytest.raises(DeadlineExceeded):
+        hedger.call(lambda: release.wait(1), timeout=0.05)
+    release.set()
+
+
+def test_hedger_raises_when_the_call_fails():
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        Hedger().call(fail)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from kantor_rag.diversify import diversify, diversify_results, mmr_diversify
+
+from conftest import make_match
+
+
+def test_source_cap_keeps_best_per_source():
+    matches = [make_match(str(i), 1 - i / 10, filename="A" if i < 3 else "B") for i in range(5)]
+    kept = diversify_results(matches, max_per_source=2)
+    assert [match.id for match in kept] == ["0", "1", "3", "4"]
+
+
+def test_mmr_skips_near_duplicates():
+    matches = [
+        make_match("a", 0.9, filename="A", values=[1.0, 0.0, 0.0]),
+        make_match("a-copy", 0.9, filename="B", values=[1.0, 0.01, 0.0]),
+        make_match("c", 0.6, filename="C", values=[0.6, 0.8, 0.0]),
+    ]
+    picked = mmr_diversify(matches, [1.0, 0.2, 0.0], k=2, lambda_mult=0.5)
+    # Whichever copy is picked first, the other one adds nothing new
+    assert picked[0].id in ("a", "a-copy")
+    assert picked[1].id == "c"
+
+
+def test_mmr_uses_given_relevance():
+    matches = [make_match(str(i), 0.5, filename=str(i), values=np.eye(3)[i].tolist()) for i in range(3)]
+    picked = mmr_diversify(matches, [1.0, 0.0, 0.0], k=1, relevance=[0.1, 0.2, 0.9])
+    assert picked[0].id == "2"
+
+
+def test_mmr_does_not_modify_the_query():
+    query = np.array([3.0, 4.0, 0.0], dtype=np.float32)
+    query.setflags(write=False)
+    matches = [make_match(str(i), 0.5, filename=str(i), values=np.eye(3)[i].tolist()) for i in range(3)]
+    mmr_diversify(matches, query, k=2)
+    assert query.tolist() == [3.0, 4.0, 0.0]
+
+
+def test_mmr_without_vectors_falls_back_to_source_cap():
+    matches = [make_match(str(i), 1 - i / 10, filename="A") for i in range(4)]
+    assert [match.id for match in diversify(matches, "mmr", [1.0], k=3)] == ["0", "1"]
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        diversify([], "random")
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from kantor_rag.filters import FilterIndex, matches_filter
+
+METADATA = [
+    {"doc_type": "Books", "filename": "A", "year": 1959},
+    {"doc_type": "Books", "filename": "B", "year": 1924},
+    {"doc_type": "Articles", "filename": "C", "year": 1959},
+    {"doc_type": "Reviews", "filename": "D"},
+    {"doc_type": "Books", "filename": "A", "year": 1960},
+]
+
+FILTERS = [
+    {"doc_type": {"$eq": "Books"}},
+    {"doc_type": "Articles"},
+    {"$and": [{"doc_type": {"$eq": "Books"}}, {"filename": {"$eq": "A"}}]},
+    {"$or": [{"doc_type": "Reviews"}, {"filename": "B"}]},
+    {"doc_type": {"$ne": "Books"}},
+    {"filename": {"$in": ["A", "D"]}},
+    {"filename": {"$nin": ["A", "D"]}},
+    {"doc_type": {"$eq": "Missing"}},
+]
+
+
+@pytest.mark.parametrize("metadata_filter", FILTERS)
+def test_rows_agree_with_matches_filter(metadata_filter):
+    expected = [row for row, meta in enumerate(METADATA) if matches_filter(meta, metadata_filter)]
+    rows = FilterIndex(METADATA).rows(metadata_filter)
+    assert rows is not None
+    assert list(rows) == expected
+
+
+def test_unindexed_fields_fall_back():
+    index = FilterIndex(METADATA)
+    assert index.rows({"year": 1959}) is None
+    assert index.rows({"$and": [{"doc_type": "Books"}, {"year": 1959}]}) is None
+    assert index.rows(None) is None
+
+
+def test_matches_filter_rejects_unknown_operators():
+    with pytest.raises(ValueError):
+        matches_filter({"doc_type": "Books"}, {"doc_type": {"$gt": 1}})
+
+
+def test_rows_are_sorted_int32():
+    rows = FilterIndex(METADATA).rows({"doc_type": "Books"})
+    assert rows.dtype == np.int32
+    assert list(rows) == sorted(rows)
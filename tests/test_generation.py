@@ -0,0 +1,120 @@
+import pytest
+
+from kantor_rag.generation import (
+    FAST, FAST_MODEL, QUALITY, GenerationScheduler, Overloaded, RoutingPolicy, _Quota, parse_duration, retry_after
+)
+
+HEADERS = {
+    "x-ratelimit-limit-requests": "10",
+    "x-ratelimit-remaining-requests": "1",
+    "x-ratelimit-reset-requests": "30s",
+}
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("7.66s", 7.66), ("2m59.56s", 179.56), ("120ms", 0.12), ("1h", 3600.0), ("3", 3.0), (None, None), ("soon", None),
+])
+def test_parse_duration(value, seconds):
+    if seconds is None:
+        assert parse_duration(value) is None
+    else:
+        assert parse_duration(value) == pytest.approx(seconds)
+
+
+def test_retry_after_reads_the_header():
+    class Error(Exception):
+        response = type("Response", (), {"headers": {"retry-after": "4"}})()
+
+    assert retry_after(Error()) == 4.0
+    assert retry_after(Overloaded("busy", retry_after=2)) == 2.0
+
+
+@pytest.mark.parametrize("query, tier", [
+    ("What is a setting factor?", FAST),
+    ("Who was Kantor?", FAST),
+    ("How does Kantor's view compare with Skinner's?", QUALITY),
+    ("Why did Kantor reject mentalism?", QUALITY),
+])
+def test_routing_policy(query, tier):
+    assert RoutingPolicy().tier(query, 1000, 5) == tier
+
+
+def test_long_context_goes_to_quality():
+    assert RoutingPolicy(fast_max_context_tokens=100).tier("What is a field?", 1000, 5) == QUALITY
+
+
+def test_quota_admits_within_headroom():
+    quota = _Quota()
+    quota.update(HEADERS, now=0.0)
+    assert quota.admits(100, 1.0, headroom=0.0, max_concurrency=None)
+    assert not quota.admits(100, 1.0, headroom=0.1, max_concurrency=None)
+    # Past the reset the limit is back
+    assert quota.admits(100, 31.0, headroom=0.1, max_concurrency=None)
+
+
+def test_quota_blocked_and_concurrency():
+    quota = _Quota()
+    quota.blocked_until = 5.0
+    assert not quota.admits(1, 1.0, 0.0, None)
+    assert quota.admits(1, 6.0, 0.0, None)
+    quota.in_flight = 2
+    assert not quota.admits(1, 6.0, 0.0, max_concurrency=2)
+    assert quota.wait_hint(1.0) == pytest.approx(4.0)
+
+
+def test_reported_stream_frees_its_request_slot():
+    scheduler = GenerationScheduler(headroom=0.0, max_wait=0)
+    first = scheduler.acquire("q", 10, 1, "model")
+    scheduler.observe("model", HEADERS, first)
+    # The header already counts the first request, which is still streaming
+    second = scheduler.acquire("q", 10, 1, "model")
+    with pytest.raises(Overloaded):
+        scheduler.acquire("q", 10, 1, "model")
+    for lease in (first, second):
+        lease.__exit__(None, None, None)
+    assert scheduler.stats()["model"]["in_flight"] == 0
+
+
+def test_reported_stream_gives_back_its_token_reservation():
+    headers = {"x-ratelimit-limit-tokens": "1000", "x-ratelimit-remaining-tokens": "1000",
+               "x-ratelimit-reset-tokens": "30s"}
+    scheduler = GenerationScheduler(headroom=0.0, max_wait=0, completion_tokens=0)
+    scheduler.observe("model", headers)
+    first = scheduler.acquire("q", 600, 1, "model")
+    with pytest.raises(Overloaded):
+        scheduler.acquire("q", 600, 1, "model")
+    # The header now counts the first request's tokens; they must not be subtracted twice
+    scheduler.observe("model", dict(headers, **{"x-ratelimit-remaining-tokens": "400"}), first)
+    with pytest.raises(Overloaded):
+        scheduler.acquire("q", 600, 1, "model")
+    second = scheduler.acquire("q", 400, 1, "model")
+    for lease in (first, second):
+        lease.__exit__(None, None, None)
+    assert scheduler._quota("model").reserved_tokens == 0
+
+
+def test_full_queue_sheds():
+    scheduler = GenerationScheduler(max_queue=0)
+    with pytest.raises(Overloaded):
+        scheduler.acquire("q", 10, 1, "model")
+
+
+def test_fallback_to_fast_model_near_the_limit():
+    scheduler = GenerationScheduler(fallback=True, headroom=0.5, max_wait=0)
+    scheduler.observe("big", dict(HEADERS, **{"x-ratelimit-remaining-requests": "3"}))
+    with scheduler.acquire("Why?", 10, 1, "big") as lease:
+        assert lease.model == FAST_MODEL
+        assert lease.fallback
+
+
+def test_routes_to_the_fast_model():
+    scheduler = GenerationScheduler(RoutingPolicy())
+    assert scheduler.preferred_model("What is a setting factor?", 100, 3, "big") == FAST_MODEL
+    assert scheduler.preferred_model("Why did Kantor reject dualism?", 100, 3, "big") == "big"
+
+
+def test_pass_through_ignores_limits():
+    scheduler = GenerationScheduler(throttle=False, max_queue=0)
+    scheduler.rate_limited("model", Overloaded("429", retry_after=60))
+    with scheduler.acquire("q", 10, 1, "model") as lease:
+        assert lease.model == "model"
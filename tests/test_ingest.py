@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+from kantor_rag import ingest
+from kantor_rag.catalog import catalog_entries
+from kantor_rag.chunkstore import ChunkStore
+from kantor_rag.fakes import FakeEncoder
+from kantor_rag.lexical import BM25Index
+from kantor_rag.manifest import Manifest
+from kantor_rag.vectorstore import LocalStore
+
+PAGE = "The interbehavioral field includes setting factors and stimulus functions. " * 30
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "load_encoder", lambda backend=None, threads=None: FakeEncoder())
+    monkeypatch.delenv("ENCODER_BACKEND", raising=False)
+    directory = tmp_path / "sources"
+    directory.mkdir()
+    titles = [title for _, title in list(catalog_entries())[:3]]
+    for title in titles:
+        (directory / f"{title}.txt").write_text(f"{title}\n{PAGE}\f{PAGE}", encoding="utf-8")
+    return directory, titles
+
+
+def run(sources, tmp_path, **kwargs):
+    directory, _ = sources
+    index_dir = str(tmp_path / "index")
+    manifest = Manifest(os.path.join(index_dir, "manifest.json"))
+    store = LocalStore(index_dir)
+    result = ingest.ingest(str(directory), store, manifest, workers=1, **kwargs)
+    return result, LocalStore(index_dir), Manifest(os.path.join(index_dir, "manifest.json"))
+
+
+def test_chunk_page_overlaps_and_covers_the_page():
+    words = [str(i) for i in range(700)]
+    chunks = ingest.chunk_page(" ".join(words), chunk_words=300, overlap=50)
+    assert len(chunks) == 3
+    assert chunks[1].split()[0] == "250"
+    assert chunks[-1].split()[-1] == "699"
+
+
+def test_rerun_without_changes_embeds_nothing(sources, tmp_path):
+    (embedded, deleted), store, _ = run(sources, tmp_path)
+    assert embedded == len(store) > 0
+    assert deleted == 0
+    (embedded, deleted), _, _ = run(sources, tmp_path)
+    assert (embedded, deleted) == (0, 0)
+
+
+def test_changed_page_reembeds_only_its_chunks(sources, tmp_path):
+    _, store, manifest = run(sources, tmp_path)
+    version = store.version()
+    fingerprint = manifest.fingerprint()
+    directory, titles = sources
+    path = directory / f"{titles[0]}.txt"
+    # Same number of chunks, one page corrected
+    path.write_text(f"{titles[0]}\n{PAGE}\f{PAGE.replace('setting', 'settings')}", encoding="utf-8")
+
+    (embedded, deleted), store, manifest = run(sources, tmp_path)
+    assert 0 < embedded == deleted
+    assert store.version() != version
+    assert manifest.fingerprint() != fingerprint
+
+
+def test_encoder_change_rebuilds_everything(sources, tmp_path, monkeypatch):
+    _, store, manifest = run(sources, tmp_path)
+    assert manifest.settings["encoder_backend"] == "torch"
+    monkeypatch.setenv("ENCODER_BACKEND", "onnx")
+    (embedded, _), rebuilt, manifest = run(sources, tmp_path)
+    assert embedded == len(rebuilt) == len(store)
+    assert manifest.settings["encoder_backend"] == "onnx"
+    assert manifest.settings["onnx_quantized"] is True
+
+
+def test_manifest_without_encoder_settings_counts_as_torch(sources, tmp_path):
+    _, _, manifest = run(sources, tmp_path)
+    del manifest.settings["encoder_backend"]
+    manifest.save()
+    (embedded, deleted), _, _ = run(sources, tmp_path)
+    assert (embedded, deleted) == (0, 0)
+
+
+def change_first_page(sources):
+    directory, titles = sources
+    path = directory / f"{titles[0]}.txt"
+    path.write_text(f"{titles[0]}\n{PAGE}\f{PAGE.replace('setting', 'settings')}", encoding="utf-8")
+
+
+def all_chunk_ids(manifest):
+    return [chunk_id for entry in manifest.documents.values() for chunk_id in entry["chunks"]]
+
+
+def test_lexical_backfill_covers_kept_chunks_of_changed_documents(sources, tmp_path):
+    run(sources, tmp_path)
+    change_first_page(sources)
+    lexical = BM25Index(str(tmp_path / "lexical"))
+    (embedded, _), store, manifest = run(sources, tmp_path, lexical=lexical)
+    assert 0 < embedded < len(store)
+    assert sorted(lexical.ids) == sorted(all_chunk_ids(manifest))
+
+
+def test_chunk_store_backfill_covers_kept_chunks_of_changed_documents(sources, tmp_path):
+    run(sources, tmp_path, chunk_store=ChunkStore(str(tmp_path / "chunks.sqlite3")))
+    change_first_page(sources)
+    # The chunk store was lost (a new volume), so this run backfills it
+    chunk_store = ChunkStore(str(tmp_path / "new-chunks.sqlite3"))
+    (embedded, _), store, manifest = run(sources, tmp_path, chunk_store=chunk_store)
+    assert 0 < embedded < len(store)
+    texts = chunk_store.get_many(all_chunk_ids(manifest))
+    assert len(texts) == len(store) and all(texts.values())
@@ -0,0 +1,66 @@
+import numpy as np
+
+from kantor_rag.fakes import FakeIndex
+from kantor_rag.lexical import BM25Index, hybrid_search, reciprocal_rank_fusion, tokenize
+
+DOCS = [
+    ("c1", "Setting factors condition the interbehavioral field.", {"doc_type": "Books", "filename": "A"}),
+    ("c2", "Surrogation replaces one stimulus object with another.", {"doc_type": "Articles", "filename": "B"}),
+    ("c3", "The field of psychology studies behavior and stimulus functions.", {"doc_type": "Books", "filename": "C"}),
+]
+
+
+def build(directory=None):
+    index = BM25Index(directory)
+    index.update(DOCS)
+    return index
+
+
+def test_tokenize_drops_stopwords_and_single_letters():
+    assert tokenize("What is a Setting Factor?") == ["setting", "factor"]
+
+
+def test_search_ranks_matching_chunks():
+    hits = build().search("surrogation stimulus")
+    assert hits[0][0] == "c2"
+    assert {chunk_id for chunk_id, _ in hits} == {"c2", "c3"}
+    assert all(score > 0 for _, score in hits)
+
+
+def test_search_applies_filters():
+    hits = build().search("stimulus", filter={"doc_type": {"$eq": "Books"}})
+    assert [chunk_id for chunk_id, _ in hits] == ["c3"]
+
+
+def test_update_replaces_and_removes():
+    index = build()
+    index.update([("c1", "Nothing about fields here.", {"doc_type": "Books", "filename": "A"})], removed=["c2"])
+    assert len(index) == 2
+    assert index.search("surrogation") == []
+    assert [chunk_id for chunk_id, _ in index.search("setting")] == []
+
+
+def test_save_and_load(tmp_path):
+    index = build()
+    index.save(str(tmp_path))
+    loaded = BM25Index(str(tmp_path))
+    assert loaded.search("surrogation") == index.search("surrogation")
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]])
+    assert fused[0] == "b"
+    assert set(fused) == {"a", "b", "c", "d"}
+
+
+def test_hybrid_search_fetches_lexical_only_chunks_without_touching_the_query(encoder):
+    store = FakeIndex(dimension=encoder.dim)
+    texts = [text for _, text, _ in DOCS]
+    store.upsert([(chunk_id, vector, dict(meta, text=text))
+                  for (chunk_id, text, meta), vector in zip(DOCS, encoder.encode(texts))])
+    query = np.asarray(encoder.encode("surrogation"), dtype=np.float32) * 3
+    query.setflags(write=False)
+    before = query.copy()
+    matches = hybrid_search(store, build(), "surrogation", query, top_k=1)
+    assert {match.id for match in matches} >= {"c2"}
+    assert np.array_equal(query, before)
@@ -0,0 +1,42 @@
+from kantor_rag.cache import LRUCache
+from kantor_rag.metrics import REGISTRY, Counter, Histogram, Trace, register_cache
+
+
+def test_counter_renders_labelled_samples():
+    counter = Counter("test_requests_total", "Requests.", ("outcome",))
+    counter.inc(outcome="ok")
+    counter.inc(2, outcome="error")
+    text = counter.render()
+    assert "# TYPE test_requests_total counter" in text
+    assert 'test_requests_total{outcome="ok"} 1' in text
+    assert 'test_requests_total{outcome="error"} 2' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+    text = histogram.render()
+    assert 'test_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_seconds_bucket{le="1.0"} 2' in text
+    assert 'test_seconds_bucket{le="+Inf"} 3' in text
+    assert histogram.count() == 3
+
+
+def test_cache_hits_are_exported_as_counters():
+    cache = LRUCache(maxsize=4)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    register_cache("test", cache)
+    text = REGISTRY.render()
+    assert "# TYPE kantor_cache_hits_total counter" in text
+    assert 'kantor_cache_hits_total{cache="test"} 1' in text
+    assert 'kantor_cache_misses_total{cache="test"} 1' in text
+
+
+def test_trace_records_stages():
+    trace = Trace(kind="test")
+    with trace.stage("embed"):
+        pass
+    assert "embed" in trace.stages
@@ -0,0 +1,76 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+
+import pytest
+
+from kantor_rag.answer_cache import AnswerCache
+from kantor_rag.deadline import DeadlineExceeded
+from kantor_rag.fakes import FakeIndex
+from kantor_rag.pipeline import Pipeline
+
+
+@pytest.fixture
+def pipeline(fake_index, fake_llm, encoder, tmp_path):
+    return Pipeline(fake_index, fake_llm, encoder, answer_cache=AnswerCache(str(tmp_path / "answers.sqlite3")))
+
+
+def test_search_returns_diversified_sources(pipeline, corpus):
+    result = pipeline.search(corpus.queries(1)[0][0])
+    assert 0 < len(result.sources) <= pipeline.final_k
+    assert result.context.lstrip().startswith("[Source 1:")
+    per_file = {}
+    for source in result.sources:
+        per_file[source["file"]] = per_file.get(source["file"], 0) + 1
+    assert max(per_file.values()) <= pipeline.max_per_source
+
+
+def test_answers_are_cached(pipeline, fake_llm, corpus):
+    query = corpus.queries(1, seed=3)[0][0]
+    answer = pipeline.answer(pipeline.search(query))
+    assert answer.startswith("According to [Source 1]")
+    pipeline.results_cache.clear()
+    repeated = pipeline.search(query)
+    assert repeated.answer == answer
+    assert fake_llm.calls == 1
+
+
+def test_streamed_answer_matches(pipeline, corpus):
+    result = pipeline.search(corpus.queries(1, seed=4)[0][0])
+    streamed = "".join(pipeline.stream_answer(result))
+    assert streamed == result.answer
+    assert streamed.startswith("According to")
+
+
+def test_coalesced_callers_get_independent_results(corpus, encoder, fake_llm):
+    index = FakeIndex(latency_ms=50)
+    chunks = list(islice(corpus.chunks(), 200))
+    vectors = encoder.encode([text for _, text, _ in chunks])
+    index.upsert([(chunk_id, vector, metadata) for (chunk_id, _, metadata), vector in zip(chunks, vectors)])
+    pipeline = Pipeline(index, fake_llm, encoder)
+    query = corpus.queries(1, seed=5)[0][0]
+    with ThreadPoolExecutor(2) as pool:
+        first, second = pool.map(lambda _: pipeline.search(query), range(2))
+    assert index.queries == 1
+    first.sources[0]["score"] = -1.0
+    first.timings["extra_ms"] = 1.0
+    assert second.sources[0]["score"] != -1.0
+    assert "extra_ms" not in second.timings
+
+
+def test_load_failed(fake_index, fake_llm):
+    model = Future()
+    pipeline = Pipeline(fake_index, fake_llm, model)
+    assert not pipeline.load_failed()
+    model.set_exception(ConnectionError("no network"))
+    assert pipeline.load_failed()
+    with pytest.raises(ConnectionError):
+        pipeline.wait_for_model()
+
+
+def test_too_little_budget_left_degrades_the_answer(fake_index, fake_llm, encoder, corpus):
+    pipeline = Pipeline(fake_index, fake_llm, encoder, latency_budget=0.5, min_answer_seconds=1.0)
+    result = pipeline.search(corpus.queries(1, seed=6)[0][0])
+    with pytest.raises(DeadlineExceeded):
+        pipeline.answer(result)
+    assert result.degraded == "deadline"
+    assert fake_llm.calls == 0
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from kantor_rag.quantize import BinaryQuantizer, Int8Quantizer, load_quantizer, make_quantizer, shortlist
+from kantor_rag.vectorstore import LocalStore
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((2000, 64)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_int8_scores_approximate_inner_products(vectors):
+    quantizer = Int8Quantizer().fit(vectors)
+    codes = quantizer.encode(vectors)
+    assert codes.dtype == np.int8
+    query = vectors[0]
+    assert np.allclose(quantizer.scores(codes, query), vectors @ query, atol=0.02)
+
+
+def test_binary_codes_are_packed_bits(vectors):
+    quantizer = BinaryQuantizer().fit(vectors)
+    codes = quantizer.encode(vectors)
+    assert codes.shape == (len(vectors), 64 // 8)
+    scores = quantizer.scores(codes, vectors[5])
+    # A vector agrees with its own code on every bit
+    assert scores[5] == 64
+    assert scores.max() == 64
+
+
+@pytest.mark.parametrize("method, oversample, min_recall", [("int8", 4, 0.98), ("binary", 40, 0.8)])
+def test_shortlist_recall(vectors, method, oversample, min_recall):
+    quantizer = make_quantizer(method).fit(vectors)
+    codes = quantizer.encode(vectors)
+    recalls = []
+    for query in vectors[:20]:
+        exact = set(np.argsort(-(vectors @ query))[:10])
+        recalls.append(len(exact & set(shortlist(quantizer, codes, query, 10 * oversample))) / 10)
+    assert np.mean(recalls) >= min_recall
+
+
+def test_state_round_trip(vectors):
+    for method in ("int8", "binary"):
+        quantizer = make_quantizer(method).fit(vectors)
+        restored = load_quantizer(quantizer.state())
+        assert np.array_equal(restored.encode(vectors[:5]), quantizer.encode(vectors[:5]))
+    assert make_quantizer("none") is None
+    with pytest.raises(ValueError):
+        make_quantizer("pq")
+
+
+def test_quantized_store_returns_exact_scores(tmp_path, vectors):
+    items = [(f"c{i}", vector, {"doc_type": "Books" if i % 2 else "Articles", "filename": f"F{i % 7}"})
+             for i, vector in enumerate(vectors)]
+    exact = LocalStore(str(tmp_path), hnsw_threshold=float("inf"))
+    exact.upsert(items)
+    exact.flush()
+    quantized = LocalStore(str(tmp_path), hnsw_threshold=float("inf"), quantization="int8")
+    query_filter = {"doc_type": {"$eq": "Books"}}
+    expected = exact.query(vectors[3], top_k=10, filter=query_filter).matches
+    found = quantized.query(vectors[3], top_k=10, filter=query_filter).matches
+    assert [match.id for match in found] == [match.id for match in expected]
+    assert [match.score for match in found] == pytest.approx([match.score for match in expected])
+    assert quantized.code_bytes() * 3 < exact.vector_bytes()
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from kantor_rag.rerank import CrossEncoderReranker
+
+from conftest import make_match
+
+
+class LengthModel:
+    """
+    Scores a pair by the length of the chunk text, as a logit around zero.
+    """
+
+    def predict(self, pairs, **kwargs):
+        return np.array([len(text) / 10 - 2.5 for _, text in pairs])
+
+
+def matches():
+    return [make_match(str(i), 0.9 - i / 10, text="x" * (10 * (i + 1))) for i in range(4)]
+
+
+def test_rerank_orders_by_the_cross_encoder_and_keeps_similarity_scores():
+    original = matches()
+    reranked, relevance, stats = CrossEncoderReranker(model=LengthModel()).rerank("q", original)
+    assert [match.id for match in reranked] == ["3", "2", "1", "0"]
+    # The bi-encoder similarity stays the score shown to users
+    assert [round(match.score, 2) for match in reranked] == [0.6, 0.7, 0.8, 0.9]
+    assert all(0 < value < 1 for value in relevance)
+    assert relevance == sorted(relevance, reverse=True)
+    assert relevance[0] == pytest.approx(1 / (1 + np.exp(-1.5)))
+    assert stats["scored"] == stats["kept"] == 4
+
+
+def test_relevance_does_not_overflow_on_large_logits():
+    class Extreme:
+        def predict(self, pairs, **kwargs):
+            return np.array([800.0, -800.0], dtype=np.float32)
+
+    reranked, relevance, _ = CrossEncoderReranker(model=Extreme()).rerank("q", matches()[:2])
+    assert relevance == [1.0, 0.0]
+
+
+def test_min_score_cuts_low_logits():
+    reranked, relevance, stats = CrossEncoderReranker(model=LengthModel(), min_score=0.0).rerank("q", matches())
+    assert [match.id for match in reranked] == ["3", "2"]
+    assert len(relevance) == stats["kept"] == 2
+
+
+def test_budget_caps_scored_candidates():
+    reranker = CrossEncoderReranker(model=LengthModel(), budget_ms=1, min_candidates=2)
+    reranker._pair_ms = 1.0
+    reranked, relevance, stats = reranker.rerank("q", matches())
+    assert stats["scored"] == 2
+    # Unscored candidates follow in their original order, ranked below every scored one
+    assert [match.id for match in reranked] == ["1", "0", "2", "3"]
+    assert relevance == sorted(relevance, reverse=True)
+    assert relevance[2] < relevance[1]
+    assert reranked[2].score == 0.7
+
+
+def test_no_matches():
+    reranked, relevance, stats = CrossEncoderReranker(model=LengthModel()).rerank("q", [])
+    assert reranked == relevance == []
+    assert stats["kept"] == 0
@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from kantor_rag.generation import Overloaded
+from kantor_rag.singleflight import SingleFlight, StreamGroup
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(1)
+        return "result"
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.do, "key", work) for _ in range(4)]
+        time.sleep(0.05)
+        release.set()
+        assert [future.result() for future in futures] == ["result"] * 4
+    assert len(calls) == 1
+    assert flight.shared == 3
+
+
+def test_errors_reach_every_caller_and_nothing_is_kept():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: 2) == 2
+
+
+def test_late_subscribers_replay_the_stream():
+    group = StreamGroup()
+    gate = threading.Event()
+
+    def produce():
+        yield "a"
+        gate.wait(1)
+        yield "b"
+
+    first = group.stream("key", produce)
+    assert next(first) == "a"
+    second = group.stream("key", produce)
+    gate.set()
+    assert list(second) == ["a", "b"]
+    assert list(first) == ["b"]
+    assert group.shared == 1
+
+
+def test_first_timeout():
+    group = StreamGroup()
+    gate = threading.Event()
+
+    def slow():
+        gate.wait(1)
+        yield "late"
+
+    with pytest.raises(TimeoutError):
+        next(group.stream("key", slow, first_timeout=0.05))
+    gate.set()
+
+
+def test_shed_streams_log_a_warning_without_traceback(caplog):
+    def shed():
+        raise Overloaded("over the request limit", retry_after=1)
+        yield
+
+    with caplog.at_level(logging.WARNING, logger="kantor_rag.singleflight"):
+        with pytest.raises(Overloaded):
+            list(StreamGroup().stream("key", shed))
+    assert [record.levelno for record in caplog.records] == [logging.WARNING]
+    assert caplog.records[0].exc_info is None
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from kantor_rag.vectorstore import LocalStore
+
+
+def unit(values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+ITEMS = [
+    ("a", unit([1, 0, 0]), {"doc_type": "Books", "filename": "Interbehavioral Psychology", "text": "a"}),
+    ("b", unit([1, 1, 0]), {"doc_type": "Articles", "filename": "Events and Fields", "text": "b"}),
+    ("c", unit([0, 1, 0]), {"doc_type": "Books", "filename": "Principles", "text": "c"}),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalStore(str(tmp_path))
+    store.upsert(ITEMS)
+    store.flush()
+    return store
+
+
+def test_query_ranks_by_inner_product(store):
+    matches = store.query(unit([1, 0.1, 0]), top_k=2).matches
+    assert [match.id for match in matches] == ["a", "b"]
+    assert matches[0].metadata["filename"] == "Interbehavioral Psychology"
+    assert not matches[0].values
+
+
+def test_query_applies_filters(store):
+    matches = store.query(unit([1, 0.1, 0]), top_k=3, filter={"doc_type": {"$eq": "Books"}}).matches
+    assert [match.id for match in matches] == ["a", "c"]
+    matches = store.query(unit([0, 1, 0]), top_k=3, filter={"filename": {"$in": ["Events and Fields"]}}).matches
+    assert [match.id for match in matches] == ["b"]
+
+
+def test_flush_and_reload(tmp_path, store):
+    reloaded = LocalStore(str(tmp_path))
+    assert len(reloaded) == 3
+    assert reloaded.fetch(["c"])["c"].metadata["text"] == "c"
+    reloaded.delete(["c"])
+    assert [match.id for match in reloaded.query(unit([0, 1, 0]), top_k=3).matches] == ["b", "a"]
+
+
+def test_version_follows_content(tmp_path, store):
+    before = store.version()
+    # Chunk ids hash the chunk text, so changed content means new ids
+    store.upsert([("d", unit([0, 0, 1]), {"doc_type": "Books", "filename": "Principles", "text": "new"})])
+    store.delete(["c"])
+    store.flush()
+    assert store.version() != before
+    assert LocalStore(str(tmp_path)).version() == store.version()
+
+
+def test_version_changes_with_chunk_text_under_the_same_id(store):
+    before = store.version()
+    store.upsert([("c", unit([0, 1, 0]), {"doc_type": "Books", "filename": "Principles", "text": "corrected"})])
+    store.flush()
+    assert store.version() != before
+
+
+def test_version_folds_in_the_ingest_fingerprint(tmp_path, store):
+    before = store.version()
+    store.set_version("fingerprint-1")
+    assert store.version() != before
+    assert LocalStore(str(tmp_path)).version() == store.version()
+    changed = store.version()
+    store.set_version("fingerprint-2")
+    assert store.version() != changed
+    # A flush keeps the fingerprint in the version
+    store.upsert([("d", unit([0, 0, 1]), {"doc_type": "Books", "filename": "Principles", "text": "d"})])
+    store.flush()
+    reloaded = LocalStore(str(tmp_path))
+    assert reloaded._fingerprint == "fingerprint-2"
+    assert reloaded.version() == store.version()